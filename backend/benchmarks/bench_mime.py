@@ -0,0 +1,111 @@
+"""Microbenchmark: MIME body extraction, legacy top-level-parts parser vs mime_extractor.
+
+Run from backend/:  python benchmarks/bench_mime.py [--repeat N]
+"""
+import argparse
+import base64
+import copy
+import os
+import re
+import sys
+import timeit
+from html import unescape
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from mime_fixtures import load_corpus  # noqa: E402
+from src.services.mime_extractor import decode_part, extract_body, html_to_text, iter_text_parts  # noqa: E402
+
+
+def legacy_strip_html(html_text: str) -> str:
+    text = re.sub(r'<script[^>]*>.*?</script>', '', html_text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r'<style[^>]*>.*?</style>', '', text, flags=re.DOTALL | re.IGNORECASE)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = unescape(text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def legacy_extract_body(payload) -> str:
+    """The parser GmailService used before mime_extractor (top-level parts only, hard utf-8)."""
+    body = ''
+    if 'parts' in payload:
+        for part in payload['parts']:
+            if part['mimeType'] == 'text/plain' and 'data' in part['body']:
+                body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
+                break
+        if not body:
+            for part in payload['parts']:
+                if part['mimeType'] == 'text/html' and 'data' in part['body']:
+                    body = legacy_strip_html(base64.urlsafe_b64decode(part['body']['data']).decode('utf-8'))
+                    break
+    elif 'body' in payload and 'data' in payload['body']:
+        body = base64.urlsafe_b64decode(payload['body']['data']).decode('utf-8')
+    return body.strip()[:5000] if body else ''
+
+
+def inflate(payload, factor: int):
+    """Large-message variant: repeat every leaf's content (newsletters routinely exceed 100 KB)."""
+    payload = copy.deepcopy(payload)
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        stack.extend(part.get('parts', []))
+        data = part.get('body', {}).get('data')
+        if data:
+            raw = base64.urlsafe_b64decode(data)
+            part['body']['data'] = base64.urlsafe_b64encode(raw * factor).decode()
+    return payload
+
+
+def run(fn, arg, repeat: int):
+    try:
+        fn(arg)
+    except Exception as e:
+        return None, type(e).__name__
+    seconds = min(timeit.repeat(lambda: fn(arg), number=repeat, repeat=3)) / repeat
+    return seconds, None
+
+
+def describe(body: str) -> str:
+    if not body:
+        return "empty body"
+    if '\x1b' in body or '\ufffd' in body:
+        return "mojibake"
+    if re.search(r'<[a-zA-Z!/][^>]*>', body):
+        return "raw HTML"
+    return "ok"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    corpus += [(f"{name} x50", inflate(payload, 50)) for name, payload in corpus]
+
+    print("Body extraction (Gmail 'full' payload -> body)")
+    print(f"{'fixture':<42}{'legacy us':>12}{'extractor us':>14}  {'legacy result':<20}extractor result")
+    for name, payload in corpus:
+        legacy, legacy_error = run(legacy_extract_body, payload, args.repeat)
+        new, _ = run(extract_body, payload, args.repeat)
+        legacy_cell = f"{legacy * 1e6:>12.1f}" if legacy is not None else f"{'-':>12}"
+        legacy_result = legacy_error or describe(legacy_extract_body(payload))
+        print(f"{name:<42}{legacy_cell}{new * 1e6:>14.1f}  {legacy_result:<20}{describe(extract_body(payload))}")
+
+    print()
+    print("HTML to text (first 5000 chars)")
+    print(f"{'fixture':<42}{'strip_html us':>14}{'html_to_text us':>17}{'speedup':>9}")
+    for name, payload in corpus:
+        html_part = next((p for p in iter_text_parts(payload) if p['mimeType'] == 'text/html'), None)
+        if html_part is None:
+            continue
+        html = decode_part(html_part['data'], html_part['charset'])
+        legacy, _ = run(lambda h: legacy_strip_html(h)[:5000], html, args.repeat)
+        new, _ = run(lambda h: html_to_text(h, 5000), html, args.repeat)
+        print(f"{name:<42}{legacy * 1e6:>14.1f}{new * 1e6:>17.1f}{legacy / new:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
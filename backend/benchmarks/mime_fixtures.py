@@ -0,0 +1,35 @@
+"""Load the .eml corpus in fixtures/ as Gmail API 'full' payloads."""
+import base64
+import email
+import os
+from email import policy
+from typing import Dict, List, Tuple
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def eml_to_gmail_payload(message) -> Dict:
+    """Mirror how Gmail's messages.get(format='full') exposes a MIME tree: transfer encodings
+    are undone, charsets are not, and leaf data is base64url."""
+    payload = {
+        "mimeType": message.get_content_type(),
+        "filename": message.get_filename() or "",
+        "headers": [{"name": name, "value": str(value)} for name, value in message.items()],
+        "body": {"size": 0},
+    }
+    if message.is_multipart():
+        payload["parts"] = [eml_to_gmail_payload(part) for part in message.iter_parts()]
+    else:
+        data = message.get_payload(decode=True) or b""
+        payload["body"] = {"size": len(data), "data": base64.urlsafe_b64encode(data).decode()}
+    return payload
+
+
+def load_fixture(name: str) -> Dict:
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        message = email.message_from_bytes(f.read(), policy=policy.default)
+    return eml_to_gmail_payload(message)
+
+
+def load_corpus() -> List[Tuple[str, Dict]]:
+    return [(name, load_fixture(name)) for name in sorted(os.listdir(FIXTURES_DIR)) if name.endswith(".eml")]
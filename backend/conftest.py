@@ -0,0 +1,81 @@
+import sys
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+class FakeCursor:
+    """Stands in for a Motor cursor: sort/skip/limit chain and are ignored, to_list returns docs."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, *_args, **_kwargs):
+        return self
+
+    def skip(self, _count):
+        return self
+
+    def limit(self, _limit):
+        return self
+
+    async def to_list(self, _length):
+        return self.docs
+
+
+class FakeSyncGmail:
+    """The GmailService surface SyncService uses. listed maps gmail id -> Date header; history replay adds
+    the ids in added; ids in failing fail to fetch once."""
+
+    def __init__(self, listed, history_expired=False, added=(), failing=()):
+        self.listed = listed
+        self.history_expired = history_expired
+        self.added = list(added)
+        self.failing = set(failing)
+        self.fetched = []
+        self.fetch_errors = {}
+
+    async def list_message_ids(self, query="", max_results=10):
+        return list(self.listed)[:max_results]
+
+    async def list_history(self, start_history_id):
+        from src.services.gmail_service import HistoryExpiredError
+        if self.history_expired:
+            raise HistoryExpiredError(start_history_id)
+        return list(self.added), [], str(int(start_history_id) + 100)
+
+    async def get_profile(self):
+        return {"historyId": "300"}
+
+    async def fetch_messages(self, message_ids):
+        self.fetched.append(list(message_ids))
+        self.fetch_errors = {message_id: "HTTP 500" for message_id in message_ids if message_id in self.failing}
+        self.failing -= set(self.fetch_errors)
+        return [{"gmail_id": message_id, "received_at": self.listed[message_id]}
+                for message_id in message_ids if message_id not in self.fetch_errors]
+
+
+@pytest.fixture
+def synced_user(monkeypatch):
+    """Runs SyncService.sync_user against a users document held in memory and returns it afterwards."""
+    from src.services.sync_service import SyncService
+    users = {}
+
+    async def update_one(query, update):
+        users[query["_id"]].update(update["$set"])
+
+    database = MagicMock()
+    database.users.update_one = update_one
+    monkeypatch.setattr("src.services.sync_service.db", MagicMock(get_db=lambda: database))
+    monkeypatch.setattr("src.services.sync_service.SyncService.upsert_emails", AsyncMock(return_value=0))
+    monkeypatch.setattr("src.services.sync_service.SyncService.delete_emails", AsyncMock(return_value=0))
+
+    async def sync(user, gmail, **kwargs):
+        users[ObjectId(user["_id"])] = dict(user)
+        await SyncService.sync_user(user, gmail, **kwargs)
+        return users[ObjectId(user["_id"])]
+    return sync
@@ -6,6 +6,11 @@ from src.routes.email_routes import router as email_router
 from src.routes.analytics_routes import router as analytics_router
 from src.routes.gmail_routes import router as gmail_router
 from src.routes.collection_routes import router as collection_router
+from src.services.backfill_service import BackfillService
+from src.services.enrichment_service import EnrichmentService
+from src.services.analytics_rollup import AnalyticsRollup
+from src.services.gmail_transport import close_http_client
+from src.services.llm_client import init_llm_clients, close_llm_clients
 
 app = FastAPI(title="Sendra API", redirect_slashes=False)
 
@@ -22,10 +27,18 @@ app.add_middleware(
 @app.on_event("startup")
 async def startup_event():
     await db.connect_db()
+    init_llm_clients()
+    EnrichmentService.start()
+    AnalyticsRollup.start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    await BackfillService.shutdown()
+    await EnrichmentService.shutdown()
+    await AnalyticsRollup.shutdown()
+    await close_http_client()
+    await close_llm_clients()
     await db.close_db()
 
 
@@ -0,0 +1,70 @@
+"""Backfill precomputed fields (application_status, received_date, company) on collection emails
+stored before they were computed at ingest.
+
+Run from backend/:  python -m migrations.backfill_collection_fields
+Idempotent: collections whose emails already carry received_date are skipped, and a collection
+modified while it is being migrated is left for the next run rather than overwritten.
+"""
+import asyncio
+from typing import Dict
+from pymongo import UpdateOne
+from src.database import db
+from src.services.email_documents import collection_email_fields
+
+BATCH_SIZE = 100
+
+
+def _needs_backfill(email: Dict) -> bool:
+    return "received_date" not in email or "application_status" not in email or "company" not in email
+
+
+async def backfill_collection_fields() -> Dict[str, int]:
+    collections = db.get_db().collections
+    cursor = collections.find(
+        {"emails": {"$elemMatch": {"$or": [
+            {"received_date": {"$exists": False}},
+            {"application_status": {"$exists": False}},
+            {"company": {"$exists": False}},
+        ]}}},
+        {"emails": 1, "updated_at": 1}
+    )
+    scanned = updated = emails_updated = 0
+    operations = []
+
+    async def flush():
+        nonlocal updated
+        if operations:
+            result = await collections.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+            operations.clear()
+
+    async for collection in cursor:
+        scanned += 1
+        emails = collection.get("emails", []) or []
+        migrated = []
+        for email in emails:
+            if _needs_backfill(email):
+                email = {**email, **collection_email_fields(email)}
+                emails_updated += 1
+            migrated.append(email)
+        operations.append(UpdateOne(
+            # Guard on updated_at so emails added concurrently aren't lost
+            {"_id": collection["_id"], "updated_at": collection.get("updated_at")},
+            {"$set": {"emails": migrated}}
+        ))
+        if len(operations) >= BATCH_SIZE:
+            await flush()
+    await flush()
+    return {"collections_scanned": scanned, "collections_updated": updated, "emails_updated": emails_updated}
+
+
+async def main():
+    await db.connect_db()
+    try:
+        print(f"Backfilled collection email fields: {await backfill_collection_fields()}")
+    finally:
+        await db.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
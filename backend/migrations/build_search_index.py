@@ -0,0 +1,32 @@
+"""Build the local search index (GET /emails/search) for users whose emails predate it.
+
+Run from backend/:  python -m migrations.build_search_index [user_id ...]
+Each user's index is dropped and rebuilt from the emails and collections collections, so re-running
+is safe; without arguments every user is rebuilt.
+"""
+import asyncio
+import sys
+from typing import Dict, List
+from src.database import db
+from src.services.search_index import SearchIndex
+
+
+async def build_search_index(user_ids: List[str]) -> Dict[str, int]:
+    if not user_ids:
+        user_ids = [str(user["_id"]) async for user in db.get_db().users.find({}, {"_id": 1})]
+    indexed = 0
+    for user_id in user_ids:
+        indexed += await SearchIndex.rebuild(user_id)
+    return {"users": len(user_ids), "entries_indexed": indexed}
+
+
+async def main():
+    await db.connect_db()
+    try:
+        print(f"Built search index: {await build_search_index(sys.argv[1:])}")
+    finally:
+        await db.close_db()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
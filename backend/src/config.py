@@ -4,6 +4,7 @@ from typing import Optional
 class Settings(BaseSettings):
     # MongoDB
     mongodb_uri: str = "mongodb://mongo:27017/sendra-emails"
+    mongodb_ensure_indexes: bool = True  # create the indexes declared in src/indexes.py on startup
     
     # Google OAuth
     google_client_id: str
@@ -16,12 +17,79 @@ class Settings(BaseSettings):
     anthropic_api_key: Optional[str] = None
     gemini_api_key: Optional[str] = None
     llm_model: str = "gemini-2.5-flash"  # or "gpt-3.5-turbo", "claude-3-sonnet-20240229"
+    openai_timeout: float = 30  # seconds per OpenAI request
+    anthropic_timeout: float = 30  # seconds per Anthropic request
+    gemini_timeout: float = 30  # seconds per Gemini request
+    llm_max_retries: int = 2  # SDK-level retries on connection errors and 429/5xx
+    llm_max_connections: int = 20  # pooled keep-alive connections per provider
+    gemini_executor_workers: int = 8  # threads dedicated to blocking Gemini calls
+    query_cache_enabled: bool = True  # reuse prompt -> Gmail query translations
+    query_cache_ttl_seconds: int = 86400
+    query_cache_max_entries: int = 5000  # least recently used entries are evicted past this
+    query_cache_similarity_enabled: bool = True  # also match near-identical prompts
+    query_cache_similarity_threshold: float = 0.85  # trigram cosine needed for a similarity hit
+    llm_extraction_batch_size: int = 20  # emails per metadata extraction prompt
+    llm_extraction_token_budget: int = 6000  # estimated input tokens per extraction prompt
+    llm_extraction_body_chars: int = 1000  # body characters sent per email
+    llm_extraction_output_tokens_per_email: int = 120
+    llm_extraction_retries: int = 2  # re-asks for items that came back missing or invalid
+    llm_extraction_concurrency: int = 4  # extraction prompts in flight at once
+    classifier_confidence_threshold: float = 0.9  # rule-based status confidence that skips the LLM
+    extraction_dedup_enabled: bool = True  # reuse extractions of near-duplicate (templated) emails
+    extraction_dedup_max_distance: int = 3  # SimHash bits two emails may differ by (at most 3, see BAND_COUNT)
     
     # Security
     secret_key: str
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
     
+    # Gmail
+    gmail_batch_size: int = 50  # message gets per batch HTTP request (Gmail caps this at 100)
+    gmail_batch_retries: int = 2  # re-batch attempts for messages that failed with a retryable status
+    gmail_fetch_mode: str = "batch"  # batch or concurrent
+    gmail_fetch_concurrency: int = 10  # max in-flight messages.get calls per fetch in concurrent mode
+    gmail_stream_buffer: int = 10  # parsed messages a streaming fetch holds for a slow reader before pausing
+    gmail_quota_units_per_second: float = 250  # Gmail per-user quota; messages.get costs 5 units
+    gmail_max_retries: int = 5  # backoff attempts on 429 / 403 rateLimitExceeded
+    gmail_transport: str = "httpx"  # httpx (async, pooled) or googleapiclient (blocking, via threads)
+    gmail_max_connections: int = 100  # shared httpx pool size across all users
+    gmail_client_pool_size: int = 256  # per-user Gmail clients kept warm (LRU)
+    gmail_http_timeout: int = 60  # seconds, per Gmail HTTP request
+    message_cache_enabled: bool = True  # persist parsed messages in Mongo, keyed by (user_id, gmail_id)
+    message_cache_memory_size: int = 5000  # in-process LRU entries in front of the Mongo cache
+    backfill_page_size: int = 500  # messages.list page size (Gmail max)
+    backfill_chunk_size: int = 50  # messages fetched and written per bulk_write during backfill
+    natural_query_local_enabled: bool = True  # answer /gmail/natural-query from synced emails where they cover it
+    natural_query_freshness_seconds: int = 900  # a sync this recent counts as covering up to now
+
+    # Email listing
+    emails_count_limit: int = 10000  # GET /emails?cursor=true counts first-page totals up to this
+    
+    # Enrichment
+    enrichment_enabled: bool = True  # queue newly synced emails for LLM metadata extraction
+    enrichment_workers: int = 2  # concurrent enrichment workers per process
+    enrichment_claim_size: int = 20  # jobs claimed (and extracted together) per worker iteration
+    enrichment_max_attempts: int = 5  # failures before a job is moved to the dead state
+    enrichment_retry_base_seconds: int = 30  # backoff doubles per failed attempt
+    enrichment_lease_seconds: int = 300  # processing jobs older than this are reclaimed
+    enrichment_poll_seconds: int = 5  # idle workers re-check the queue this often
+
+    # Analytics
+    analytics_rollups_enabled: bool = True  # serve /analytics from materialized user_analytics documents
+    analytics_reconcile_seconds: int = 3600  # rollups are rebuilt from raw documents this often
+    response_cache_enabled: bool = True  # cache /analytics responses per user, with ETags
+    response_cache_backend: str = "memory"  # memory (per process) or mongo (shared across workers)
+    response_cache_ttl_seconds: int = 300  # bounds staleness of time-relative figures (predictive insights)
+    response_cache_memory_size: int = 2000  # in-process LRU entries
+
+    # Search
+    search_enabled: bool = True  # maintain the local BM25 index behind GET /emails/search
+    search_body_chars: int = 20000  # body characters indexed per email
+    search_prefix_expansions: int = 20  # indexed terms a trailing prefix expands to (most frequent first)
+    search_max_candidates: int = 5000  # matching entries scored per query
+    search_bm25_k1: float = 1.2
+    search_bm25_b: float = 0.75
+    
     # Server
     backend_url: str = "http://localhost:8000"
     frontend_url: str = "http://localhost:3000"
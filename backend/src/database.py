@@ -1,5 +1,6 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from src.config import settings
+from src.indexes import ensure_indexes
 
 class Database:
     client: AsyncIOMotorClient = None
@@ -8,6 +9,9 @@ class Database:
     async def connect_db(cls):
         cls.client = AsyncIOMotorClient(settings.mongodb_uri)
         print("Connected to MongoDB")
+        if settings.mongodb_ensure_indexes:
+            created = await ensure_indexes(cls.get_db())
+            print(f"DEBUG: ensured {sum(len(names) for names in created.values())} indexes")
     
     @classmethod
     async def close_db(cls):
@@ -0,0 +1,151 @@
+"""Explain the queries behind each route and flag the ones that scan a whole collection.
+
+Run from backend/:  python -m src.index_audit [user_id]
+Plans are taken for the given user (default: the first user found); the exit status is 1 when any
+winning plan contains a COLLSCAN, so the audit can gate CI against a seeded database.
+"""
+import asyncio
+import sys
+from datetime import datetime
+from typing import Dict, List, Set
+from bson import ObjectId
+from src.database import db
+from src.services.analytics_service import AnalyticsService
+
+
+def audited_queries(user_id: str) -> List[Dict]:
+    """(route, collection, find filter + sort or aggregation pipeline) mirroring the queries the code runs."""
+    now = datetime.utcnow()
+    owner = AnalyticsService._collections_owner(user_id)
+    return [
+        {"route": "GET /emails", "collection": "emails",
+         "filter": {"user_id": user_id}, "sort": [("received_at", -1)]},
+        {"route": "GET /emails?status=", "collection": "emails",
+         "filter": {"user_id": user_id, "application_status": "interview"}, "sort": [("received_at", -1)]},
+        {"route": "GET /emails?company=", "collection": "emails",
+         "filter": {"user_id": user_id, "company": "Acme"}, "sort": [("received_at", -1)]},
+        {"route": "GET /emails?language=&after=", "collection": "emails",
+         "filter": {"$and": [{"user_id": user_id, "language": "de"}, {"$or": [
+             {"received_at": {"$lt": now}}, {"received_at": now, "_id": {"$lt": ObjectId()}}
+         ]}]},
+         "sort": [("received_at", -1), ("_id", -1)]},
+        {"route": "GET /emails?after=", "collection": "emails",
+         "filter": {"$and": [{"user_id": user_id}, {"$or": [
+             {"received_at": {"$lt": now}}, {"received_at": now, "_id": {"$lt": ObjectId()}}
+         ]}]},
+         "sort": [("received_at", -1), ("_id", -1)]},
+        {"route": "POST /gmail/sync", "collection": "emails",
+         "filter": {"user_id": user_id, "gmail_id": {"$in": ["0"]}}},
+        {"route": "POST /gmail/enrichment", "collection": "emails",
+         "filter": {"user_id": user_id, "enriched_at": None}},
+        {"route": "GET /analytics/dashboard-summary (emails)", "collection": "emails",
+         "pipeline": AnalyticsService._email_facets_pipeline(user_id)},
+        {"route": "GET /analytics/dashboard-summary (collections)", "collection": "collections",
+         "pipeline": AnalyticsService._collection_emails_pipeline(
+             user_id, ["received_date", "application_status"], AnalyticsService._timeline_stages())},
+        {"route": "GET /emails/search", "collection": "search_documents",
+         "filter": {"user_id": user_id, "terms": {"$in": ["interview", "offer"]}}},
+        {"route": "GET /emails/search (prefix)", "collection": "search_terms",
+         "filter": {"user_id": user_id, "term": {"$gte": "interv", "$lt": "interv\uffff"}}, "sort": [("df", -1)]},
+        {"route": "GET /collections", "collection": "collections",
+         "filter": {"user_id": owner}, "sort": [("created_at", -1)]},
+        {"route": "GET /auth/google/callback", "collection": "users",
+         "filter": {"google_id": "0"}},
+        {"route": "enrichment claim", "collection": "enrichment_jobs",
+         "filter": {"$or": [{"status": "pending", "next_attempt_at": {"$lte": now}},
+                            {"status": "processing", "locked_at": {"$lt": now}}]},
+         "sort": [("next_attempt_at", 1)]},
+        {"route": "GET /gmail/enrichment", "collection": "enrichment_jobs",
+         "pipeline": [{"$match": {"user_id": user_id}}, {"$group": {"_id": "$status", "count": {"$sum": 1}}}]},
+        {"route": "message cache", "collection": "message_cache",
+         "filter": {"user_id": user_id, "gmail_id": {"$in": ["0"]}, "format": {"$in": ["full"]}}},
+        {"route": "query cache", "collection": "llm_query_cache",
+         "filter": {"key": "0", "created_at": {"$gte": now}}},
+        {"route": "extraction dedup", "collection": "extraction_fingerprints",
+         "filter": {"bands": {"$in": ["0:0"]}}},
+        {"route": "POST /gmail/backfill", "collection": "backfill_jobs",
+         "filter": {"user_id": user_id}},
+    ]
+
+
+def _winning_values(explain: Dict, field: str) -> Set[str]:
+    """Every string value of field in an explain() result, rejected plans excluded.
+    Handles find and aggregate explains, classic and slot-based engines."""
+    values: Set[str] = set()
+
+    def walk(node):
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if key == field and isinstance(value, str):
+                    values.add(value)
+                walk(value)
+        elif isinstance(node, list):
+            for item in node:
+                walk(item)
+
+    walk(explain)
+    return values
+
+
+def plan_stages(explain: Dict) -> Set[str]:
+    return _winning_values(explain, "stage")
+
+
+def plan_indexes(explain: Dict) -> Set[str]:
+    return _winning_values(explain, "indexName")
+
+
+async def explain(query: Dict) -> Dict:
+    database = db.get_db()
+    if "pipeline" in query:
+        return await database.command("aggregate", query["collection"], pipeline=query["pipeline"], explain=True)
+    cursor = database[query["collection"]].find(query["filter"])
+    if query.get("sort"):
+        cursor = cursor.sort(query["sort"])
+    return await cursor.explain()
+
+
+async def audit(user_id: str) -> List[Dict]:
+    results = []
+    for query in audited_queries(user_id):
+        try:
+            plan = await explain(query)
+            stages = plan_stages(plan)
+            results.append({
+                "route": query["route"],
+                "collection": query["collection"],
+                "collscan": "COLLSCAN" in stages,
+                "indexes": sorted(plan_indexes(plan)),
+                "stages": sorted(stages),
+            })
+        except Exception as e:
+            results.append({"route": query["route"], "collection": query["collection"], "error": str(e)})
+    return results
+
+
+async def main():
+    await db.connect_db()
+    try:
+        if len(sys.argv) > 1:
+            user_id = sys.argv[1]
+        else:
+            user = await db.get_db().users.find_one({}, {"_id": 1})
+            user_id = str(user["_id"]) if user else "000000000000000000000000"
+        results = await audit(user_id)
+    finally:
+        await db.close_db()
+
+    for result in results:
+        if "error" in result:
+            status, detail = "ERROR", result["error"]
+        else:
+            status = "COLLSCAN" if result["collscan"] else "OK"
+            detail = ", ".join(result["indexes"]) or ", ".join(result["stages"])
+        print(f"{status:<9} {result['route']:<48} {result['collection']:<24} {detail}")
+    return 1 if any(result.get("collscan") for result in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,82 @@
+from typing import Dict, List, Tuple
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# collection -> (keys, options) for every index the queries in routes and services rely on
+INDEXES: Dict[str, List[Tuple[List[Tuple[str, int]], Dict]]] = {
+    "users": [
+        ([("google_id", ASCENDING)], {"unique": True}),
+    ],
+    "emails": [
+        # Sync upserts, enrichment writes and history deletes
+        ([("user_id", ASCENDING), ("gmail_id", ASCENDING)], {"unique": True}),
+        # GET /emails listing, newest first; _id breaks received_at ties for cursor pages
+        ([("user_id", ASCENDING), ("received_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # GET /emails filters
+        ([("user_id", ASCENDING), ("application_status", ASCENDING), ("received_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("company", ASCENDING), ("received_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("position", ASCENDING), ("received_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("job_type", ASCENDING), ("received_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("language", ASCENDING), ("received_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # Enrichment: emails not enriched yet
+        ([("user_id", ASCENDING), ("enriched_at", ASCENDING)], {}),
+    ],
+    "collections": [
+        ([("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "message_cache": [
+        ([("user_id", ASCENDING), ("gmail_id", ASCENDING)], {"unique": True}),
+    ],
+    "llm_query_cache": [
+        ([("key", ASCENDING)], {"unique": True}),
+        ([("scope", ASCENDING), ("last_used_at", DESCENDING)], {}),
+        # Eviction of the least recently used entries
+        ([("last_used_at", ASCENDING)], {}),
+    ],
+    "enrichment_jobs": [
+        ([("user_id", ASCENDING), ("gmail_id", ASCENDING)], {"unique": True}),
+        # Claims: due pending jobs and expired processing leases
+        ([("status", ASCENDING), ("next_attempt_at", ASCENDING)], {}),
+        ([("status", ASCENDING), ("locked_at", ASCENDING)], {}),
+        ([("user_id", ASCENDING), ("status", ASCENDING)], {}),
+    ],
+    "extraction_fingerprints": [
+        ([("fingerprint", ASCENDING)], {"unique": True}),
+        ([("bands", ASCENDING)], {}),
+    ],
+    "backfill_jobs": [
+        ([("user_id", ASCENDING)], {}),
+    ],
+    "search_documents": [
+        # Inverted index: multikey over each entry's terms
+        ([("user_id", ASCENDING), ("terms", ASCENDING)], {}),
+        ([("user_id", ASCENDING), ("source", ASCENDING), ("gmail_id", ASCENDING)], {}),
+        ([("user_id", ASCENDING), ("collection_id", ASCENDING)], {}),
+    ],
+    "search_terms": [
+        # Document frequencies and prefix expansion (a range scan on term)
+        ([("user_id", ASCENDING), ("term", ASCENDING)], {"unique": True}),
+        ([("user_id", ASCENDING), ("df", ASCENDING)], {}),
+    ],
+    "response_cache": [
+        # TTL: Mongo drops entries once expires_at has passed
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+
+async def ensure_indexes(database) -> Dict[str, List[str]]:
+    """Create every declared index; existing ones are left alone, so this is safe on each startup.
+    A failing index (e.g. a unique index over duplicate data) is reported and skipped.
+    Returns the index names per collection.
+    """
+    created: Dict[str, List[str]] = {}
+    for collection, indexes in INDEXES.items():
+        created[collection] = []
+        for keys, options in indexes:
+            try:
+                names = await database[collection].create_indexes([IndexModel(keys, **options)])
+                created[collection].extend(names)
+            except OperationFailure as e:
+                print(f"Error creating index {keys} on {collection}: {e}")
+    return created
@@ -36,6 +36,8 @@ class EmailModel(BaseModel):
     application_status: Optional[str] = None  # e.g., "applied", "interview", "offer", "rejected"
     salary: Optional[str] = None  # e.g., "100k-120k"
     experience_level: Optional[str] = None  # e.g., "junior", "mid", "senior"
+    key_skills: List[str] = []
+    enriched_at: Optional[datetime] = None  # set once LLM metadata extraction has run
     tags: List[str] = []
     starred: bool = False
     read: bool = False
@@ -57,7 +59,13 @@ class UserModel(BaseModel):
     avatar: Optional[str] = None
     gmail_access_token: Optional[str] = None
     gmail_refresh_token: Optional[str] = None
+    gmail_history_id: Optional[str] = None  # mailbox historyId checkpoint for incremental sync
+    sync_retry_ids: List[str] = []  # messages the last sync failed to fetch, fetched again by the next one
     last_synced_at: Optional[datetime] = None
+    # Range the emails collection holds completely (coverage_complete: back to the first message)
+    coverage_since: Optional[datetime] = None
+    coverage_until: Optional[datetime] = None
+    coverage_complete: bool = False
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -87,6 +95,10 @@ class CollectionEmail(BaseModel):
     body: Optional[str] = None
     # Accept string timestamps from Gmail API without strict parsing
     received_at: Optional[str] = None
+    # Precomputed at ingest (see email_documents.collection_email_fields)
+    application_status: Optional[str] = None
+    received_date: Optional[datetime] = None
+    company: Optional[str] = None
 
     class Config:
         populate_by_name = True
@@ -1,60 +1,78 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from typing import Optional
+from src.config import settings
 from src.dependencies import get_current_user
 from src.services.analytics_service import AnalyticsService
+from src.services.analytics_rollup import AnalyticsRollup
+from src.services.response_cache import response_cache
 
 router = APIRouter(prefix="/analytics", tags=["analytics"])
 
 
+def _analytics():
+    # Rollups answer from one precomputed document; AnalyticsService aggregates the raw documents
+    return AnalyticsRollup if settings.analytics_rollups_enabled else AnalyticsService
+
+
 @router.get("/dashboard-summary")
-async def dashboard_summary(current_user: dict = Depends(get_current_user)):
+async def dashboard_summary(request: Request, current_user: dict = Depends(get_current_user)):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_dashboard_summary(user_id)
+    return await response_cache.respond(request, user_id, "dashboard-summary", {},
+                                        lambda: _analytics().get_dashboard_summary(user_id))
 
 
 @router.get("/by-status")
-async def by_status(current_user: dict = Depends(get_current_user)):
+async def by_status(request: Request, current_user: dict = Depends(get_current_user)):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_emails_by_application_status(user_id)
+    return await response_cache.respond(request, user_id, "by-status", {},
+                                        lambda: _analytics().get_emails_by_application_status(user_id))
 
 
 @router.get("/by-job-type")
-async def by_job_type(current_user: dict = Depends(get_current_user)):
+async def by_job_type(request: Request, current_user: dict = Depends(get_current_user)):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_emails_by_job_type(user_id)
+    return await response_cache.respond(request, user_id, "by-job-type", {},
+                                        lambda: _analytics().get_emails_by_job_type(user_id))
 
 
 @router.get("/by-experience")
-async def by_experience(current_user: dict = Depends(get_current_user)):
+async def by_experience(request: Request, current_user: dict = Depends(get_current_user)):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_emails_by_experience_level(user_id)
+    return await response_cache.respond(request, user_id, "by-experience", {},
+                                        lambda: _analytics().get_emails_by_experience_level(user_id))
 
 
 @router.get("/application-funnel")
-async def application_funnel(current_user: dict = Depends(get_current_user)):
+async def application_funnel(request: Request, current_user: dict = Depends(get_current_user)):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_application_funnel(user_id)
+    return await response_cache.respond(request, user_id, "application-funnel", {},
+                                        lambda: _analytics().get_application_funnel(user_id))
 
 
 @router.get("/top-companies")
 async def top_companies(
+    request: Request,
     limit: int = Query(10, ge=1, le=50),
     current_user: dict = Depends(get_current_user),
 ):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_top_companies(user_id, limit)
+    return await response_cache.respond(request, user_id, "top-companies", {"limit": limit},
+                                        lambda: _analytics().get_top_companies(user_id, limit))
 
 
 @router.get("/top-positions")
 async def top_positions(
+    request: Request,
     limit: int = Query(10, ge=1, le=50),
     current_user: dict = Depends(get_current_user),
 ):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_top_positions(user_id, limit)
+    return await response_cache.respond(request, user_id, "top-positions", {"limit": limit},
+                                        lambda: _analytics().get_top_positions(user_id, limit))
 
 
 @router.get("/stats")
-async def stats(current_user: dict = Depends(get_current_user)):
+async def stats(request: Request, current_user: dict = Depends(get_current_user)):
     user_id = current_user["_id"]
-    return await AnalyticsService.get_email_stats(user_id)
+    return await response_cache.respond(request, user_id, "stats", {},
+                                        lambda: _analytics().get_email_stats(user_id))
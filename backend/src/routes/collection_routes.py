@@ -2,14 +2,49 @@ from fastapi import APIRouter, Depends, HTTPException
 from typing import List
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
 
 from src.dependencies import get_current_user
 from src.database import db
 from src.models import CollectionModel, CollectionEmail
+from src.services.gmail_service import GmailService
+from src.services.email_documents import collection_email_fields
+from src.services.analytics_rollup import AnalyticsRollup, COLLECTION_ROLLUP_PROJECTION
+from src.services.search_index import SearchIndex
 
 router = APIRouter(prefix="/collections", tags=["collections"])
 
 
+async def _with_full_bodies(emails_payload: List[dict], current_user: dict) -> List[dict]:
+    """Swap snippet bodies from metadata-only search results for full bodies before storing."""
+    snippet_ids = [
+        e["gmail_id"] for e in emails_payload
+        if isinstance(e, dict) and e.get("format") == "metadata" and e.get("gmail_id")
+    ]
+    if not snippet_ids or not current_user.get("gmail_access_token"):
+        return emails_payload
+    gmail = GmailService(
+        access_token=current_user["gmail_access_token"],
+        refresh_token=current_user.get("gmail_refresh_token"),
+        user_id=str(current_user["_id"])
+    )
+    try:
+        full = {email["gmail_id"]: email for email in await gmail.fetch_messages(snippet_ids)}
+    except Exception as e:
+        print(f"Error loading full bodies for collection emails: {e}")
+        return emails_payload
+    return [
+        {**email, "body": full[email["gmail_id"]]["body"], "format": "full"}
+        if isinstance(email, dict) and email.get("gmail_id") in full else email
+        for email in emails_payload
+    ]
+
+
+def _validate_email(email: dict) -> CollectionEmail:
+    validated = CollectionEmail(**email)
+    return validated.model_copy(update=collection_email_fields(validated.model_dump(by_alias=True)))
+
+
 @router.get("")
 async def list_collections(current_user: dict = Depends(get_current_user)) -> List[dict]:
     # current_user["_id"] is a string from get_current_user, convert back to ObjectId for query
@@ -61,7 +96,8 @@ async def create_collection(payload: dict, current_user: dict = Depends(get_curr
     if not isinstance(emails_payload, list) or len(emails_payload) == 0:
         raise HTTPException(status_code=400, detail="At least one email is required")
 
-    validated_emails: List[CollectionEmail] = [CollectionEmail(**email) for email in emails_payload]
+    emails_payload = await _with_full_bodies(emails_payload, current_user)
+    validated_emails: List[CollectionEmail] = [_validate_email(email) for email in emails_payload]
     print(f"DEBUG: Validated {len(validated_emails)} emails")
 
     collection = CollectionModel(
@@ -74,6 +110,8 @@ async def create_collection(payload: dict, current_user: dict = Depends(get_curr
 
     result = await db.get_db().collections.insert_one(collection.model_dump(by_alias=True))
     dumped = collection.model_dump(by_alias=True)
+    await AnalyticsRollup.record_collection_emails(user_id_str, dumped["emails"])
+    await SearchIndex.index_collection_emails(user_id_str, result.inserted_id, dumped["emails"])
     print(f"DEBUG: Dumped model keys: {list(dumped.keys())}")
     print(f"DEBUG: user_id in dumped: {dumped.get('user_id')} (type: {type(dumped.get('user_id')).__name__})")
     print(f"DEBUG: Inserted collection with id {result.inserted_id}")
@@ -95,30 +133,45 @@ async def add_emails_to_collection(collection_id: str, payload: dict, current_us
     if not isinstance(emails_payload, list) or len(emails_payload) == 0:
         raise HTTPException(status_code=400, detail="At least one email is required")
 
+    emails_payload = await _with_full_bodies(emails_payload, current_user)
     try:
-        validated_emails: List[CollectionEmail] = [CollectionEmail(**email) for email in emails_payload]
+        validated_emails: List[CollectionEmail] = [_validate_email(email) for email in emails_payload]
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid email payload: {e}")
 
     # Avoid duplicates by gmail_id when present
+    dumped_emails = [email.model_dump(by_alias=True) for email in validated_emails]
     update_doc = {
         "$addToSet": {
-            "emails": {"$each": [email.model_dump(by_alias=True) for email in validated_emails]}
+            "emails": {"$each": dumped_emails}
         },
         "$set": {"updated_at": datetime.utcnow()}
     }
 
     try:
-        result = await db.get_db().collections.update_one(
+        before = await db.get_db().collections.find_one_and_update(
             {"_id": ObjectId(collection_id), "user_id": user_id},
-            update_doc
+            update_doc,
+            projection=COLLECTION_ROLLUP_PROJECTION,
+            return_document=ReturnDocument.BEFORE
         )
     except Exception:
         raise HTTPException(status_code=404, detail="Invalid collection id")
 
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Collection not found")
 
+    # $addToSet skips exact duplicates; replay it (bodies aside) to count only what was added
+    present = before.get("emails", [])
+    added = []
+    for email in dumped_emails:
+        without_body = {key: value for key, value in email.items() if key != "body"}
+        if without_body not in present:
+            present.append(without_body)
+            added.append(email)
+    await AnalyticsRollup.record_collection_emails(user_id, added)
+    await SearchIndex.index_collection_emails(user_id, collection_id, added)
+
     updated = await db.get_db().collections.find_one({"_id": ObjectId(collection_id), "user_id": user_id})
     if updated and "_id" in updated:
         updated["_id"] = str(updated["_id"])
@@ -131,16 +184,22 @@ async def add_emails_to_collection(collection_id: str, payload: dict, current_us
 async def delete_email_from_collection(collection_id: str, gmail_id: str, current_user: dict = Depends(get_current_user)) -> dict:
     user_id = ObjectId(current_user["_id"]) if isinstance(current_user["_id"], str) else current_user["_id"]
     try:
-        result = await db.get_db().collections.update_one(
+        before = await db.get_db().collections.find_one_and_update(
             {"_id": ObjectId(collection_id), "user_id": user_id},
-            {"$pull": {"emails": {"gmail_id": gmail_id}}, "$set": {"updated_at": datetime.utcnow()}}
+            {"$pull": {"emails": {"gmail_id": gmail_id}}, "$set": {"updated_at": datetime.utcnow()}},
+            projection=COLLECTION_ROLLUP_PROJECTION,
+            return_document=ReturnDocument.BEFORE
         )
     except Exception:
         raise HTTPException(status_code=404, detail="Invalid collection id")
 
-    if result.matched_count == 0:
+    if before is None:
         raise HTTPException(status_code=404, detail="Collection not found")
 
+    removed = [email for email in before.get("emails", []) if email.get("gmail_id") == gmail_id]
+    await AnalyticsRollup.record_collection_emails(user_id, removed, sign=-1)
+    await SearchIndex.remove_collection_emails(user_id, collection_id, [gmail_id])
+
     updated = await db.get_db().collections.find_one({"_id": ObjectId(collection_id), "user_id": user_id})
     if updated and "_id" in updated:
         updated["_id"] = str(updated["_id"])
@@ -153,12 +212,18 @@ async def delete_email_from_collection(collection_id: str, gmail_id: str, curren
 async def delete_collection(collection_id: str, current_user: dict = Depends(get_current_user)) -> dict:
     user_id = ObjectId(current_user["_id"]) if isinstance(current_user["_id"], str) else current_user["_id"]
     try:
-        result = await db.get_db().collections.delete_one({"_id": ObjectId(collection_id), "user_id": user_id})
+        deleted = await db.get_db().collections.find_one_and_delete(
+            {"_id": ObjectId(collection_id), "user_id": user_id},
+            projection=COLLECTION_ROLLUP_PROJECTION
+        )
     except Exception:
         raise HTTPException(status_code=404, detail="Invalid collection id")
     
-    if result.deleted_count == 0:
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Collection not found")
     
+    await AnalyticsRollup.record_collection_emails(user_id, deleted.get("emails", []), sign=-1)
+    await SearchIndex.remove_collection_emails(user_id, collection_id)
+
     print(f"DEBUG: Deleted collection {collection_id} for user {user_id}")
     return {"message": "Collection deleted", "id": collection_id}
@@ -1,13 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from typing import List, Optional
 from src.models import EmailModel
+from src.config import settings
 from src.database import db
 from src.dependencies import get_current_user
+from src.services.gmail_service import GmailService
+from src.services.analytics_rollup import AnalyticsRollup, EMAIL_ROLLUP_FIELDS
+from src.services.search_index import SearchIndex
 from bson import ObjectId
 from datetime import datetime
+import base64
+import json
 
 router = APIRouter(prefix="/emails", tags=["emails"])
 
+def _encode_cursor(email: dict) -> str:
+    """Opaque token for the position right after email in (received_at, _id) descending order."""
+    position = json.dumps({"r": email["received_at"].isoformat(), "i": str(email["_id"])})
+    return base64.urlsafe_b64encode(position.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(token: str) -> dict:
+    """Range filter selecting the emails after the cursor position."""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        received_at = datetime.fromisoformat(position["r"])
+        email_id = ObjectId(position["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"$or": [
+        {"received_at": {"$lt": received_at}},
+        {"received_at": received_at, "_id": {"$lt": email_id}},
+    ]}
+
+
+async def _first_page_total(user_id: str, query_filter: dict) -> dict:
+    """Total for the first cursor page: from the analytics rollup when it can answer the filter,
+    else counted up to emails_count_limit."""
+    filters = {key: value for key, value in query_filter.items() if key != "user_id"}
+    total = await AnalyticsRollup.count_emails(user_id, filters)
+    if total is not None:
+        return {"total": total, "total_is_estimate": True}
+    total = await db.get_db().emails.count_documents(query_filter, limit=settings.emails_count_limit)
+    return {"total": total, "total_is_estimate": total >= settings.emails_count_limit}
+
+
 @router.get("/")
 async def get_emails(
     language: Optional[str] = None,
@@ -17,6 +54,8 @@ async def get_emails(
     job_type: Optional[str] = None,
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
+    cursor: bool = Query(False, description="Keyset pagination: page with `after` instead of `page`"),
+    after: Optional[str] = Query(None, description="`next` token of the previous cursor page"),
     current_user: dict = Depends(get_current_user)
 ):
     query_filter = {"user_id": current_user["_id"]}
@@ -32,6 +71,22 @@ async def get_emails(
     if job_type:
         query_filter["job_type"] = job_type
     
+    if cursor or after:
+        # Range scan on (user_id, [filter], received_at, _id) instead of skipping; no count past the first page
+        page_filter = {"$and": [query_filter, _decode_cursor(after)]} if after else query_filter
+        emails = await db.get_db().emails.find(page_filter).sort(
+            [("received_at", -1), ("_id", -1)]
+        ).limit(limit + 1).to_list(limit + 1)
+        has_more = len(emails) > limit
+        emails = emails[:limit]
+        pagination = {
+            "limit": limit,
+            "next": _encode_cursor(emails[-1]) if has_more else None,
+        }
+        if not after:
+            pagination.update(await _first_page_total(current_user["_id"], query_filter))
+        return {"emails": emails, "pagination": pagination}
+
     skip = (page - 1) * limit
     
     emails = await db.get_db().emails.find(query_filter).sort("received_at", -1).skip(skip).limit(limit).to_list(limit)
@@ -47,6 +102,42 @@ async def get_emails(
         }
     }
 
+@router.get("/search")
+async def search_emails(
+    q: str = Query(..., min_length=1, description="Search terms; the last word also matches as a prefix"),
+    source: Optional[str] = Query(None, description="email (stored emails) or collection (collection emails)"),
+    language: Optional[str] = None,
+    company: Optional[str] = None,
+    status: Optional[str] = None,
+    job_type: Optional[str] = None,
+    experience_level: Optional[str] = None,
+    collection_id: Optional[str] = None,
+    page: int = Query(1, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    """BM25-ranked search over subject, sender and body, with facet counts across all matches."""
+    if not settings.search_enabled:
+        raise HTTPException(status_code=404, detail="Search is disabled")
+    filters = {
+        "source": source, "language": language, "company": company, "application_status": status,
+        "job_type": job_type, "experience_level": experience_level,
+    }
+    filters = {field: value for field, value in filters.items() if value is not None}
+    if collection_id:
+        filters["source"] = "collection"
+    result = await SearchIndex.search(
+        current_user["_id"], q, filters, limit=limit, offset=(page - 1) * limit, collection_id=collection_id
+    )
+    result["pagination"] = {
+        "total": result["total"],
+        "total_is_estimate": result["total_is_estimate"],
+        "page": page,
+        "limit": limit,
+        "pages": (result["total"] + limit - 1) // limit
+    }
+    return result
+
 @router.get("/{email_id}")
 async def get_email(
     email_id: str,
@@ -56,9 +147,22 @@ async def get_email(
         email = await db.get_db().emails.find_one({"_id": ObjectId(email_id)})
         if not email:
             raise HTTPException(status_code=404, detail="Email not found")
-        return email
     except:
         raise HTTPException(status_code=404, detail="Invalid email ID")
+    
+    # Emails stored from metadata-only fetches carry no body; load it from Gmail once and keep it
+    if not email.get("body") and email.get("gmail_id") and current_user.get("gmail_access_token"):
+        gmail = GmailService(
+            access_token=current_user["gmail_access_token"],
+            refresh_token=current_user.get("gmail_refresh_token"),
+            user_id=current_user["_id"]
+        )
+        full = await gmail.get_full_email(email["gmail_id"])
+        if full and full.get("body"):
+            email["body"] = full["body"]
+            await db.get_db().emails.update_one({"_id": email["_id"]}, {"$set": {"body": full["body"]}})
+            await SearchIndex.index_emails(email["user_id"], [email])
+    return email
 
 @router.patch("/{email_id}")
 async def update_email(
@@ -78,15 +182,17 @@ async def update_email(
         update_data["read"] = read
     
     try:
-        result = await db.get_db().emails.find_one_and_update(
+        before = await db.get_db().emails.find_one_and_update(
             {"_id": ObjectId(email_id)},
             {"$set": update_data},
-            return_document=True
+            return_document=False
         )
         
-        if not result:
+        if not before:
             raise HTTPException(status_code=404, detail="Email not found")
         
+        result = {**before, **update_data}
+        await AnalyticsRollup.record_email_changes(before.get("user_id"), [(before, result)])
         return result
     except:
         raise HTTPException(status_code=404, detail="Invalid email ID")
@@ -97,9 +203,13 @@ async def delete_email(
     current_user: dict = Depends(get_current_user)
 ):
     try:
-        result = await db.get_db().emails.delete_one({"_id": ObjectId(email_id)})
-        if result.deleted_count == 0:
+        deleted = await db.get_db().emails.find_one_and_delete(
+            {"_id": ObjectId(email_id)}, projection={"gmail_id": 1, **EMAIL_ROLLUP_FIELDS}
+        )
+        if not deleted:
             raise HTTPException(status_code=404, detail="Email not found")
+        await AnalyticsRollup.record_emails(deleted.get("user_id"), [deleted], sign=-1)
+        await SearchIndex.remove_emails(deleted.get("user_id"), [deleted.get("gmail_id")])
         return {"message": "Email deleted"}
     except:
         raise HTTPException(status_code=404, detail="Invalid email ID")
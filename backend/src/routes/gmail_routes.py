@@ -1,31 +1,55 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Optional, Dict, Any, Literal, Tuple
+import json
 from src.dependencies import get_current_user
 from src.services.llm_service import LLMService
 from src.services.gmail_service import GmailService
+from src.services.rate_limiter import gmail_metrics
+from src.services.message_cache import message_cache
+from src.services.query_cache import query_cache
+from src.services.extraction_dedup import extraction_dedup
+from src.services.response_cache import response_cache
+from src.services.sync_service import SyncService
+from src.services.backfill_service import BackfillService
+from src.services.enrichment_service import EnrichmentService
+from src.services.query_planner import QueryPlanner
 
 
 class NaturalQueryBody(BaseModel):
     prompt: str
     limit: int = 50
     include_gmail_fetch: bool = True
+    # Result lists only need headers + snippet; full bodies come from GET /gmail/messages/{gmail_id}
+    format: Literal["metadata", "full"] = "metadata"
+    # auto answers from synced emails where they cover the query and asks Gmail for the rest
+    source: Literal["auto", "gmail"] = "auto"
 
 
 router = APIRouter(prefix="/gmail", tags=["gmail"])
 
 
-@router.post("/natural-query")
-async def natural_query(body: NaturalQueryBody, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
-    llm = await LLMService.process_natural_language_query(body.prompt)
+async def _interpret(prompt: str) -> Tuple[Dict, str, str, str]:
+    llm = await LLMService.process_natural_language_query(prompt)
     # Map to stable response keys
-    search_query = llm.get("gmail_query") or llm.get("search_query") or body.prompt
+    search_query = llm.get("gmail_query") or llm.get("search_query") or prompt
     query_intent = llm.get("query_intent", "search_emails")
-    summary = llm.get("summary", f"Searching for: {body.prompt}")
+    summary = llm.get("summary", f"Searching for: {prompt}")
+    return llm, search_query, query_intent, summary
+
+
+@router.post("/natural-query")
+async def natural_query(body: NaturalQueryBody, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    llm, search_query, query_intent, summary = await _interpret(body.prompt)
 
     emails = []
     count = 0
+    failed = 0
     error = None
+    categories = {}
+    plan = None
     
     if body.include_gmail_fetch:
         access_token = current_user.get("gmail_access_token")
@@ -34,11 +58,23 @@ async def natural_query(body: NaturalQueryBody, current_user: dict = Depends(get
         print(f"DEBUG: access_token exists: {bool(access_token)}")
         print(f"DEBUG: search_query: {search_query}")
         
+        gmail = None
         if access_token:
+            gmail = GmailService(access_token=access_token, refresh_token=refresh_token, user_id=current_user["_id"])
+        if body.source == "auto":
+            answer = await QueryPlanner.answer(
+                current_user, search_query, query_intent, llm.get("categories"),
+                limit=body.limit, format=body.format, gmail=gmail
+            )
+            emails, failed, error = answer["emails"], answer["failed"], answer["error"]
+            categories, plan = answer["categories"], answer["plan"]
+            count = len(emails)
+            print(f"DEBUG: Answered with {count} emails, Gmail queries: {plan['gmail_queries']}")
+        elif gmail:
             try:
-                gmail = GmailService(access_token=access_token, refresh_token=refresh_token)
-                emails = await gmail.fetch_emails(query=search_query, max_results=body.limit)
+                emails = await gmail.fetch_emails(query=search_query, max_results=body.limit, format=body.format)
                 count = len(emails)
+                failed = len(gmail.fetch_errors)
                 print(f"DEBUG: Fetched {count} emails")
             except Exception as e:
                 error = str(e)
@@ -51,11 +87,92 @@ async def natural_query(body: NaturalQueryBody, current_user: dict = Depends(get
         "search_query": search_query,
         "summary": summary,
         "count": count,
+        "failed": failed,
         "emails": emails,
+        "categories": categories,
+        "plan": plan,
         "error": error,
     }
 
 
+async def _natural_query_events(body: NaturalQueryBody, current_user: dict) -> AsyncIterator[Tuple[str, Dict]]:
+    """(event, data) pairs: the interpretation, the plan, then each email as soon as it is available
+    (local matches first, Gmail messages in arrival order), and a closing summary."""
+    llm, search_query, query_intent, summary = await _interpret(body.prompt)
+    yield "interpretation", {
+        "query_intent": query_intent,
+        "search_query": search_query,
+        "summary": summary,
+        "categories": llm.get("categories", []),
+    }
+    count = 0
+    failed = 0
+    error = None
+    if body.include_gmail_fetch:
+        access_token = current_user.get("gmail_access_token")
+        gmail = None
+        if access_token:
+            gmail = GmailService(access_token=access_token, refresh_token=current_user.get("gmail_refresh_token"),
+                                 user_id=current_user["_id"])
+        queries = [search_query]
+        seen = set()
+        if body.source == "auto":
+            plan = await QueryPlanner.plan(current_user, search_query, query_intent)
+            local = await QueryPlanner.local_emails(current_user, plan, body.limit, body.format)
+            needed = QueryPlanner.needed_gmail_queries(plan, local, body.limit)
+            queries = [query["query"] for query in needed]
+            yield "plan", QueryPlanner.describe(plan, needed)
+            for email in local:
+                seen.add(email["gmail_id"])
+                count += 1
+                yield "email", email
+        if queries and gmail is None:
+            error = "No Gmail access token found. User needs to authenticate with Gmail."
+        elif queries:
+            try:
+                for query in queries:
+                    if count >= body.limit:
+                        break
+                    message_ids = await gmail.list_message_ids(query=query, max_results=body.limit - count)
+                    message_ids = [message_id for message_id in message_ids if message_id not in seen]
+                    stream = gmail.stream_messages(message_ids, format=body.format)
+                    try:
+                        async for email in stream:
+                            seen.add(email["gmail_id"])
+                            count += 1
+                            yield "email", {**email, "source": "gmail"}
+                    finally:
+                        await stream.aclose()
+                    failed += len(gmail.fetch_errors)
+            except Exception as e:
+                error = str(e)
+                print(f"ERROR streaming emails: {error}")
+    yield "done", {"count": count, "failed": failed, "error": error}
+
+
+async def _ndjson(events: AsyncIterator[Tuple[str, Dict]]) -> AsyncIterator[str]:
+    async for event, data in events:
+        yield json.dumps({"type": event, **jsonable_encoder(data)}) + "\n"
+
+
+async def _sse(events: AsyncIterator[Tuple[str, Dict]]) -> AsyncIterator[str]:
+    async for event, data in events:
+        yield f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n"
+
+
+@router.post("/natural-query/stream")
+async def natural_query_stream(body: NaturalQueryBody, request: Request,
+                               current_user: dict = Depends(get_current_user)) -> StreamingResponse:
+    """Streaming natural-query: NDJSON by default, Server-Sent Events for Accept: text/event-stream.
+    The response is written as the client reads it, so a slow client holds back the Gmail fetches,
+    and a disconnect cancels the ones still outstanding."""
+    events = _natural_query_events(body, current_user)
+    if "text/event-stream" in request.headers.get("accept", ""):
+        return StreamingResponse(_sse(events), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+    return StreamingResponse(_ndjson(events), media_type="application/x-ndjson")
+
+
 class SyncBody(BaseModel):
     prompt: Optional[str] = ""
     limit: int = 50
@@ -63,12 +180,86 @@ class SyncBody(BaseModel):
 
 @router.post("/sync")
 async def sync_emails(body: SyncBody, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
-    # Basic placeholder sync: perform search and return count
-    search = body.prompt or ""
-    emails = []
+    """Incremental sync into the emails collection.
+    Without a prompt, replays Gmail history since the stored historyId; with one, upserts the search results.
+    """
     access_token = current_user.get("gmail_access_token")
     refresh_token = current_user.get("gmail_refresh_token")
-    if access_token:
-        gmail = GmailService(access_token=access_token, refresh_token=refresh_token)
-        emails = await gmail.fetch_emails(query=search, max_results=body.limit)
-    return {"synced": len(emails)}
+    if not access_token:
+        return {"synced": 0, "error": "No Gmail access token found. User needs to authenticate with Gmail."}
+    gmail = GmailService(access_token=access_token, refresh_token=refresh_token, user_id=current_user["_id"])
+    return await SyncService.sync_user(current_user, gmail, query=body.prompt or "", limit=body.limit)
+
+
+class BackfillBody(BaseModel):
+    query: Optional[str] = ""
+    restart: bool = False
+
+
+@router.post("/backfill")
+async def start_backfill(body: BackfillBody, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    """Start (or resume from its checkpoint) a background import of the whole mailbox."""
+    access_token = current_user.get("gmail_access_token")
+    refresh_token = current_user.get("gmail_refresh_token")
+    if not access_token:
+        raise HTTPException(status_code=400, detail="No Gmail access token found. User needs to authenticate with Gmail.")
+    gmail = GmailService(access_token=access_token, refresh_token=refresh_token, user_id=current_user["_id"])
+    return await BackfillService.start(current_user, gmail, query=body.query or "", restart=body.restart)
+
+
+@router.get("/backfill")
+async def backfill_status(current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    job = await BackfillService.get_status(current_user["_id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="No backfill job found")
+    return job
+
+
+@router.post("/backfill/cancel")
+async def cancel_backfill(current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    job = await BackfillService.cancel(current_user["_id"])
+    if not job:
+        raise HTTPException(status_code=404, detail="No backfill job found")
+    return job
+
+
+@router.post("/enrichment")
+async def enrich_emails(current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    """Queue every stored email that has no extracted metadata yet."""
+    queued = await EnrichmentService.enqueue_unenriched(current_user["_id"])
+    return {"queued": queued, **await EnrichmentService.get_status(current_user["_id"])}
+
+
+@router.get("/enrichment")
+async def enrichment_status(current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    """Enrichment job counts by status (pending, processing, done, dead)."""
+    return await EnrichmentService.get_status(current_user["_id"])
+
+
+@router.get("/messages/{gmail_id}")
+async def get_message(gmail_id: str, current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    """Full body of a single Gmail message, fetched lazily and cached."""
+    access_token = current_user.get("gmail_access_token")
+    refresh_token = current_user.get("gmail_refresh_token")
+    if not access_token:
+        raise HTTPException(status_code=400, detail="No Gmail access token found. User needs to authenticate with Gmail.")
+    gmail = GmailService(access_token=access_token, refresh_token=refresh_token, user_id=current_user["_id"])
+    email = await gmail.get_full_email(gmail_id)
+    if not email:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return email
+
+
+@router.get("/metrics")
+async def gmail_fetch_metrics(current_user: dict = Depends(get_current_user)) -> Dict[str, Any]:
+    """Process-wide Gmail fetch counters (in-flight requests, throttling) and cache hit rates."""
+    return {
+        **gmail_metrics.snapshot(),
+        "message_cache": message_cache.snapshot(),
+        "query_cache": query_cache.snapshot(),
+        "extraction_dedup": {
+            **extraction_dedup.snapshot(),
+            "total_saved_calls": await extraction_dedup.total_saved_calls(),
+        },
+        "response_cache": response_cache.snapshot(),
+    }
@@ -0,0 +1,331 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.config import settings
+from src.database import db
+from src.services.analytics_service import AnalyticsService, STATUSES
+from src.services.response_cache import response_cache
+
+# emails-collection histograms: rollup key -> email field. None values are counted under NONE_KEY.
+EMAIL_HISTOGRAMS = {"status": "application_status", "job_type": "job_type", "experience_level": "experience_level"}
+# Rankings only count emails that have a value (as get_top_companies / get_top_positions do)
+EMAIL_RANKINGS = {"company": "company", "position": "position"}
+# Projection of the email fields a rollup delta needs
+EMAIL_ROLLUP_FIELDS = {"user_id": 1, "read": 1, "starred": 1, **{field: 1 for field in EMAIL_HISTOGRAMS.values()},
+                       **{field: 1 for field in EMAIL_RANKINGS.values()}}
+# Collection emails are read without their bodies when only the rollup needs them
+COLLECTION_ROLLUP_PROJECTION = {"emails.body": 0}
+
+NONE_KEY = "_none"
+
+
+def encode_key(label) -> str:
+    """Labels become field names in the rollup document; '.' and '$' are swapped for lookalikes."""
+    if label is None:
+        return NONE_KEY
+    return str(label).replace(".", "．").replace("$", "＄")
+
+
+def decode_key(key: str) -> Optional[str]:
+    if key == NONE_KEY:
+        return None
+    return key.replace("．", ".").replace("＄", "$")
+
+
+def email_delta(email: Dict, sign: int = 1) -> Dict[str, int]:
+    """$inc paths for adding (sign=1) or removing (sign=-1) one emails-collection document."""
+    delta = {"emails.total": sign}
+    if email.get("read"):
+        delta["emails.read"] = sign
+    if email.get("starred"):
+        delta["emails.starred"] = sign
+    for name, field in EMAIL_HISTOGRAMS.items():
+        delta[f"emails.{name}.{encode_key(email.get(field))}"] = sign
+    for name, field in EMAIL_RANKINGS.items():
+        if email.get(field) is not None:
+            delta[f"emails.{name}.{encode_key(email[field])}"] = sign
+    return delta
+
+
+def collection_email_delta(email: Dict, sign: int = 1) -> Dict[str, int]:
+    """$inc paths for adding or removing one email embedded in a collection."""
+    delta = {"collections.total": sign}
+    # Emails saved before company was precomputed fall back to the sender, as in the aggregations
+    company = email["company"] if "company" in email else AnalyticsService._derive_company(email.get("from"))
+    if company:
+        delta[f"collections.company.{encode_key(company)}"] = sign
+    received_date = AnalyticsService._received_date(email)
+    if received_date:
+        status = AnalyticsService._email_status(email)
+        delta[f"collections.daily.{received_date:%Y-%m-%d}.{status}"] = sign
+    return delta
+
+
+def merge_deltas(deltas: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    merged: Dict[str, int] = {}
+    for delta in deltas:
+        for path, value in delta.items():
+            merged[path] = merged.get(path, 0) + value
+    return {path: value for path, value in merged.items() if value}
+
+
+class AnalyticsRollup:
+    """Materialized per-user analytics, one user_analytics document per user:
+    emails-collection totals, status/job-type/experience histograms and company/position counts
+    (the funnel is the status histogram), plus collection email totals, company counts and the
+    daily status series. Writers keep it current with $inc deltas; the /analytics endpoints read
+    the one document. A missing rollup is rebuilt from raw documents on first read, and a periodic
+    reconciler rebuilds existing ones to repair drift (deltas lost to a crash or to a concurrent rebuild).
+    Increments never create a rollup, so a partial document can't shadow the rebuild.
+    Read methods mirror AnalyticsService so routes can use either.
+    """
+
+    _reconciler: Optional[asyncio.Task] = None
+
+    @staticmethod
+    async def apply(user_id, delta: Dict[str, int]):
+        if settings.analytics_rollups_enabled and delta:
+            try:
+                await db.get_db().user_analytics.update_one(
+                    {"_id": str(user_id)},
+                    {"$inc": delta, "$set": {"updated_at": datetime.utcnow()}}
+                )
+            except Exception as e:
+                print(f"Error updating analytics rollup for user {user_id}: {e}")
+        # Every email/collection write comes through here; cached responses of the user are stale now
+        await response_cache.invalidate(user_id)
+
+    @staticmethod
+    async def record_emails(user_id, emails: List[Dict], sign: int = 1):
+        await AnalyticsRollup.apply(user_id, merge_deltas(email_delta(email, sign) for email in emails))
+
+    @staticmethod
+    async def record_email_changes(user_id, changes: List[Tuple[Dict, Dict]]):
+        """Apply (before, after) pairs of updated emails-collection documents."""
+        await AnalyticsRollup.apply(user_id, merge_deltas(
+            delta for before, after in changes for delta in (email_delta(before, -1), email_delta(after))
+        ))
+
+    @staticmethod
+    async def record_collection_emails(user_id, emails: List[Dict], sign: int = 1):
+        await AnalyticsRollup.apply(user_id, merge_deltas(collection_email_delta(email, sign) for email in emails))
+
+    @staticmethod
+    async def rebuild(user_id) -> Dict:
+        """Recompute a user's rollup from the emails and collections documents and store it."""
+        user_id = str(user_id)
+        thirty_days_ago, fifteen_days_ago = AnalyticsService._insight_windows()
+        emails, (collections, legacy) = await asyncio.gather(
+            AnalyticsService._email_facets(user_id, position_limit=None),
+            AnalyticsService._collection_facets(user_id, thirty_days_ago, fifteen_days_ago),
+        )
+
+        def histogram(rows: List[Dict]) -> Dict[str, int]:
+            return {encode_key(row["_id"]): row["count"] for row in rows or []}
+
+        stats = emails["stats"][0] if emails.get("stats") else {}
+        companies = AnalyticsService._company_counts(collections.get("companies", []))
+        timeline = AnalyticsService._applications_over_time(collections.get("timeline", []), legacy)
+        now = datetime.utcnow()
+        rollup = {
+            "_id": user_id,
+            "emails": {
+                "total": stats.get("total", 0),
+                "read": stats.get("read", 0),
+                "starred": stats.get("starred", 0),
+                "status": histogram(emails.get("by_status")),
+                "job_type": histogram(emails.get("by_type")),
+                "experience_level": histogram(emails.get("by_experience")),
+                "company": histogram(emails.get("companies")),
+                "position": histogram(emails.get("top_positions")),
+            },
+            "collections": {
+                "total": collections["total"][0]["count"] if collections.get("total") else 0,
+                "company": {encode_key(name): count for name, count in companies.items()},
+                "daily": {
+                    day["date"]: {status: day[status] for status in STATUSES if day[status]}
+                    for day in timeline
+                },
+            },
+            "updated_at": now,
+            "reconciled_at": now,
+        }
+        await db.get_db().user_analytics.replace_one({"_id": user_id}, rollup, upsert=True)
+        await response_cache.invalidate(user_id)
+        return rollup
+
+    @staticmethod
+    async def load(user_id) -> Dict:
+        rollup = await db.get_db().user_analytics.find_one({"_id": str(user_id)})
+        return rollup or await AnalyticsRollup.rebuild(user_id)
+
+    @staticmethod
+    async def count_emails(user_id, filters: Dict) -> Optional[int]:
+        """Emails matching at most one equality filter on a histogram/ranking field, read from a stored
+        rollup (never rebuilt here). None when the rollup can't answer."""
+        if not settings.analytics_rollups_enabled or len(filters) > 1:
+            return None
+        fields = {field: name for name, field in {**EMAIL_HISTOGRAMS, **EMAIL_RANKINGS}.items()}
+        if filters and next(iter(filters)) not in fields:
+            return None
+        try:
+            rollup = await db.get_db().user_analytics.find_one({"_id": str(user_id)}, {"emails": 1})
+        except Exception as e:
+            print(f"Error reading analytics rollup for user {user_id}: {e}")
+            return None
+        if not rollup:
+            return None
+        emails = rollup.get("emails", {})
+        if not filters:
+            return max(emails.get("total", 0), 0)
+        field, value = next(iter(filters.items()))
+        return max(emails.get(fields[field], {}).get(encode_key(value), 0), 0)
+
+    @staticmethod
+    def _ranked(histogram: Dict[str, int], limit: Optional[int] = None) -> List[Dict]:
+        items = [{"_id": decode_key(key), "count": count} for key, count in (histogram or {}).items() if count > 0]
+        items.sort(key=lambda x: x["count"], reverse=True)
+        return items[:limit]
+
+    @staticmethod
+    def _stats(rollup: Dict) -> Dict:
+        emails = rollup.get("emails", {})
+        total = emails.get("total", 0)
+        if total <= 0:
+            return {}
+        read = emails.get("read", 0)
+        return {"_id": None, "total": total, "read": read, "unread": total - read, "starred": emails.get("starred", 0)}
+
+    @staticmethod
+    def _funnel(rollup: Dict) -> Dict:
+        status = rollup.get("emails", {}).get("status", {})
+        return {name: status.get(encode_key(name), 0) for name in STATUSES}
+
+    @staticmethod
+    def _applications_over_time(rollup: Dict) -> List[Dict]:
+        daily = rollup.get("collections", {}).get("daily", {})
+        result = []
+        for date_key in sorted(daily):
+            counts = {status: max(daily[date_key].get(status, 0), 0) for status in STATUSES}
+            if any(counts.values()):
+                result.append({"date": date_key, **counts})
+        return result
+
+    @staticmethod
+    def _predictive_insights(rollup: Dict) -> Dict:
+        """Insights from the daily series; windows are counted in whole days."""
+        thirty_days_ago, fifteen_days_ago = AnalyticsService._insight_windows()
+        rows: Dict[str, Dict] = {}
+        for day in AnalyticsRollup._applications_over_time(rollup):
+            date = datetime.strptime(day["date"], "%Y-%m-%d")
+            for status in STATUSES:
+                count = day[status]
+                if not count:
+                    continue
+                row = rows.setdefault(status, {"_id": status, "count": 0, "earliest": date, "last_30": 0, "last_15": 0})
+                row["count"] += count
+                row["earliest"] = min(row["earliest"], date)
+                if date.date() >= thirty_days_ago.date():
+                    row["last_30"] += count
+                if date.date() >= fifteen_days_ago.date():
+                    row["last_15"] += count
+        return AnalyticsService._predictive_insights(list(rows.values()), [], thirty_days_ago, fifteen_days_ago)
+
+    @staticmethod
+    async def get_email_stats(user_id: str) -> Dict:
+        return AnalyticsRollup._stats(await AnalyticsRollup.load(user_id))
+
+    @staticmethod
+    async def get_emails_by_application_status(user_id: str) -> List[Dict]:
+        return AnalyticsRollup._ranked((await AnalyticsRollup.load(user_id))["emails"].get("status"))
+
+    @staticmethod
+    async def get_emails_by_job_type(user_id: str) -> List[Dict]:
+        return AnalyticsRollup._ranked((await AnalyticsRollup.load(user_id))["emails"].get("job_type"))
+
+    @staticmethod
+    async def get_emails_by_experience_level(user_id: str) -> List[Dict]:
+        return AnalyticsRollup._ranked((await AnalyticsRollup.load(user_id))["emails"].get("experience_level"))
+
+    @staticmethod
+    async def get_application_funnel(user_id: str) -> Dict:
+        return AnalyticsRollup._funnel(await AnalyticsRollup.load(user_id))
+
+    @staticmethod
+    async def get_top_companies(user_id: str, limit: int = 10) -> List[Dict]:
+        return AnalyticsRollup._ranked((await AnalyticsRollup.load(user_id))["emails"].get("company"), limit)
+
+    @staticmethod
+    async def get_top_positions(user_id: str, limit: int = 10) -> List[Dict]:
+        return AnalyticsRollup._ranked((await AnalyticsRollup.load(user_id))["emails"].get("position"), limit)
+
+    @staticmethod
+    async def get_dashboard_summary(user_id: str) -> Dict:
+        """Same shape as AnalyticsService.get_dashboard_summary, from the rollup document alone."""
+        rollup = await AnalyticsRollup.load(user_id)
+        emails = rollup.get("emails", {})
+        companies = AnalyticsRollup._ranked(emails.get("company"))
+
+        stats = AnalyticsRollup._stats(rollup)
+        # If no emails in primary collection, fallback to collections-based metrics
+        if not stats:
+            total = max(rollup.get("collections", {}).get("total", 0), 0)
+            stats = {"total": total, "read": 0, "unread": total, "starred": 0}
+            collection_companies = AnalyticsRollup._ranked(rollup.get("collections", {}).get("company"))
+            company_count = len(collection_companies)
+            top_companies = collection_companies[:5]
+        else:
+            company_count = len(companies)
+            top_companies = companies[:5]
+
+        return {
+            "stats": stats,
+            "company_count": company_count,
+            "by_status": AnalyticsRollup._ranked(emails.get("status")),
+            "by_type": AnalyticsRollup._ranked(emails.get("job_type")),
+            "by_experience": AnalyticsRollup._ranked(emails.get("experience_level")),
+            "by_company": companies[:10],
+            "funnel": AnalyticsRollup._funnel(rollup),
+            "top_companies": top_companies,
+            "applications_over_time": AnalyticsRollup._applications_over_time(rollup),
+            "predictive_insights": AnalyticsRollup._predictive_insights(rollup),
+            "top_positions": AnalyticsRollup._ranked(emails.get("position"), 5)
+        }
+
+    @staticmethod
+    async def reconcile_all() -> int:
+        """Rebuild every stored rollup; users without one are built lazily on their next read."""
+        rebuilt = 0
+        for user_id in await db.get_db().user_analytics.distinct("_id"):
+            try:
+                await AnalyticsRollup.rebuild(user_id)
+                rebuilt += 1
+            except Exception as e:
+                print(f"Error reconciling analytics rollup for user {user_id}: {e}")
+        return rebuilt
+
+    @staticmethod
+    def start():
+        if not settings.analytics_rollups_enabled or AnalyticsRollup._reconciler:
+            return
+        AnalyticsRollup._reconciler = asyncio.create_task(AnalyticsRollup._reconcile_loop())
+
+    @staticmethod
+    async def shutdown():
+        reconciler = AnalyticsRollup._reconciler
+        if reconciler:
+            reconciler.cancel()
+            await asyncio.gather(reconciler, return_exceptions=True)
+        AnalyticsRollup._reconciler = None
+
+    @staticmethod
+    async def _reconcile_loop():
+        while True:
+            await asyncio.sleep(settings.analytics_reconcile_seconds)
+            try:
+                rebuilt = await AnalyticsRollup.reconcile_all()
+                print(f"DEBUG: reconciled {rebuilt} analytics rollups")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in analytics reconciler: {e}")
@@ -1,7 +1,18 @@
 from typing import List, Dict, Optional, Tuple
+import asyncio
 import re
 from datetime import datetime, timedelta
 from src.database import db
+from bson import ObjectId
+from src.services.email_classifier import classify
+
+STATUSES = ("applied", "interview", "offer", "rejected")
+# Collection emails whose status and date were precomputed at ingest, and those that still need the Python path
+PRECOMPUTED_COLLECTION_EMAIL = {"emails.received_date": {"$type": "date"}, "emails.application_status": {"$in": list(STATUSES)}}
+LEGACY_COLLECTION_EMAIL = {"$or": [
+    {"emails.received_date": {"$not": {"$type": ["date", "null"]}}},
+    {"emails.application_status": {"$nin": list(STATUSES)}},
+]}
 
 class AnalyticsService:
     @staticmethod
@@ -34,52 +45,95 @@ class AnalyticsService:
         return None
 
     @staticmethod
-    async def _get_collections_emails(user_id: str) -> List[Dict]:
-        """Fetch all emails nested inside collections for a user."""
-        # Convert string user_id to ObjectId if needed
+    def _collections_owner(user_id: str):
+        # Collections store the owner as an ObjectId
         try:
-            from bson import ObjectId
-            user_obj_id = ObjectId(user_id)
+            return ObjectId(user_id)
         except Exception:
-            user_obj_id = user_id
-        cursor = db.get_db().collections.find({"user_id": user_obj_id}, {"emails": 1})
-        collections = await cursor.to_list(None)
-        emails: List[Dict] = []
-        for col in collections:
-            for e in col.get("emails", []) or []:
-                emails.append(e)
-        return emails
+            return user_id
+
+    @staticmethod
+    def _collection_emails_pipeline(user_id: str, fields: List[str], stages: List[Dict]) -> List[Dict]:
+        """Stages run over a user's collection emails, one document per email (under "emails"),
+        carrying only the given fields so bodies never leave the server unless asked for."""
+        projection = {"_id": 0, **{f"emails.{field}": 1 for field in fields}}
+        return [
+            {"$match": {"user_id": AnalyticsService._collections_owner(user_id)}},
+            {"$project": projection},
+            {"$unwind": "$emails"},
+            *stages
+        ]
+
+    @staticmethod
+    async def _aggregate_collection_emails(user_id: str, fields: List[str], stages: List[Dict]) -> List[Dict]:
+        pipeline = AnalyticsService._collection_emails_pipeline(user_id, fields, stages)
+        return await db.get_db().collections.aggregate(pipeline).to_list(None)
+
+    @staticmethod
+    async def _legacy_collection_emails(user_id: str) -> List[Dict]:
+        """Collection emails saved before application_status/received_date were precomputed at ingest
+        (or with a status outside the known set). These still go through the Python path."""
+        return await AnalyticsService._aggregate_collection_emails(
+            user_id,
+            ["subject", "body", "received_at", "received_date", "application_status"],
+            [{"$match": LEGACY_COLLECTION_EMAIL}, {"$replaceRoot": {"newRoot": "$emails"}}]
+        )
 
     @staticmethod
     async def get_collections_email_stats(user_id: str) -> Dict:
-        emails = await AnalyticsService._get_collections_emails(user_id)
-        total = len(emails)
+        pipeline = [
+            {"$match": {"user_id": AnalyticsService._collections_owner(user_id)}},
+            {"$group": {"_id": None, "total": {"$sum": {"$size": {"$ifNull": ["$emails", []]}}}}}
+        ]
+        result = await db.get_db().collections.aggregate(pipeline).to_list(None)
+        total = result[0]["total"] if result else 0
         # We don't track read/starred in collections; return minimal stats
         return {"total": total, "read": 0, "unread": total, "starred": 0}
 
     @staticmethod
-    async def get_collections_top_companies(user_id: str, limit: int = 10) -> List[Dict]:
-        emails = await AnalyticsService._get_collections_emails(user_id)
+    def _company_stages() -> List[Dict]:
+        # Precomputed companies are grouped as-is; emails saved without one are grouped by sender
+        return [{"$group": {
+            "_id": {
+                "company": "$emails.company",
+                "from": {"$cond": [{"$eq": [{"$type": "$emails.company"}, "missing"]}, "$emails.from", None]},
+            },
+            "count": {"$sum": 1}
+        }}]
+
+    @staticmethod
+    def _company_counts(rows: List[Dict]) -> Dict[str, int]:
+        """Email count per company from _company_stages rows; the company is derived once per distinct sender."""
         counts: Dict[str, int] = {}
-        for e in emails:
-            company = AnalyticsService._derive_company(e.get("from"))
-            if not company:
-                continue
-            counts[company] = counts.get(company, 0) + 1
+        for row in rows:
+            company = row["_id"].get("company") or AnalyticsService._derive_company(row["_id"].get("from"))
+            if company:
+                counts[company] = counts.get(company, 0) + row["count"]
+        return counts
+
+    @staticmethod
+    def _top_companies(counts: Dict[str, int], limit: int) -> List[Dict]:
         # Convert to list and sort
         items = [{"_id": name, "count": cnt} for name, cnt in counts.items()]
         items.sort(key=lambda x: x["count"], reverse=True)
         return items[:limit]
 
+    @staticmethod
+    async def _collections_company_counts(user_id: str) -> Dict[str, int]:
+        rows = await AnalyticsService._aggregate_collection_emails(
+            user_id, ["company", "from"], AnalyticsService._company_stages()
+        )
+        return AnalyticsService._company_counts(rows)
+
+    @staticmethod
+    async def get_collections_top_companies(user_id: str, limit: int = 10) -> List[Dict]:
+        counts = await AnalyticsService._collections_company_counts(user_id)
+        return AnalyticsService._top_companies(counts, limit)
+
     @staticmethod
     async def get_collections_company_count(user_id: str) -> int:
-        emails = await AnalyticsService._get_collections_emails(user_id)
-        companies = set()
-        for e in emails:
-            c = AnalyticsService._derive_company(e.get("from"))
-            if c:
-                companies.add(c)
-        return len(companies)
+        return len(await AnalyticsService._collections_company_counts(user_id))
+
     @staticmethod
     async def get_emails_by_position(user_id: str) -> List[Dict]:
         pipeline = [
@@ -194,85 +248,64 @@ class AnalyticsService:
 
     @staticmethod
     def _infer_status(subject: str, body: str) -> Optional[str]:
-        """Infer application status from email subject/body keywords."""
-        text = (subject or "") + " " + (body or "")
-        text_lower = text.lower()
-
-        # Check for offer/congratulations
-        if any(kw in text_lower for kw in ["offer", "congratulations", "excited", "we're pleased", "accepted", "approved"]):
-            return "offer"
-        # Check for rejection
-        if any(kw in text_lower for kw in ["reject", "unfortunately", "not move", "not selected", "decline", "unsuccessful", "regret"]):
-            return "rejected"
-        # Check for interview
-        if any(kw in text_lower for kw in ["interview", "call", "schedule", "meeting", "discuss", "next step"]):
-            return "interview"
+        """Infer application status from email subject/body with the rule-based classifier."""
+        status, _ = classify(subject, body)["application_status"]
         # Default to applied
-        return "applied"
+        return status or "applied"
 
     @staticmethod
-    async def get_applications_over_time(user_id: str) -> List[Dict]:
-        """Get application counts grouped by date and status from collections.
-        Returns list of {date, applied, interview, offer, rejected} for charting.
-        """
-        emails = await AnalyticsService._get_collections_emails(user_id)
-        print(f"DEBUG: get_applications_over_time - found {len(emails)} emails")
-        
+    def _received_date(email: Dict) -> Optional[datetime]:
+        """Precomputed received_date, else parsed from the received_at string (older collection emails)."""
+        received_date = email.get("received_date")
+        if isinstance(received_date, datetime):
+            return received_date
+        received_at = email.get("received_at")
+        if isinstance(received_at, datetime):
+            return received_at
+        if not received_at:
+            return None
+        from src.services.email_documents import parse_received_at
+        return parse_received_at(received_at)
+
+    @staticmethod
+    def _email_status(email: Dict) -> str:
+        status = email.get("application_status")
+        if status in STATUSES:
+            return status
+        return AnalyticsService._infer_status(email.get("subject", ""), email.get("body", ""))
+
+    @staticmethod
+    def _timeline_stages() -> List[Dict]:
+        return [
+            {"$match": PRECOMPUTED_COLLECTION_EMAIL},
+            {"$group": {
+                "_id": {
+                    "day": {"$dateTrunc": {"date": "$emails.received_date", "unit": "day"}},
+                    "status": "$emails.application_status",
+                },
+                "count": {"$sum": 1}
+            }}
+        ]
+
+    @staticmethod
+    def _applications_over_time(rows: List[Dict], legacy: List[Dict]) -> List[Dict]:
+        """Merge _timeline_stages rows with legacy emails into {date, applied, interview, offer, rejected}."""
         # Group by date and status
         by_date_status: Dict[str, Dict[str, int]] = {}
-        
-        for i, e in enumerate(emails):
-            # Parse received_at (RFC 2822, ISO string, or datetime)
-            received_at_str = e.get("received_at")
-            print(f"DEBUG: Email {i} received_at: {received_at_str}")
-            
-            if not received_at_str:
-                continue
-            
-            date_key = None
-            try:
-                # Try to extract date using multiple patterns
-                if isinstance(received_at_str, str):
-                    # RFC 2822: "Fri, 7 Nov 2025 16:49:07 +0000"
-                    # ISO: "2025-11-07T16:49:07Z"
-                    
-                    # Try extracting YYYY-MM-DD directly
-                    iso_match = re.search(r'(\d{4})-(\d{2})-(\d{2})', received_at_str)
-                    if iso_match:
-                        date_key = iso_match.group(0)
-                        print(f"DEBUG: Matched ISO pattern: {date_key}")
-                    else:
-                        # Try RFC 2822 pattern: "Fri, 7 Nov 2025" -> extract day, month, year
-                        rfc_match = re.search(r'(\d+)\s+(\w+)\s+(\d{4})', received_at_str)
-                        if rfc_match:
-                            day, month_str, year = rfc_match.groups()
-                            months = {"Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
-                                     "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12}
-                            month = months.get(month_str, 1)
-                            date_key = f"{year}-{month:02d}-{int(day):02d}"
-                            print(f"DEBUG: Matched RFC pattern: {date_key} (day={day}, month={month_str}, year={year})")
-                else:
-                    # If it's a datetime object
-                    date_key = received_at_str.strftime("%Y-%m-%d")
-            except Exception as ex:
-                print(f"DEBUG: Exception parsing date '{received_at_str}': {ex}")
-                continue
-            
-            if not date_key:
-                print(f"DEBUG: No date_key extracted from '{received_at_str}'")
-                continue
-            
-            # Infer status from subject + body
-            status = AnalyticsService._infer_status(
-                e.get("subject", ""),
-                e.get("body", "")
-            )
-            print(f"DEBUG: Inferred status: {status}")
-            
+
+        def add(received_date: datetime, status: str, count: int):
+            date_key = received_date.strftime("%Y-%m-%d")
             if date_key not in by_date_status:
                 by_date_status[date_key] = {"applied": 0, "interview": 0, "offer": 0, "rejected": 0}
-            by_date_status[date_key][status] += 1
-        
+            by_date_status[date_key][status] += count
+
+        for row in rows:
+            add(row["_id"]["day"], row["_id"]["status"], row["count"])
+        for e in legacy:
+            received_date = AnalyticsService._received_date(e)
+            if received_date:
+                add(received_date, AnalyticsService._email_status(e), 1)
+
         # Convert to list sorted by date
         result = []
         for date_key in sorted(by_date_status.keys()):
@@ -280,16 +313,69 @@ class AnalyticsService:
                 "date": date_key,
                 **by_date_status[date_key]
             })
-        
+        return result
+
+    @staticmethod
+    async def get_applications_over_time(user_id: str) -> List[Dict]:
+        """Get application counts grouped by date and status from collections.
+        Returns list of {date, applied, interview, offer, rejected} for charting.
+        """
+        rows = await AnalyticsService._aggregate_collection_emails(
+            user_id, ["received_date", "application_status"], AnalyticsService._timeline_stages()
+        )
+        legacy = await AnalyticsService._legacy_collection_emails(user_id)
+        print(f"DEBUG: get_applications_over_time - {len(rows)} aggregated groups, {len(legacy)} legacy emails")
+        result = AnalyticsService._applications_over_time(rows, legacy)
         print(f"DEBUG: applications_over_time result: {result}")
         return result
-    
+
     @staticmethod
-    async def get_predictive_insights(user_id: str) -> Dict:
-        """Analyze application trends and predict offer likelihood."""
-        emails = await AnalyticsService._get_collections_emails(user_id)
-        
-        if not emails:
+    def _insight_windows() -> Tuple[datetime, datetime]:
+        now = datetime.now()
+        return now - timedelta(days=30), now - timedelta(days=15)
+
+    @staticmethod
+    def _status_stages(thirty_days_ago: datetime, fifteen_days_ago: datetime) -> List[Dict]:
+        def recent(since: datetime) -> Dict:
+            return {"$sum": {"$cond": [{"$gte": ["$emails.received_date", since]}, 1, 0]}}
+
+        return [
+            {"$match": PRECOMPUTED_COLLECTION_EMAIL},
+            {"$group": {
+                "_id": "$emails.application_status",
+                "count": {"$sum": 1},
+                "earliest": {"$min": "$emails.received_date"},
+                "last_30": recent(thirty_days_ago),
+                "last_15": recent(fifteen_days_ago),
+            }}
+        ]
+
+    @staticmethod
+    def _predictive_insights(rows: List[Dict], legacy: List[Dict],
+                             thirty_days_ago: datetime, fifteen_days_ago: datetime) -> Dict:
+        """Offer likelihood and momentum from _status_stages rows plus legacy emails."""
+        # Per status: count, earliest date and activity in the last 30 / last 15 days
+        by_status = {status: {"count": 0, "earliest": None, "last_30": 0, "last_15": 0} for status in STATUSES}
+
+        def add(status: str, count: int, earliest: datetime, last_30: int, last_15: int):
+            bucket = by_status[status]
+            bucket["count"] += count
+            bucket["last_30"] += last_30
+            bucket["last_15"] += last_15
+            if bucket["earliest"] is None or earliest < bucket["earliest"]:
+                bucket["earliest"] = earliest
+
+        for row in rows:
+            add(row["_id"], row["count"], row["earliest"], row["last_30"], row["last_15"])
+        for e in legacy:
+            date_parsed = AnalyticsService._received_date(e)
+            if not date_parsed:
+                continue
+            add(AnalyticsService._email_status(e), 1, date_parsed,
+                int(date_parsed >= thirty_days_ago), int(date_parsed >= fifteen_days_ago))
+
+        total = sum(bucket["count"] for bucket in by_status.values())
+        if not total:
             return {
                 "offer_probability_30d": 0,
                 "expected_days_to_offer": None,
@@ -298,62 +384,25 @@ class AnalyticsService:
                 "recent_activity": 0,
                 "conversion_rate": 0
             }
-        
-        # Parse and categorize emails with dates
-        categorized = {"applied": [], "interview": [], "offer": [], "rejected": []}
-        
-        for e in emails:
-            received_at_str = e.get("received_at")
-            if not received_at_str:
-                continue
-            
-            # Parse date
-            date_parsed = None
-            try:
-                if isinstance(received_at_str, str):
-                    iso_match = re.search(r'(\d{4})-(\d{2})-(\d{2})', received_at_str)
-                    if iso_match:
-                        date_parsed = datetime.strptime(iso_match.group(0), "%Y-%m-%d")
-                    else:
-                        rfc_match = re.search(r'(\d+)\s+(\w+)\s+(\d{4})', received_at_str)
-                        if rfc_match:
-                            day, month_str, year = rfc_match.groups()
-                            months = {"Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
-                                     "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12}
-                            month = months.get(month_str, 1)
-                            date_parsed = datetime(int(year), month, int(day))
-            except Exception:
-                continue
-            
-            if not date_parsed:
-                continue
-            
-            status = AnalyticsService._infer_status(e.get("subject", ""), e.get("body", ""))
-            categorized[status].append(date_parsed)
-        
-        total = sum(len(v) for v in categorized.values())
-        offers = len(categorized["offer"])
+        offers = by_status["offer"]["count"]
         
         # Calculate conversion rate
         conversion_rate = (offers / total * 100) if total > 0 else 0
         
         # Recent activity (last 30 days)
-        now = datetime.now()
-        thirty_days_ago = now - timedelta(days=30)
-        recent_count = sum(1 for dates in categorized.values() for d in dates if d >= thirty_days_ago)
+        recent_count = sum(bucket["last_30"] for bucket in by_status.values())
         
         # Calculate average days to offer
         avg_days_to_offer = None
-        if categorized["applied"] and categorized["offer"]:
-            earliest_applied = min(categorized["applied"])
-            earliest_offer = min(categorized["offer"])
+        earliest_applied = by_status["applied"]["earliest"]
+        earliest_offer = by_status["offer"]["earliest"]
+        if earliest_applied and earliest_offer:
             if earliest_offer > earliest_applied:
                 avg_days_to_offer = (earliest_offer - earliest_applied).days
         
         # Momentum: compare last 15 days vs previous 15 days
-        fifteen_days_ago = now - timedelta(days=15)
-        last_15_days = sum(1 for dates in categorized.values() for d in dates if d >= fifteen_days_ago)
-        prev_15_days = sum(1 for dates in categorized.values() for d in dates if thirty_days_ago <= d < fifteen_days_ago)
+        last_15_days = sum(bucket["last_15"] for bucket in by_status.values())
+        prev_15_days = recent_count - last_15_days
         
         if prev_15_days == 0:
             momentum = "neutral"
@@ -378,6 +427,17 @@ class AnalyticsService:
             "conversion_rate": round(conversion_rate, 1)
         }
 
+    @staticmethod
+    async def get_predictive_insights(user_id: str) -> Dict:
+        """Analyze application trends and predict offer likelihood."""
+        thirty_days_ago, fifteen_days_ago = AnalyticsService._insight_windows()
+        rows = await AnalyticsService._aggregate_collection_emails(
+            user_id, ["received_date", "application_status"],
+            AnalyticsService._status_stages(thirty_days_ago, fifteen_days_ago)
+        )
+        legacy = await AnalyticsService._legacy_collection_emails(user_id)
+        return AnalyticsService._predictive_insights(rows, legacy, thirty_days_ago, fifteen_days_ago)
+
     @staticmethod
     async def get_email_stats(user_id: str) -> Dict:
         pipeline = [
@@ -395,31 +455,101 @@ class AnalyticsService:
         result = await db.get_db().emails.aggregate(pipeline).to_list(None)
         return result[0] if result else {}
     
+    @staticmethod
+    def _email_facets_pipeline(user_id: str, position_limit: Optional[int] = 5) -> List[Dict]:
+        """Every emails-collection breakdown of the dashboard in one $facet pass."""
+        def group_by(field: str) -> List[Dict]:
+            return [{"$group": {"_id": f"${field}", "count": {"$sum": 1}}}, {"$sort": {"count": -1}}]
+
+        return [
+            {"$match": {"user_id": user_id}},
+            {"$facet": {
+                "stats": [{"$group": {
+                    "_id": None,
+                    "total": {"$sum": 1},
+                    "read": {"$sum": {"$cond": ["$read", 1, 0]}},
+                    "unread": {"$sum": {"$cond": ["$read", 0, 1]}},
+                    "starred": {"$sum": {"$cond": ["$starred", 1, 0]}}
+                }}],
+                "by_status": group_by("application_status"),
+                "by_type": group_by("job_type"),
+                "by_experience": group_by("experience_level"),
+                "companies": [{"$match": {"company": {"$ne": None}}}, *group_by("company")],
+                "top_positions": [
+                    {"$match": {"position": {"$ne": None}}}, *group_by("position"),
+                    *([{"$limit": position_limit}] if position_limit else [])
+                ],
+            }}
+        ]
+
+    @staticmethod
+    async def _email_facets(user_id: str, position_limit: Optional[int] = 5) -> Dict:
+        pipeline = AnalyticsService._email_facets_pipeline(user_id, position_limit)
+        result = await db.get_db().emails.aggregate(pipeline).to_list(None)
+        return result[0] if result else {}
+
+    @staticmethod
+    async def _collection_facets(user_id: str, thirty_days_ago: datetime, fifteen_days_ago: datetime) -> Tuple[Dict, List[Dict]]:
+        """One pass over collection emails feeding the time series, the insights and the fallback stats.
+        Legacy emails (bodies included) are only fetched when the pass found some."""
+        pipeline = AnalyticsService._collection_emails_pipeline(
+            user_id, ["received_date", "application_status", "company", "from"], [
+                {"$facet": {
+                    "total": [{"$count": "count"}],
+                    "timeline": AnalyticsService._timeline_stages(),
+                    "statuses": AnalyticsService._status_stages(thirty_days_ago, fifteen_days_ago),
+                    "companies": AnalyticsService._company_stages(),
+                    "legacy": [{"$match": LEGACY_COLLECTION_EMAIL}, {"$count": "count"}],
+                }}
+            ]
+        )
+        result = await db.get_db().collections.aggregate(pipeline).to_list(None)
+        facets = result[0] if result else {}
+        legacy = await AnalyticsService._legacy_collection_emails(user_id) if facets.get("legacy") else []
+        return facets, legacy
+
     @staticmethod
     async def get_dashboard_summary(user_id: str) -> Dict:
-        """Get comprehensive dashboard summary"""
-        stats = await AnalyticsService.get_email_stats(user_id)
+        """Get comprehensive dashboard summary: one emails $facet and one collections pass, run concurrently."""
+        thirty_days_ago, fifteen_days_ago = AnalyticsService._insight_windows()
+        emails, (collections, legacy) = await asyncio.gather(
+            AnalyticsService._email_facets(user_id),
+            AnalyticsService._collection_facets(user_id, thirty_days_ago, fifteen_days_ago),
+        )
+
+        stats = emails["stats"][0] if emails.get("stats") else {}
+        companies = emails.get("companies", [])
         # If no emails in primary collection, fallback to collections-based metrics
         if not stats or stats.get("total", 0) == 0:
-            stats = await AnalyticsService.get_collections_email_stats(user_id)
-            company_count = await AnalyticsService.get_collections_company_count(user_id)
-            top_companies = await AnalyticsService.get_collections_top_companies(user_id, 5)
+            total = collections["total"][0]["count"] if collections.get("total") else 0
+            stats = {"total": total, "read": 0, "unread": total, "starred": 0}
+            counts = AnalyticsService._company_counts(collections.get("companies", []))
+            company_count = len(counts)
+            top_companies = AnalyticsService._top_companies(counts, 5)
         else:
-            company_count = await AnalyticsService.get_company_count(user_id)
-            top_companies = await AnalyticsService.get_top_companies(user_id, 5)
+            company_count = len(companies)
+            top_companies = companies[:5]
+
+        by_status = emails.get("by_status", [])
+        funnel = {status: 0 for status in STATUSES}
+        for row in by_status:
+            if row["_id"] in funnel:
+                funnel[row["_id"]] = row["count"]
 
         # The advanced breakdowns rely on fields that exist only in the emails collection
         # Keep them, but they may be empty when falling back.
         return {
             "stats": stats,
             "company_count": company_count,
-            "by_status": await AnalyticsService.get_emails_by_application_status(user_id),
-            "by_type": await AnalyticsService.get_emails_by_job_type(user_id),
-            "by_experience": await AnalyticsService.get_emails_by_experience_level(user_id),
-            "by_company": await AnalyticsService.get_top_companies(user_id),
-            "funnel": await AnalyticsService.get_application_funnel(user_id),
+            "by_status": by_status,
+            "by_type": emails.get("by_type", []),
+            "by_experience": emails.get("by_experience", []),
+            "by_company": companies[:10],
+            "funnel": funnel,
             "top_companies": top_companies,
-            "applications_over_time": await AnalyticsService.get_applications_over_time(user_id),
-            "predictive_insights": await AnalyticsService.get_predictive_insights(user_id),
-            "top_positions": await AnalyticsService.get_top_positions(user_id, 5)
+            "applications_over_time": AnalyticsService._applications_over_time(collections.get("timeline", []), legacy),
+            "predictive_insights": AnalyticsService._predictive_insights(
+                collections.get("statuses", []), legacy, thirty_days_ago, fifteen_days_ago
+            ),
+            "top_positions": emails.get("top_positions", [])
         }
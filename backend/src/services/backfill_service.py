@@ -0,0 +1,194 @@
+import asyncio
+from typing import Dict, Optional
+from datetime import datetime
+from bson import ObjectId
+from src.config import settings
+from src.database import db
+from src.services.gmail_service import GmailService
+from src.services.sync_service import SyncService
+
+
+class BackfillService:
+    """Resumable import of a whole mailbox into the emails collection.
+    Walks every messages.list page and streams each page through fetch -> parse -> bulk_write
+    in bounded chunks. The checkpoint in backfill_jobs (token of the current page plus the last
+    message written from it) is saved after every chunk, so a restart resumes where it stopped.
+    """
+
+    # Running jobs in this process, keyed by user id
+    _tasks: Dict[str, asyncio.Task] = {}
+
+    @staticmethod
+    def _serialize(job: Optional[Dict]) -> Optional[Dict]:
+        if job:
+            job["_id"] = str(job["_id"])
+            task = BackfillService._tasks.get(job["user_id"])
+            job["active"] = bool(task and not task.done())
+        return job
+
+    @staticmethod
+    async def get_status(user_id: str) -> Optional[Dict]:
+        job = await db.get_db().backfill_jobs.find_one({"user_id": user_id})
+        return BackfillService._serialize(job)
+
+    @staticmethod
+    async def start(user: Dict, gmail: GmailService, query: str = "", restart: bool = False) -> Dict:
+        user_id = str(user["_id"])
+        task = BackfillService._tasks.get(user_id)
+        if task and not task.done():
+            return await BackfillService.get_status(user_id)
+
+        jobs = db.get_db().backfill_jobs
+        job = await jobs.find_one({"user_id": user_id})
+        now = datetime.utcnow()
+
+        if job is None or restart or job.get("status") == "completed" or job.get("query", "") != query:
+            profile = await gmail.get_profile()
+            # A fresh backfill also seeds the incremental-sync checkpoint if there is none yet
+            if not user.get("gmail_history_id") and profile.get("historyId"):
+                await db.get_db().users.update_one(
+                    {"_id": ObjectId(user_id)},
+                    {"$set": {"gmail_history_id": str(profile["historyId"]), "updated_at": now}}
+                )
+            await jobs.update_one(
+                {"user_id": user_id},
+                {"$set": {
+                    "user_id": user_id,
+                    "query": query,
+                    "status": "running",
+                    "page_token": None,
+                    "last_message_id": None,
+                    "processed": 0,
+                    "inserted": 0,
+                    "failed": 0,
+                    "pages": 0,
+                    "estimated_total": None if query else profile.get("messagesTotal"),
+                    "cancel_requested": False,
+                    "error": None,
+                    "started_at": now,
+                    "finished_at": None,
+                    "updated_at": now,
+                }},
+                upsert=True
+            )
+        else:
+            await jobs.update_one(
+                {"user_id": user_id},
+                {"$set": {"status": "running", "cancel_requested": False, "error": None, "updated_at": now}}
+            )
+
+        BackfillService._tasks[user_id] = asyncio.create_task(BackfillService._run(user_id, gmail))
+        return await BackfillService.get_status(user_id)
+
+    @staticmethod
+    async def cancel(user_id: str) -> Optional[Dict]:
+        await db.get_db().backfill_jobs.update_one(
+            {"user_id": user_id, "status": "running"},
+            {"$set": {"cancel_requested": True, "updated_at": datetime.utcnow()}}
+        )
+        task = BackfillService._tasks.get(user_id)
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        else:
+            # The job may belong to a process that is gone; mark it directly
+            await db.get_db().backfill_jobs.update_one(
+                {"user_id": user_id, "status": "running"},
+                {"$set": {"status": "cancelled", "finished_at": datetime.utcnow()}}
+            )
+        return await BackfillService.get_status(user_id)
+
+    @staticmethod
+    async def shutdown():
+        """Stop in-process jobs; their checkpoints stay resumable."""
+        tasks = list(BackfillService._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        BackfillService._tasks.clear()
+
+    @staticmethod
+    async def _run(user_id: str, gmail: GmailService):
+        jobs = db.get_db().backfill_jobs
+        job = await jobs.find_one({"user_id": user_id})
+        query = job.get("query", "")
+        page_token = job.get("page_token")
+        resume_after = job.get("last_message_id")
+        chunk_size = max(1, settings.backfill_chunk_size)
+
+        try:
+            while True:
+                message_ids, next_page_token, estimate = await gmail.list_message_page(
+                    query=query, page_token=page_token, max_results=settings.backfill_page_size
+                )
+                if resume_after and resume_after in message_ids:
+                    message_ids = message_ids[message_ids.index(resume_after) + 1:]
+                resume_after = None
+
+                for start in range(0, len(message_ids), chunk_size):
+                    chunk = message_ids[start:start + chunk_size]
+                    # The emails collection is the copy that matters; caching the whole mailbox too would
+                    # double its storage and evict the messages list views use
+                    emails = await gmail.fetch_messages(chunk, use_cache=False)
+                    inserted = await SyncService.upsert_emails(user_id, emails)
+                    progress = await jobs.find_one_and_update(
+                        {"user_id": user_id},
+                        {
+                            "$set": {"page_token": page_token, "last_message_id": chunk[-1], "updated_at": datetime.utcnow()},
+                            "$inc": {"processed": len(chunk), "inserted": inserted, "failed": len(chunk) - len(emails)},
+                        },
+                        projection={"cancel_requested": 1},
+                        return_document=True
+                    )
+                    if progress and progress.get("cancel_requested"):
+                        raise asyncio.CancelledError()
+
+                # The page is done: count it and move the checkpoint to the next one in the same write
+                page_done = {"updated_at": datetime.utcnow()}
+                if next_page_token:
+                    page_done.update({"page_token": next_page_token, "last_message_id": None})
+                await jobs.update_one(
+                    {"user_id": user_id},
+                    {"$set": page_done, "$inc": {"pages": 1}, "$max": {"estimated_total": estimate}}
+                )
+                if not next_page_token:
+                    break
+                page_token = next_page_token
+
+            job = await jobs.find_one_and_update(
+                {"user_id": user_id},
+                {"$set": {"status": "completed", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+                projection={"failed": 1, "started_at": 1},
+                return_document=True
+            )
+            if not query and not job.get("failed"):
+                # Everything before the job started is stored now (unless a message failed to fetch). A range
+                # that starts after that (history expired mid-run and a full sync restarted it) would leave
+                # a gap, so it is left alone.
+                started_at = job.get("started_at")
+                await db.get_db().users.update_one(
+                    {"_id": ObjectId(user_id), "$or": [
+                        {"coverage_until": None}, {"coverage_complete": True}, {"coverage_since": {"$lte": started_at}},
+                    ]},
+                    {"$set": {"coverage_since": None, "coverage_complete": True}, "$max": {"coverage_until": started_at}}
+                )
+            print(f"DEBUG: Backfill completed for user {user_id}")
+        except asyncio.CancelledError:
+            job = await jobs.find_one({"user_id": user_id}, {"cancel_requested": 1})
+            status = "cancelled" if job and job.get("cancel_requested") else "paused"
+            await jobs.update_one(
+                {"user_id": user_id},
+                {"$set": {"status": status, "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}}
+            )
+            print(f"DEBUG: Backfill {status} for user {user_id}")
+        except Exception as e:
+            print(f"Error during backfill for user {user_id}: {e}")
+            await jobs.update_one(
+                {"user_id": user_id},
+                {"$set": {"status": "failed", "error": str(e), "updated_at": datetime.utcnow()}}
+            )
+        finally:
+            BackfillService._tasks.pop(user_id, None)
@@ -0,0 +1,146 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# (field, label, phrases, weight). A weight is how sure one phrase alone makes us of the label;
+# matched rules for the same label combine as 1 - prod(1 - weight).
+# Phrases are matched longest-first and without overlap, so "not extending an offer" is read as a
+# rejection and never also counts as "offer".
+RULES: List[Tuple[str, str, Tuple[str, ...], float]] = [
+    # Application status
+    ("application_status", "rejected", ("not be extending an offer", "not extending an offer", "not be making an offer",
+                                        "not making an offer", "not be extending you an offer", "not extending you an offer"), 0.97),
+    ("application_status", "rejected", ("regret to inform", "regret to let you know"), 0.95),
+    ("application_status", "rejected", ("decided to pursue other", "decided to proceed with other",
+                                        "decided to move forward with other", "decided to go with other"), 0.95),
+    ("application_status", "rejected", ("not move forward", "not moving forward", "not to move forward",
+                                        "not proceed", "not proceeding", "not to proceed"), 0.9),
+    ("application_status", "rejected", ("not selected", "not been selected"), 0.9),
+    ("application_status", "rejected", ("position has been filled", "role has been filled"), 0.9),
+    ("application_status", "rejected", ("unsuccessful",), 0.85),
+    ("application_status", "rejected", ("unfortunately",), 0.85),
+    ("application_status", "rejected", ("reject", "rejected", "rejection"), 0.8),
+    ("application_status", "rejected", ("decline", "declined"), 0.5),
+    ("application_status", "rejected", ("regret",), 0.5),
+    ("application_status", "offer", ("pleased to offer", "happy to offer", "delighted to offer", "excited to offer",
+                                     "pleased to extend", "happy to extend", "delighted to extend", "excited to extend",
+                                     "we are pleased to offer", "we're pleased to offer", "we are happy to offer",
+                                     "we're happy to offer", "we are excited to offer", "we're excited to offer",
+                                     "we are delighted to offer", "we're delighted to offer"), 0.95),
+    ("application_status", "offer", ("extend an offer", "extend you an offer", "extending an offer",
+                                     "extending you an offer"), 0.9),
+    ("application_status", "offer", ("offer letter",), 0.9),
+    ("application_status", "offer", ("job offer",), 0.8),
+    ("application_status", "offer", ("congratulations",), 0.6),
+    ("application_status", "offer", ("offer",), 0.4),
+    ("application_status", "offer", ("we're pleased", "we are pleased", "we're excited", "we are excited",
+                                     "we're thrilled", "we are thrilled"), 0.4),
+    ("application_status", "offer", ("accepted", "approved"), 0.3),
+    ("application_status", "interview", ("phone screen", "video screen", "recruiter screen", "phone screening",
+                                         "recruiter screening"), 0.9),
+    ("application_status", "interview", ("technical interview", "onsite interview", "on-site interview",
+                                         "final interview", "final round", "technical assessment",
+                                         "coding assessment", "coding interview"), 0.9),
+    ("application_status", "interview", ("interview", "interviews"), 0.8),
+    ("application_status", "interview", ("schedule a call", "schedule a chat", "schedule a time",
+                                         "schedule a meeting", "schedule an interview", "schedule your interview"), 0.8),
+    ("application_status", "interview", ("your availability",), 0.5),
+    ("application_status", "interview", ("next step", "next steps"), 0.4),
+    ("application_status", "interview", ("call", "meeting", "schedule"), 0.3),
+    ("application_status", "interview", ("discuss",), 0.2),
+    ("application_status", "applied", ("received your application", "we've received your application",
+                                       "we have received your application"), 0.9),
+    ("application_status", "applied", ("thank you for applying", "thank you for your application",
+                                       "thank you for your interest"), 0.9),
+    ("application_status", "applied", ("application received", "application submitted",
+                                       "application has been received", "application has been submitted"), 0.9),
+    ("application_status", "applied", ("applied",), 0.5),
+    ("application_status", "applied", ("application",), 0.3),
+    # Job type
+    ("job_type", "full-time", ("full-time", "full time", "fulltime"), 0.9),
+    ("job_type", "part-time", ("part-time", "part time", "parttime"), 0.9),
+    ("job_type", "internship", ("intern", "interns", "internship", "internships"), 0.85),
+    ("job_type", "contract", ("contract", "contractor", "contracting", "freelance"), 0.7),
+    # Experience level
+    ("experience_level", "mid", ("mid-level", "mid level"), 0.8),
+    ("experience_level", "junior", ("junior", "jr", "entry-level", "entry level", "new grad", "new graduate"), 0.7),
+    ("experience_level", "senior", ("senior", "sr", "staff", "principal"), 0.7),
+    ("experience_level", "executive", ("director", "vice president", "vp", "head of", "chief technology officer",
+                                       "chief executive officer", "cto", "ceo"), 0.7),
+]
+
+# A later stage implies the application, so 'applied' evidence doesn't compete with it
+SUBSUMED = {"application_status": {"applied"}}
+# Ties go to the label listed first
+PRECEDENCE = {
+    "application_status": ["offer", "rejected", "interview", "applied"],
+    "job_type": ["full-time", "part-time", "internship", "contract"],
+    "experience_level": ["executive", "senior", "mid", "junior"],
+}
+
+_AMOUNT = r"[$€£]\s?\d[\d,]*(?:\.\d+)?\s?k?"
+_SALARY = rf"{_AMOUNT}(?:\s?(?:-|–|to)\s?{_AMOUNT})?(?:\s?(?:per|/)\s?(?:year|yr|hour|hr|annum))?"
+
+
+def _trie_pattern(phrases) -> str:
+    """Regex for a set of phrases, merged into a prefix trie so each position tries one branch per
+    character instead of every phrase; longer phrases win."""
+    trie: Dict = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict) -> str:
+        branches = [
+            (r"\s+" if char == " " else re.escape(char)) + emit(child)
+            for char, child in sorted(node.items()) if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if "" in node else body
+
+    return emit(trie)
+
+
+# phrase -> index into RULES
+_PHRASES: Dict[str, int] = {phrase: index for index, (_, _, phrases, _) in enumerate(RULES) for phrase in phrases}
+# Every phrase of every rule in one pass over the lowercased text, plus salary mentions
+_ENGINE = re.compile(rf"(?P<salary>{_SALARY})|\b(?P<phrase>{_trie_pattern(_PHRASES)})\b")
+
+
+def classify(subject: str, body: str) -> Dict[str, Tuple[Optional[str], float]]:
+    """Rule-based labels for application_status, job_type and experience_level, each as
+    (label or None, confidence in [0, 1]), plus ("salary", (first salary mention, 1.0 or 0.0)).
+    Confidence is the winning label's combined evidence, discounted by the strongest competing label.
+    """
+    text = f"{subject or ''}\n{body or ''}".lower().replace("\u2019", "'")
+    evidence: Dict[str, Dict[str, float]] = {field: {} for field in PRECEDENCE}
+    seen = set()
+    salary = None
+
+    for match in _ENGINE.finditer(text):
+        if match.lastgroup == "salary":
+            salary = salary or match.group().strip()
+            continue
+        rule = _PHRASES[" ".join(match.group().split())]
+        if rule in seen:
+            continue
+        seen.add(rule)
+        field, label, _, weight = RULES[rule]
+        labels = evidence[field]
+        labels[label] = 1 - (1 - labels.get(label, 0.0)) * (1 - weight)
+
+    result: Dict[str, Tuple[Optional[str], float]] = {}
+    for field, labels in evidence.items():
+        if not labels:
+            result[field] = (None, 0.0)
+            continue
+        order = PRECEDENCE[field]
+        label = max(labels, key=lambda name: (labels[name], -order.index(name)))
+        subsumed = SUBSUMED.get(field, set()) if label not in SUBSUMED.get(field, set()) else set()
+        competing = max((score for name, score in labels.items() if name != label and name not in subsumed), default=0.0)
+        result[field] = (label, round(labels[label] * (1 - competing), 4))
+    result["salary"] = (salary, 1.0 if salary else 0.0)
+    return result
@@ -0,0 +1,93 @@
+from typing import Dict, Optional, Union
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import re
+from src.services.analytics_service import AnalyticsService
+
+MONTHS = {"Jan": 1, "Feb": 2, "Mar": 3, "Apr": 4, "May": 5, "Jun": 6,
+          "Jul": 7, "Aug": 8, "Sep": 9, "Oct": 10, "Nov": 11, "Dec": 12}
+
+
+def parse_received_at(value: Union[str, datetime, None]) -> Optional[datetime]:
+    """Parse a Gmail Date header (RFC 2822), ISO string or datetime into a naive UTC datetime."""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        parsed = value
+    else:
+        parsed = None
+        try:
+            parsed = parsedate_to_datetime(value)
+        except (TypeError, ValueError, IndexError):
+            pass
+        if parsed is None:
+            try:
+                parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+            except ValueError:
+                pass
+        if parsed is None:
+            # Last resort: a bare "7 Nov 2025" somewhere in the string
+            rfc_match = re.search(r'(\d{1,2})\s+([A-Z][a-z]{2})\w*\s+(\d{4})', value)
+            if rfc_match and rfc_match.group(2) in MONTHS:
+                day, month_str, year = rfc_match.groups()
+                parsed = datetime(int(year), MONTHS[month_str], int(day))
+    if parsed is None:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def detect_language(subject: str, body: str) -> str:
+    try:
+        from langdetect import detect
+        return detect(f"{subject} {body[:500]}")
+    except Exception:
+        return "other"
+
+
+def build_email_upsert(user_id: str, email: Dict) -> Dict:
+    """Build the update document that upserts a parsed Gmail message into the emails collection.
+    Gmail-owned fields are refreshed on every sync; enrichment fields are only initialised on insert.
+    """
+    now = datetime.utcnow()
+    subject = email.get("subject", "")
+    body = email.get("body", "")
+    return {
+        "$set": {
+            "user_id": user_id,
+            "gmail_id": email["gmail_id"],
+            "from": email.get("from", ""),
+            "to": email.get("to", []),
+            "subject": subject,
+            "body": body,
+            "received_at": parse_received_at(email.get("received_at")) or now,
+            "updated_at": now,
+        },
+        "$setOnInsert": {
+            "language": detect_language(subject, body),
+            "company": AnalyticsService._derive_company(email.get("from")),
+            "position": None,
+            "job_type": None,
+            "application_status": None,
+            "salary": None,
+            "experience_level": None,
+            "key_skills": [],
+            "enriched_at": None,
+            "tags": [],
+            "starred": False,
+            "read": False,
+            "created_at": now,
+        },
+    }
+
+
+def collection_email_fields(email: Dict) -> Dict:
+    """Fields derived once when an email is added to a collection, so analytics never re-parse
+    dates or re-classify bodies: inferred application_status, received_date (naive UTC) and company.
+    """
+    return {
+        "application_status": AnalyticsService._infer_status(email.get("subject", ""), email.get("body", "")),
+        "received_date": parse_received_at(email.get("received_at")),
+        "company": AnalyticsService._derive_company(email.get("from")),
+    }
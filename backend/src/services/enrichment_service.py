@@ -0,0 +1,231 @@
+import asyncio
+from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from src.config import settings
+from src.database import db
+from src.services.llm_service import LLMService
+from src.services.analytics_rollup import AnalyticsRollup, EMAIL_ROLLUP_FIELDS
+from src.services.search_index import SearchIndex
+
+
+class EnrichmentService:
+    """Background LLM metadata extraction for stored emails.
+    enrichment_jobs holds one job per (user_id, gmail_id): pending -> processing -> done, or dead once
+    it has failed enrichment_max_attempts times. Workers claim jobs atomically, extract metadata for
+    each claim with one batched LLM pass and write the fields back with guarded updates. Emails that
+    already carry enriched_at are skipped, so re-queueing is harmless. Emails the LLM couldn't answer
+    for (an outage left only keyword guesses) are not written; their jobs back off like any failure.
+    """
+
+    _workers: List[asyncio.Task] = []
+    _wakeup: Optional[asyncio.Event] = None
+
+    @staticmethod
+    async def enqueue(user_id: str, gmail_ids: List[str]) -> int:
+        """Queue emails for enrichment; ids already queued are left alone. Returns the number newly queued."""
+        if not settings.enrichment_enabled or not gmail_ids:
+            return 0
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"user_id": user_id, "gmail_id": gmail_id},
+                {"$setOnInsert": {
+                    "user_id": user_id,
+                    "gmail_id": gmail_id,
+                    "status": "pending",
+                    "attempts": 0,
+                    "next_attempt_at": now,
+                    "locked_at": None,
+                    "error": None,
+                    "created_at": now,
+                    "updated_at": now,
+                }},
+                upsert=True
+            )
+            for gmail_id in gmail_ids
+        ]
+        try:
+            result = await db.get_db().enrichment_jobs.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Error queueing emails for enrichment: {e}")
+            return 0
+        if EnrichmentService._wakeup is not None:
+            EnrichmentService._wakeup.set()
+        return result.upserted_count
+
+    @staticmethod
+    async def enqueue_unenriched(user_id: str) -> int:
+        """Queue every stored email of a user that has not been enriched yet."""
+        cursor = db.get_db().emails.find({"user_id": user_id, "enriched_at": None}, {"gmail_id": 1})
+        gmail_ids = [doc["gmail_id"] async for doc in cursor if doc.get("gmail_id")]
+        return await EnrichmentService.enqueue(user_id, gmail_ids)
+
+    @staticmethod
+    async def get_status(user_id: str) -> Dict:
+        pipeline = [
+            {"$match": {"user_id": user_id}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}},
+        ]
+        counts = {"pending": 0, "processing": 0, "done": 0, "dead": 0}
+        async for row in db.get_db().enrichment_jobs.aggregate(pipeline):
+            counts[row["_id"]] = row["count"]
+        return counts
+
+    @staticmethod
+    def start():
+        if not settings.enrichment_enabled or EnrichmentService._workers:
+            return
+        EnrichmentService._wakeup = asyncio.Event()
+        EnrichmentService._workers = [
+            asyncio.create_task(EnrichmentService._worker(index))
+            for index in range(settings.enrichment_workers)
+        ]
+
+    @staticmethod
+    async def shutdown():
+        """Stop the workers; claimed jobs are picked up again once their lease expires."""
+        workers = EnrichmentService._workers
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        EnrichmentService._workers = []
+        EnrichmentService._wakeup = None
+
+    @staticmethod
+    async def _worker(index: int):
+        worker_id = f"worker-{index}"
+        while True:
+            try:
+                jobs = await EnrichmentService._claim(worker_id)
+                if jobs:
+                    await EnrichmentService._process(jobs)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Error in enrichment {worker_id}: {e}")
+
+            wakeup = EnrichmentService._wakeup
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=settings.enrichment_poll_seconds)
+                wakeup.clear()
+            except asyncio.TimeoutError:
+                pass
+
+    @staticmethod
+    async def _claim(worker_id: str) -> List[Dict]:
+        """Atomically take up to enrichment_claim_size due jobs of one user.
+        Jobs stuck in processing past the lease (a worker died) are claimable again.
+        """
+        jobs = db.get_db().enrichment_jobs
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": "pending", "next_attempt_at": {"$lte": now}},
+            {"status": "processing", "locked_at": {"$lt": now - timedelta(seconds=settings.enrichment_lease_seconds)}},
+        ]}
+        claim = {"$set": {"status": "processing", "locked_at": now, "locked_by": worker_id, "updated_at": now}}
+
+        first = await jobs.find_one_and_update(due, claim, sort=[("next_attempt_at", 1)], return_document=True)
+        if not first:
+            return []
+        claimed = [first]
+        # Keep a claim to one user so it maps onto a single extraction batch and write
+        same_user = {"$and": [due, {"user_id": first["user_id"]}]}
+        while len(claimed) < settings.enrichment_claim_size:
+            job = await jobs.find_one_and_update(same_user, claim, return_document=True)
+            if not job:
+                break
+            claimed.append(job)
+        return claimed
+
+    @staticmethod
+    async def _process(jobs: List[Dict]):
+        user_id = jobs[0]["user_id"]
+        gmail_ids = [job["gmail_id"] for job in jobs]
+        retry_ids = set()
+        try:
+            emails = await db.get_db().emails.find(
+                {"user_id": user_id, "gmail_id": {"$in": gmail_ids}, "enriched_at": None},
+                {"gmail_id": 1, "subject": 1, "body": 1, "from": 1, **EMAIL_ROLLUP_FIELDS}
+            ).to_list(None)
+            if emails:
+                metadata = await LLMService.extract_email_metadata_batch([
+                    {"id": email["gmail_id"], "subject": email.get("subject", ""),
+                     "body": email.get("body") or "", "from": email.get("from", "")}
+                    for email in emails
+                ])
+                retry_ids = {gmail_id for gmail_id, fields in metadata.items() if fields.get("source") == "fallback"}
+                metadata = {gmail_id: fields for gmail_id, fields in metadata.items() if gmail_id not in retry_ids}
+                written = await EnrichmentService._write_metadata(user_id, metadata)
+                # Only emails this write changed: another worker may have enriched (and counted) the rest
+                by_id = {email["gmail_id"]: email for email in emails}
+                await AnalyticsRollup.record_email_changes(user_id, [
+                    (by_id[gmail_id], {**by_id[gmail_id], **EnrichmentService._metadata_fields(metadata[gmail_id])})
+                    for gmail_id in written if gmail_id in by_id
+                ])
+                await SearchIndex.update_facets(user_id, {
+                    gmail_id: EnrichmentService._metadata_fields(metadata[gmail_id])
+                    for gmail_id in written if gmail_id in by_id
+                })
+            done = [job["_id"] for job in jobs if job["gmail_id"] not in retry_ids]
+            if done:
+                await db.get_db().enrichment_jobs.update_many(
+                    {"_id": {"$in": done}},
+                    {"$set": {"status": "done", "locked_at": None, "error": None, "updated_at": datetime.utcnow()}}
+                )
+            if retry_ids:
+                await EnrichmentService._fail([job for job in jobs if job["gmail_id"] in retry_ids],
+                                              "LLM extraction unavailable")
+        except Exception as e:
+            print(f"Error enriching {len(jobs)} emails for user {user_id}: {e}")
+            await EnrichmentService._fail(jobs, str(e))
+
+    @staticmethod
+    def _metadata_fields(fields: Dict) -> Dict:
+        """Email document fields for one extraction."""
+        return {
+            "job_type": fields.get("job_type"),
+            "application_status": fields.get("application_status"),
+            "salary": fields.get("salary"),
+            "experience_level": fields.get("experience_level"),
+            "position": fields.get("job_title"),
+            "key_skills": fields.get("key_skills", []),
+        }
+
+    @staticmethod
+    async def _write_metadata(user_id: str, metadata: Dict[str, Dict]) -> List[str]:
+        """Write each extraction and return the gmail_ids whose document this call actually enriched.
+        One update per email, since a bulk_write's counts can't say which of its updates matched."""
+        now = datetime.utcnow()
+        emails = db.get_db().emails
+
+        async def write(gmail_id: str, fields: Dict) -> bool:
+            result = await emails.update_one(
+                # Only the first enrichment writes; later user edits are never overwritten
+                {"user_id": user_id, "gmail_id": gmail_id, "enriched_at": None},
+                {"$set": {**EnrichmentService._metadata_fields(fields), "enriched_at": now, "updated_at": now}}
+            )
+            return result.modified_count > 0
+
+        gmail_ids = list(metadata)
+        modified = await asyncio.gather(*(write(gmail_id, metadata[gmail_id]) for gmail_id in gmail_ids))
+        return [gmail_id for gmail_id, changed in zip(gmail_ids, modified) if changed]
+
+    @staticmethod
+    async def _fail(jobs: List[Dict], error: str):
+        now = datetime.utcnow()
+        operations = []
+        for job in jobs:
+            attempts = job.get("attempts", 0) + 1
+            if attempts >= settings.enrichment_max_attempts:
+                update = {"status": "dead"}
+            else:
+                delay = settings.enrichment_retry_base_seconds * 2 ** (attempts - 1)
+                update = {"status": "pending", "next_attempt_at": now + timedelta(seconds=delay)}
+            update.update({"attempts": attempts, "locked_at": None, "error": error, "updated_at": now})
+            operations.append(UpdateOne({"_id": job["_id"]}, {"$set": update}))
+        try:
+            await db.get_db().enrichment_jobs.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Error recording enrichment failure: {e}")
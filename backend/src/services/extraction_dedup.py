@@ -0,0 +1,173 @@
+import hashlib
+import re
+from datetime import datetime
+from typing import Dict, List, Tuple
+from pymongo import UpdateOne
+from src.config import settings
+from src.database import db
+
+FINGERPRINT_BITS = 64
+# Near-duplicates within MAX distance share at least one exact band (pigeonhole), so bands index the lookup
+BAND_COUNT = 4
+BAND_BITS = FINGERPRINT_BITS // BAND_COUNT
+SHINGLE_SIZE = 3
+
+_URL = re.compile(r"https?://\S+|www\.\S+")
+_EMAIL_ADDRESS = re.compile(r"\S+@\S+")
+# "$120,000" -> "usd120000", so amounts survive as one token and differing amounts differ
+_AMOUNT = re.compile(r"([$€£])\s?(\d[\d,.]*)")
+CURRENCIES = {"$": "usd", "€": "eur", "£": "gbp"}
+# Only these categorical fields carry over from a near-duplicate; a template's copies share them,
+# while salary, title and skills are per-recipient (and the index is shared across users)
+REUSABLE_FIELDS = ("application_status", "job_type", "experience_level")
+# The recipient's name in the salutation is the usual per-copy difference in templated mail
+_GREETING = re.compile(r"\b(dear|hi|hello|hey)\s+\w+(\s+\w+)?\s*,")
+_WORD = re.compile(r"\w+")
+
+
+def normalize_email_text(subject: str, body: str) -> List[str]:
+    """Lowercased words of subject and (truncated) body with URLs, addresses and the salutation
+    name masked, so copies of one template differing only in those stay identical. Numbers and
+    currency amounts are kept: offers differing in salary or level are not the same email."""
+    text = f"{subject or ''} {(body or '')[:settings.llm_extraction_body_chars]}".lower()
+    text = _URL.sub(" url ", text)
+    text = _EMAIL_ADDRESS.sub(" address ", text)
+    text = _AMOUNT.sub(lambda match: " " + CURRENCIES[match.group(1)] + re.sub(r"\D", "", match.group(2)) + " ", text)
+    text = _GREETING.sub(r"\1 name,", text)
+    return _WORD.findall(text)
+
+
+def simhash(words: List[str]) -> int:
+    """64-bit SimHash over word shingles."""
+    if len(words) < SHINGLE_SIZE:
+        shingles = [" ".join(words)]
+    else:
+        shingles = [" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)]
+    weights = [0] * FINGERPRINT_BITS
+    for shingle in shingles:
+        value = int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), "big")
+        for bit in range(FINGERPRINT_BITS):
+            weights[bit] += 1 if value >> bit & 1 else -1
+    return sum(1 << bit for bit, weight in enumerate(weights) if weight > 0)
+
+
+def bands(fingerprint: int) -> List[str]:
+    mask = (1 << BAND_BITS) - 1
+    return [f"{index}:{fingerprint >> (index * BAND_BITS) & mask:x}" for index in range(BAND_COUNT)]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+class ExtractionDedup:
+    """Reuses LLM metadata extractions for near-duplicate emails.
+    saved_calls counts per-email extractions that never reached the LLM.
+    Fingerprints (SimHash of the normalized subject and body) and the extraction they produced are
+    stored in extraction_fingerprints, shared across users and restarts; an email within
+    extraction_dedup_max_distance bits of a stored fingerprint reuses its REUSABLE_FIELDS. Only
+    those are stored, so no user's salary or job title is ever copied onto another's email.
+    """
+
+    def __init__(self):
+        self.lookups = 0
+        self.saved_calls = 0
+
+    @staticmethod
+    def fingerprint(subject: str, body: str) -> int:
+        return simhash(normalize_email_text(subject, body))
+
+    def cluster(self, fingerprints: Dict[str, int]) -> Tuple[List[str], Dict[str, str]]:
+        """Collapse near-duplicates within one batch. Returns representative ids and follower -> representative."""
+        representatives: List[str] = []
+        followers: Dict[str, str] = {}
+        for email_id, fingerprint in fingerprints.items():
+            for representative in representatives:
+                if hamming(fingerprint, fingerprints[representative]) <= settings.extraction_dedup_max_distance:
+                    followers[email_id] = representative
+                    break
+            else:
+                representatives.append(email_id)
+        self.saved_calls += len(followers)
+        return representatives, followers
+
+    async def lookup(self, fingerprints: Dict[str, int]) -> Dict[str, Dict]:
+        """Stored REUSABLE_FIELDS for the ids whose fingerprint has a near-duplicate in the index."""
+        if not fingerprints:
+            return {}
+        self.lookups += len(fingerprints)
+        wanted = sorted({band for fingerprint in fingerprints.values() for band in bands(fingerprint)})
+        collection = db.get_db().extraction_fingerprints
+        try:
+            candidates = await collection.find(
+                {"bands": {"$in": wanted}},
+                {"fingerprint": 1, **{f"metadata.{field}": 1 for field in REUSABLE_FIELDS}}
+            ).to_list(None)
+        except Exception as e:
+            print(f"Extraction dedup lookup failed: {e}")
+            return {}
+
+        found: Dict[str, Dict] = {}
+        used = []
+        for email_id, fingerprint in fingerprints.items():
+            best = None
+            for candidate in candidates:
+                distance = hamming(fingerprint, int(candidate["fingerprint"], 16))
+                if distance <= settings.extraction_dedup_max_distance and (best is None or distance < best[0]):
+                    best = (distance, candidate)
+            if best:
+                metadata = best[1].get("metadata") or {}
+                found[email_id] = {field: metadata.get(field) for field in REUSABLE_FIELDS}
+                used.append(best[1]["_id"])
+
+        if used:
+            self.saved_calls += len(used)
+            try:
+                await collection.bulk_write(
+                    [UpdateOne({"_id": doc_id}, {"$inc": {"hits": 1}, "$set": {"last_used_at": datetime.utcnow()}})
+                     for doc_id in used],
+                    ordered=False
+                )
+            except Exception as e:
+                print(f"Extraction dedup hit update failed: {e}")
+        return found
+
+    async def store(self, extractions: Dict[int, Dict]):
+        """Index fingerprint -> REUSABLE_FIELDS for extractions that came from an LLM."""
+        if not extractions:
+            return
+        now = datetime.utcnow()
+        operations = [
+            UpdateOne(
+                {"fingerprint": f"{fingerprint:016x}"},
+                {
+                    "$set": {"metadata": {field: metadata.get(field) for field in REUSABLE_FIELDS},
+                             "last_used_at": now},
+                    "$setOnInsert": {"fingerprint": f"{fingerprint:016x}", "bands": bands(fingerprint),
+                                     "hits": 0, "created_at": now},
+                },
+                upsert=True
+            )
+            for fingerprint, metadata in extractions.items()
+        ]
+        try:
+            await db.get_db().extraction_fingerprints.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Extraction dedup write failed: {e}")
+
+    async def total_saved_calls(self) -> int:
+        """LLM calls saved across all processes since the index was created."""
+        pipeline = [{"$group": {"_id": None, "hits": {"$sum": "$hits"}}}]
+        async for row in db.get_db().extraction_fingerprints.aggregate(pipeline):
+            return row["hits"]
+        return 0
+
+    def snapshot(self) -> Dict:
+        return {
+            "lookups": self.lookups,
+            "saved_calls": self.saved_calls,
+            "hit_rate": round(self.saved_calls / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+
+extraction_dedup = ExtractionDedup()
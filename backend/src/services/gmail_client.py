@@ -0,0 +1,98 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Optional
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import HttpRequest
+from src.config import settings
+
+GOOGLE_TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+# Parsed once per process; the bundled static document avoids a network fetch on startup
+_discovery_document: Optional[dict] = None
+_discovery_lock = threading.Lock()
+
+
+def get_discovery_document() -> dict:
+    global _discovery_document
+    if _discovery_document is None:
+        with _discovery_lock:
+            if _discovery_document is None:
+                _discovery_document = json.loads(get_static_doc("gmail", "v1"))
+    return _discovery_document
+
+
+class _UserClient:
+    """A built Gmail Resource plus authorized transports for one user.
+    httplib2 is not thread-safe, so each worker thread gets its own AuthorizedHttp (and
+    keep-alive connection); all of them share one Credentials object, which refreshes itself on 401.
+    """
+
+    def __init__(self, access_token: str, refresh_token: Optional[str]):
+        self.initial_access_token = access_token
+        self.refresh_token = refresh_token
+        self.credentials = Credentials(
+            token=access_token,
+            refresh_token=refresh_token,
+            token_uri=GOOGLE_TOKEN_URI,
+            client_id=settings.google_client_id,
+            client_secret=settings.google_client_secret
+        )
+        self._local = threading.local()
+        self.service = build_from_document(
+            get_discovery_document(),
+            http=self.http(),
+            requestBuilder=self._build_request
+        )
+
+    def http(self) -> AuthorizedHttp:
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=settings.gmail_http_timeout))
+            self._local.http = http
+        return http
+
+    def _build_request(self, _http, *args, **kwargs) -> HttpRequest:
+        # Requests are built and executed inside asyncio.to_thread, so bind the calling thread's transport
+        return HttpRequest(self.http(), *args, **kwargs)
+
+    def matches(self, access_token: str, refresh_token: Optional[str]) -> bool:
+        """False once the user has re-authenticated and the stored tokens no longer describe this client."""
+        if refresh_token and refresh_token != self.refresh_token:
+            return False
+        return access_token in (self.initial_access_token, self.credentials.token)
+
+
+class GmailClientFactory:
+    """Process-wide pool of Gmail API clients, one per user, evicted least-recently-used."""
+
+    def __init__(self, max_clients: int):
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[str, _UserClient]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_service(self, user_key: str, access_token: str, refresh_token: Optional[str] = None):
+        with self._lock:
+            client = self._clients.get(user_key)
+            if client is not None and client.matches(access_token, refresh_token):
+                self._clients.move_to_end(user_key)
+                return client.service
+
+        client = _UserClient(access_token, refresh_token)
+        with self._lock:
+            self._clients[user_key] = client
+            self._clients.move_to_end(user_key)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+        return client.service
+
+    def evict(self, user_key: str):
+        with self._lock:
+            self._clients.pop(user_key, None)
+
+
+gmail_clients = GmailClientFactory(settings.gmail_client_pool_size)
@@ -1,114 +1,340 @@
 import asyncio
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from typing import List, Dict
-import base64
-from email.mime.text import MIMEText
-import re
+from typing import AsyncIterator, List, Dict, Optional
 from html import unescape
+from src.config import settings
+from src.services.rate_limiter import get_user_bucket, gmail_metrics
+from src.services.gmail_client import gmail_clients
+from src.services.gmail_transport import GoogleApiTransport, HttpxGmailTransport
+from src.services.mime_extractor import extract_body, html_to_text
+from src.services.message_cache import message_cache
+
+# Gmail rejects batch HTTP requests with more than 100 inner calls
+GMAIL_MAX_BATCH_SIZE = 100
+# Per-message statuses inside a batch that are worth retrying
+RETRYABLE_STATUSES = {429, 500, 502, 503}
+# Gmail quota units charged per users.messages.get call
+MESSAGES_GET_QUOTA_UNITS = 5
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    """True for Gmail 429s and 403s whose reason is (user)RateLimitExceeded."""
+    status = getattr(getattr(exc, 'resp', None), 'status', None)
+    if status == 429:
+        return True
+    if status == 403:
+        content = getattr(exc, 'content', b'') or b''
+        if isinstance(content, str):
+            content = content.encode()
+        return b'ateLimitExceeded' in content
+    return False
 
 
 def strip_html(html_text: str) -> str:
     """Remove HTML tags and decode HTML entities"""
-    if not html_text:
-        return ""
-    # Remove script and style tags
-    text = re.sub(r'<script[^>]*>.*?</script>', '', html_text, flags=re.DOTALL | re.IGNORECASE)
-    text = re.sub(r'<style[^>]*>.*?</style>', '', text, flags=re.DOTALL | re.IGNORECASE)
-    # Remove HTML tags
-    text = re.sub(r'<[^>]+>', '', text)
-    # Decode HTML entities
-    text = unescape(text)
-    # Clean up whitespace and normalize
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
+    return html_to_text(html_text)
+
+
+class HistoryExpiredError(Exception):
+    """The stored historyId is older than Gmail keeps history for; a full sync is required."""
 
 
 class GmailService:
-    def __init__(self, access_token: str, refresh_token: str):
-        creds = Credentials(
-            token=access_token,
-            refresh_token=refresh_token,
-            token_uri="https://oauth2.googleapis.com/token",
-            client_id=None,
-            client_secret=None
-        )
-        self.service = build('gmail', 'v1', credentials=creds)
-    
-    async def fetch_emails(self, query: str = '', max_results: int = 10) -> List[Dict]:
+    def __init__(self, access_token: str, refresh_token: str, user_id: Optional[str] = None):
+        # Rate limiting and caching are per Gmail user; fall back to the token when no user id is known
+        self.user_key = user_id or access_token
+        # The persistent message cache is only used when the owning user is known
+        self.user_id = user_id
+        if settings.gmail_transport == 'httpx':
+            self.transport = HttpxGmailTransport(self.user_key, access_token, refresh_token)
+        else:
+            self.service = gmail_clients.get_service(self.user_key, access_token, refresh_token)
+            self.transport = GoogleApiTransport(self.service)
+        self.bucket = get_user_bucket(self.user_key, settings.gmail_quota_units_per_second)
+        # Per-message failures of the most recent fetch, keyed by gmail_id
+        self.fetch_errors: Dict[str, str] = {}
+    
+    async def fetch_emails(self, query: str = '', max_results: int = 10, mode: Optional[str] = None,
+                           format: str = 'full') -> List[Dict]:
+        """List and fetch messages matching query.
+        format='metadata' only transfers the list-view headers plus Gmail's snippet as the body.
+        """
         try:
-            results = await asyncio.to_thread(
-                lambda: self.service.users().messages().list(
-                    userId='me',
-                    q=query,
-                    maxResults=max_results
-                ).execute()
-            )
-            
-            messages = results.get('messages', [])
-            emails = []
-            
-            for message in messages:
-                email_data = await self.get_email_details(message['id'])
-                if email_data:
-                    emails.append(email_data)
-            
-            return emails
+            message_ids = await self.list_message_ids(query=query, max_results=max_results)
+            return await self.fetch_messages(message_ids, mode=mode, format=format)
         except Exception as e:
             print(f"Error fetching emails: {e}")
             raise
     
-    async def get_email_details(self, message_id: str) -> Dict:
-        try:
-            message = await asyncio.to_thread(
-                lambda: self.service.users().messages().get(
-                    userId='me',
-                    id=message_id,
-                    format='full'
-                ).execute()
-            )
-            
-            headers = message['payload']['headers']
-            header_dict = {h['name']: h['value'] for h in headers}
-            
-            from_email = header_dict.get('From', '')
-            to_email = header_dict.get('To', '')
-            subject = header_dict.get('Subject', '').strip()
-            date = header_dict.get('Date', '')
-            
-            # Extract body - prefer plain text, fallback to HTML converted to text
-            body = ''
-            
-            if 'parts' in message['payload']:
-                for part in message['payload']['parts']:
-                    if part['mimeType'] == 'text/plain' and 'data' in part['body']:
-                        body = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                        break
-                
-                # If no plain text, try HTML
-                if not body:
-                    for part in message['payload']['parts']:
-                        if part['mimeType'] == 'text/html' and 'data' in part['body']:
-                            html = base64.urlsafe_b64decode(part['body']['data']).decode('utf-8')
-                            body = strip_html(html)
-                            break
-            elif 'body' in message['payload'] and 'data' in message['payload']['body']:
-                body = base64.urlsafe_b64decode(message['payload']['body']['data']).decode('utf-8')
-            
-            # Clean up body - limit to first 5000 chars
-            body = body.strip()[:5000] if body else ''
+    async def fetch_messages(self, message_ids: List[str], mode: Optional[str] = None, format: str = 'full',
+                             use_cache: bool = True) -> List[Dict]:
+        """Parsed messages in the order of message_ids; cached messages are served without calling Gmail.
+        use_cache=False bypasses the message cache for bulk imports that would only evict the working set."""
+        use_cache = use_cache and settings.message_cache_enabled and self.user_id is not None
+        cached = await message_cache.get_many(self.user_id, message_ids, format) if use_cache else {}
+        misses = [message_id for message_id in message_ids if message_id not in cached]
+        
+        fetched: List[Dict] = []
+        if misses:
+            if (mode or settings.gmail_fetch_mode) == 'concurrent':
+                fetched = await self.get_email_details_concurrent(misses, format=format)
+            else:
+                fetched = await self.get_email_details_batch(misses, format=format)
+            if use_cache:
+                await message_cache.put_many(self.user_id, fetched)
+        else:
+            self.fetch_errors = {}
+        
+        if not cached:
+            return fetched
+        by_id = {**cached, **{email['gmail_id']: email for email in fetched}}
+        return [by_id[message_id] for message_id in message_ids if message_id in by_id]
+    
+    async def list_message_ids(self, query: str = '', max_results: int = 10) -> List[str]:
+        message_ids, _, _ = await self.list_message_page(query=query, max_results=max_results)
+        return message_ids
+    
+    async def list_message_page(self, query: str = '', page_token: Optional[str] = None, max_results: int = 500):
+        """One page of messages.list. Returns (message ids, nextPageToken, resultSizeEstimate)."""
+        results = await self.transport.list_messages(query=query, page_token=page_token, max_results=max_results)
+        message_ids = [message['id'] for message in results.get('messages', [])]
+        return message_ids, results.get('nextPageToken'), results.get('resultSizeEstimate', 0)
+    
+    async def get_profile(self) -> Dict:
+        return await self.transport.get_profile()
+    
+    async def list_history(self, start_history_id: str):
+        """Replay mailbox history since start_history_id.
+        Returns (added message ids, deleted message ids, latest historyId).
+        Raises HistoryExpiredError when Gmail no longer has history that far back.
+        """
+        added: Dict[str, None] = {}
+        deleted: Dict[str, None] = {}
+        latest_history_id = start_history_id
+        page_token = None
+        
+        while True:
+            try:
+                page = await self.transport.list_history(start_history_id, page_token=page_token)
+            except Exception as e:
+                if getattr(getattr(e, 'resp', None), 'status', None) == 404:
+                    raise HistoryExpiredError(str(e))
+                raise
             
-            return {
-                'gmail_id': message_id,
-                'from': from_email.strip(),
-                'to': [to_email.strip()] if to_email else [],
-                'subject': subject,
-                'body': body,
-                'received_at': date
-            }
+            for record in page.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    added[item['message']['id']] = None
+                for item in record.get('messagesDeleted', []):
+                    message_id = item['message']['id']
+                    added.pop(message_id, None)
+                    deleted[message_id] = None
+            latest_history_id = page.get('historyId', latest_history_id)
+            page_token = page.get('nextPageToken')
+            if not page_token:
+                break
+        
+        return list(added), list(deleted), latest_history_id
+    
+    async def get_email_details(self, message_id: str, format: str = 'full') -> Dict:
+        try:
+            message = await self.transport.get_message(message_id, format)
+            return self._parse_message(message, format)
         except Exception as e:
             print(f"Error getting email details: {e}")
             return None
     
+    async def get_full_email(self, message_id: str) -> Optional[Dict]:
+        """Full body for a single message, served from the message cache after the first fetch."""
+        emails = await self.fetch_messages([message_id], format='full')
+        return emails[0] if emails else None
+    
+    async def get_email_details_batch(self, message_ids: List[str], batch_size: Optional[int] = None,
+                                      format: str = 'full') -> List[Dict]:
+        """Fetch many messages through Gmail's batch endpoint.
+        Returns parsed emails in the order of message_ids; messages that fail are skipped.
+        """
+        batch_size = max(1, min(batch_size or settings.gmail_batch_size, GMAIL_MAX_BATCH_SIZE))
+        self.fetch_errors = {}
+        emails = []
+        
+        for start in range(0, len(message_ids), batch_size):
+            chunk = message_ids[start:start + batch_size]
+            messages = await self._batch_get_messages(chunk, format)
+            for message_id in chunk:
+                message = messages.get(message_id)
+                if not message:
+                    continue
+                try:
+                    emails.append(self._parse_message(message, format))
+                except Exception as e:
+                    print(f"Error parsing email {message_id}: {e}")
+        
+        return emails
+    
+    async def get_email_details_concurrent(self, message_ids: List[str], concurrency: Optional[int] = None,
+                                           format: str = 'full') -> List[Dict]:
+        """Fan out messages.get calls over a semaphore-bounded pool, paced by the user's token bucket.
+        Returns parsed emails in the order of message_ids; failures are recorded in fetch_errors.
+        """
+        semaphore = asyncio.Semaphore(concurrency or settings.gmail_fetch_concurrency)
+        self.fetch_errors = {}
+        
+        async def worker(message_id: str):
+            async with semaphore:
+                return await self._get_message_with_backoff(message_id, format)
+        
+        messages = await asyncio.gather(*(worker(message_id) for message_id in message_ids))
+        emails = []
+        for message_id, message in zip(message_ids, messages):
+            if not message:
+                continue
+            try:
+                emails.append(self._parse_message(message, format))
+            except Exception as e:
+                self.fetch_errors[message_id] = f"parse error: {e}"
+        return emails
+    
+    async def stream_messages(self, message_ids: List[str], format: str = 'full',
+                              concurrency: Optional[int] = None, buffer: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Yield parsed messages as they arrive (cached ones first), not in the order of message_ids.
+        A fixed pool of workers pulls ids and hands parsed messages over a bounded queue, so a consumer
+        that stops reading pauses the fetches rather than letting results pile up. Closing or cancelling
+        the generator (e.g. the client disconnected) cancels the fetches still outstanding.
+        """
+        use_cache = settings.message_cache_enabled and self.user_id is not None
+        cached = await message_cache.get_many(self.user_id, message_ids, format) if use_cache else {}
+        self.fetch_errors = {}
+        for message_id in message_ids:
+            if message_id in cached:
+                yield cached[message_id]
+        misses = [message_id for message_id in message_ids if message_id not in cached]
+        if not misses:
+            return
+        
+        pending = iter(misses)  # shared by the workers, each pulls its next id from it
+        queue: asyncio.Queue = asyncio.Queue(maxsize=buffer or settings.gmail_stream_buffer)
+        finished = object()
+        fetched: List[Dict] = []
+        
+        async def worker():
+            try:
+                for message_id in pending:
+                    message = await self._get_message_with_backoff(message_id, format)
+                    if not message:
+                        continue
+                    try:
+                        email = self._parse_message(message, format)
+                    except Exception as e:
+                        self.fetch_errors[message_id] = f"parse error: {e}"
+                        continue
+                    await queue.put(email)
+            except Exception as e:
+                print(f"Error streaming emails: {e}")
+            await queue.put(finished)
+        
+        workers = [asyncio.create_task(worker())
+                   for _ in range(min(concurrency or settings.gmail_fetch_concurrency, len(misses)))]
+        try:
+            remaining = len(workers)
+            while remaining:
+                email = await queue.get()
+                if email is finished:
+                    remaining -= 1
+                    continue
+                fetched.append(email)
+                yield email
+        finally:
+            for task in workers:
+                task.cancel()
+        if use_cache:
+            await message_cache.put_many(self.user_id, fetched)
+    
+    async def _get_message_with_backoff(self, message_id: str, format: str = 'full') -> Optional[Dict]:
+        for attempt in range(settings.gmail_max_retries + 1):
+            await self.bucket.acquire(MESSAGES_GET_QUOTA_UNITS)
+            gmail_metrics.started()
+            try:
+                return await self.transport.get_message(message_id, format)
+            except Exception as e:
+                if is_rate_limited(e) and attempt < settings.gmail_max_retries:
+                    gmail_metrics.throttled += 1
+                    self.bucket.throttle(attempt)
+                    continue
+                gmail_metrics.failures += 1
+                self.fetch_errors[message_id] = str(e)
+                print(f"Error getting email details for {message_id}: {e}")
+                return None
+            finally:
+                gmail_metrics.finished()
+        return None
+    
+    async def _batch_get_messages(self, message_ids: List[str], format: str = 'full') -> Dict[str, Dict]:
+        """Run one batch of messages.get calls, re-batching retryable per-message failures."""
+        messages: Dict[str, Dict] = {}
+        errors: Dict[str, Exception] = {}
+        pending = list(message_ids)
+        
+        for attempt in range(settings.gmail_batch_retries + 1):
+            if not pending:
+                break
+            await self.bucket.acquire(MESSAGES_GET_QUOTA_UNITS * len(pending))
+            for _ in pending:
+                gmail_metrics.started()
+            try:
+                fetched, failed = await self.transport.batch_get(pending, format)
+            finally:
+                for _ in pending:
+                    gmail_metrics.finished()
+            messages.update(fetched)
+            errors.update(failed)
+            for message_id in fetched:
+                errors.pop(message_id, None)
+            
+            pending = [message_id for message_id, exc in failed.items() if self._is_retryable(exc)]
+            if attempt == settings.gmail_batch_retries:
+                break  # nothing left to retry, so don't wait before reporting the failures
+            if any(is_rate_limited(exc) for exc in failed.values()):
+                gmail_metrics.throttled += 1
+                self.bucket.throttle(attempt)
+            elif pending:
+                await asyncio.sleep(2 ** attempt)
+        
+        gmail_metrics.failures += len(errors)
+        self.fetch_errors.update({message_id: str(exc) for message_id, exc in errors.items()})
+        if pending:
+            print(f"Giving up on {len(pending)} messages after {settings.gmail_batch_retries} retries")
+        return messages
+    
+    @staticmethod
+    def _is_retryable(exc: Exception) -> bool:
+        return is_rate_limited(exc) or getattr(getattr(exc, 'resp', None), 'status', None) in RETRYABLE_STATUSES
+    
+    @staticmethod
+    def _parse_message(message: Dict, format: str = 'full') -> Dict:
+        message_id = message['id']
+        headers = message['payload']['headers']
+        header_dict = {h['name']: h['value'] for h in headers}
+        
+        from_email = header_dict.get('From', '')
+        to_email = header_dict.get('To', '')
+        subject = header_dict.get('Subject', '').strip()
+        date = header_dict.get('Date', '')
+        
+        if format == 'metadata':
+            # No MIME tree in metadata responses; the snippet stands in until the full body is requested
+            body = unescape(message.get('snippet', ''))
+        else:
+            # Prefer plain text, fallback to HTML converted to text; limited to the first 5000 chars
+            body = extract_body(message['payload'], max_chars=5000)
+        
+        return {
+            'gmail_id': message_id,
+            'from': from_email.strip(),
+            'to': [to_email.strip()] if to_email else [],
+            'subject': subject,
+            'body': body,
+            'received_at': date,
+            'format': format
+        }
+    
     async def search_emails(self, query: str) -> List[Dict]:
         return await self.fetch_emails(query, 50)
@@ -0,0 +1,221 @@
+import asyncio
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Tuple
+import httpx
+from src.config import settings
+from src.services.gmail_client import GOOGLE_TOKEN_URI
+
+GMAIL_API_BASE = "https://gmail.googleapis.com/gmail/v1/users/me"
+# Headers requested for format='metadata' (list views)
+METADATA_HEADERS = ['From', 'To', 'Subject', 'Date']
+
+
+class GmailHttpError(Exception):
+    """Gmail error response, shaped like googleapiclient's HttpError (resp.status, content)."""
+
+    def __init__(self, status: int, content: bytes = b''):
+        super().__init__(f"Gmail API error {status}: {content[:200]!r}")
+        self.resp = SimpleNamespace(status=status)
+        self.content = content
+
+
+class GoogleApiTransport:
+    """Gmail calls through the blocking google-api-python-client, each run in asyncio.to_thread."""
+
+    def __init__(self, service):
+        self.service = service
+
+    async def list_messages(self, query: str = '', page_token: Optional[str] = None, max_results: int = 500) -> Dict:
+        return await asyncio.to_thread(
+            lambda: self.service.users().messages().list(
+                userId='me',
+                q=query,
+                maxResults=max_results,
+                pageToken=page_token
+            ).execute()
+        )
+
+    async def get_message(self, message_id: str, format: str = 'full') -> Dict:
+        return await asyncio.to_thread(
+            lambda: self._message_request(message_id, format).execute()
+        )
+
+    async def batch_get(self, message_ids: List[str], format: str = 'full') -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+        return await asyncio.to_thread(self._execute_batch_get, message_ids, format)
+
+    async def get_profile(self) -> Dict:
+        return await asyncio.to_thread(
+            lambda: self.service.users().getProfile(userId='me').execute()
+        )
+
+    async def list_history(self, start_history_id: str, page_token: Optional[str] = None) -> Dict:
+        return await asyncio.to_thread(
+            lambda: self.service.users().history().list(
+                userId='me',
+                startHistoryId=start_history_id,
+                historyTypes=['messageAdded', 'messageDeleted'],
+                pageToken=page_token
+            ).execute()
+        )
+
+    def _message_request(self, message_id: str, format: str = 'full'):
+        params = {'userId': 'me', 'id': message_id, 'format': format}
+        if format == 'metadata':
+            params['metadataHeaders'] = METADATA_HEADERS
+        return self.service.users().messages().get(**params)
+
+    def _execute_batch_get(self, message_ids: List[str], format: str = 'full'):
+        """Blocking: send a single batch HTTP request. Returns (messages by id, exceptions by id)."""
+        fetched: Dict[str, Dict] = {}
+        failed: Dict[str, Exception] = {}
+
+        def on_response(request_id, response, exception):
+            if exception is not None:
+                failed[request_id] = exception
+                print(f"Error getting email details for {request_id}: {exception}")
+                return
+            fetched[request_id] = response
+
+        batch = self.service.new_batch_http_request(callback=on_response)
+        for message_id in message_ids:
+            batch.add(
+                self._message_request(message_id, format),
+                request_id=message_id
+            )
+        batch.execute()
+        return fetched, failed
+
+
+class _UserToken:
+    def __init__(self, access_token: str, refresh_token: Optional[str]):
+        self.initial_access_token = access_token
+        self.access_token = access_token
+        self.refresh_token = refresh_token
+        self.lock = asyncio.Lock()
+
+    def matches(self, access_token: str, refresh_token: Optional[str]) -> bool:
+        if refresh_token and refresh_token != self.refresh_token:
+            return False
+        return access_token in (self.initial_access_token, self.access_token)
+
+    async def refresh(self, client: httpx.AsyncClient, stale_token: str):
+        async with self.lock:
+            if self.access_token != stale_token:
+                # Another request already refreshed while we waited
+                return
+            response = await client.post(GOOGLE_TOKEN_URI, data={
+                "grant_type": "refresh_token",
+                "refresh_token": self.refresh_token,
+                "client_id": settings.google_client_id,
+                "client_secret": settings.google_client_secret,
+            })
+            if response.status_code != 200:
+                raise GmailHttpError(401, response.content)
+            self.access_token = response.json()["access_token"]
+
+
+_http_client: Optional[httpx.AsyncClient] = None
+_user_tokens: "OrderedDict[str, _UserToken]" = OrderedDict()
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """One pooled keep-alive client for the whole process (HTTP/2 when h2 is installed)."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=_http2_available(),
+            timeout=settings.gmail_http_timeout,
+            limits=httpx.Limits(
+                max_connections=settings.gmail_max_connections,
+                max_keepalive_connections=settings.gmail_max_connections,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def _get_user_token(user_key: str, access_token: str, refresh_token: Optional[str]) -> _UserToken:
+    token = _user_tokens.get(user_key)
+    if token is None or not token.matches(access_token, refresh_token):
+        token = _UserToken(access_token, refresh_token)
+        _user_tokens[user_key] = token
+    _user_tokens.move_to_end(user_key)
+    while len(_user_tokens) > settings.gmail_client_pool_size:
+        _user_tokens.popitem(last=False)
+    return token
+
+
+class HttpxGmailTransport:
+    """Native async Gmail REST client on a shared httpx connection pool.
+    Same interface as GoogleApiTransport, but never leaves the event loop.
+    """
+
+    def __init__(self, user_key: str, access_token: str, refresh_token: Optional[str]):
+        self.token = _get_user_token(user_key, access_token, refresh_token)
+
+    async def _request(self, path: str, params: Optional[Dict] = None) -> Dict:
+        client = get_http_client()
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        for attempt in range(2):
+            access_token = self.token.access_token
+            response = await client.get(
+                f"{GMAIL_API_BASE}/{path}",
+                params=params,
+                headers={"Authorization": f"Bearer {access_token}"}
+            )
+            if response.status_code == 401 and attempt == 0 and self.token.refresh_token:
+                await self.token.refresh(client, access_token)
+                continue
+            if response.status_code >= 400:
+                raise GmailHttpError(response.status_code, response.content)
+            return response.json()
+
+    async def list_messages(self, query: str = '', page_token: Optional[str] = None, max_results: int = 500) -> Dict:
+        return await self._request("messages", {"q": query, "maxResults": max_results, "pageToken": page_token})
+
+    async def get_message(self, message_id: str, format: str = 'full') -> Dict:
+        params = {"format": format}
+        if format == 'metadata':
+            params["metadataHeaders"] = METADATA_HEADERS
+        return await self._request(f"messages/{message_id}", params)
+
+    async def batch_get(self, message_ids: List[str], format: str = 'full') -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+        # Multiplexed concurrent gets on the pooled connection replace the multipart batch endpoint
+        results = await asyncio.gather(
+            *(self.get_message(message_id, format) for message_id in message_ids),
+            return_exceptions=True
+        )
+        fetched: Dict[str, Dict] = {}
+        failed: Dict[str, Exception] = {}
+        for message_id, result in zip(message_ids, results):
+            if isinstance(result, Exception):
+                failed[message_id] = result
+                print(f"Error getting email details for {message_id}: {result}")
+            else:
+                fetched[message_id] = result
+        return fetched, failed
+
+    async def get_profile(self) -> Dict:
+        return await self._request("profile")
+
+    async def list_history(self, start_history_id: str, page_token: Optional[str] = None) -> Dict:
+        return await self._request("history", {
+            "startHistoryId": start_history_id,
+            "historyTypes": ["messageAdded", "messageDeleted"],
+            "pageToken": page_token,
+        })
@@ -0,0 +1,180 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+import httpx
+from src.config import settings
+
+
+def parse_json_response(text: str) -> Dict:
+    """JSON from a model reply, tolerating a surrounding ```json fence."""
+    text = text.strip()
+    if text.startswith("```json"):
+        text = text[7:]
+    if text.startswith("```"):
+        text = text[3:]
+    if text.endswith("```"):
+        text = text[:-3]
+    return json.loads(text.strip())
+
+
+def _pooled_http_client(timeout: float) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        timeout=timeout,
+        limits=httpx.Limits(
+            max_connections=settings.llm_max_connections,
+            max_keepalive_connections=settings.llm_max_connections,
+        ),
+    )
+
+
+class LLMClient:
+    """One provider's SDK client, created once per process and reused by every request."""
+
+    provider = ""
+
+    async def complete(self, prompt: str, system: Optional[str] = None, model: Optional[str] = None,
+                       max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> str:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class OpenAIClient(LLMClient):
+    provider = "openai"
+
+    def __init__(self, api_key: str):
+        from openai import AsyncOpenAI
+        self.http_client = _pooled_http_client(settings.openai_timeout)
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            timeout=settings.openai_timeout,
+            max_retries=settings.llm_max_retries,
+            http_client=self.http_client
+        )
+
+    async def complete(self, prompt: str, system: Optional[str] = None, model: Optional[str] = None,
+                       max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> str:
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        params = {"temperature": temperature, "max_tokens": max_tokens}
+        response = await self.client.chat.completions.create(
+            model=model or settings.llm_model,
+            messages=messages,
+            **{key: value for key, value in params.items() if value is not None}
+        )
+        return response.choices[0].message.content
+
+    async def close(self):
+        await self.http_client.aclose()
+
+
+class AnthropicClient(LLMClient):
+    provider = "anthropic"
+
+    def __init__(self, api_key: str):
+        import anthropic
+        self.http_client = _pooled_http_client(settings.anthropic_timeout)
+        self.client = anthropic.AsyncAnthropic(
+            api_key=api_key,
+            timeout=settings.anthropic_timeout,
+            max_retries=settings.llm_max_retries,
+            http_client=self.http_client
+        )
+
+    async def complete(self, prompt: str, system: Optional[str] = None, model: Optional[str] = None,
+                       max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> str:
+        params = {"system": system} if system else {}
+        if temperature is not None:
+            params["temperature"] = temperature
+        response = await self.client.messages.create(
+            model=model or settings.llm_model,
+            # The Messages API requires an explicit output budget
+            max_tokens=max_tokens or 1024,
+            messages=[{"role": "user", "content": prompt}],
+            **params
+        )
+        return response.content[0].text
+
+    async def close(self):
+        await self.http_client.aclose()
+
+
+class GeminiClient(LLMClient):
+    """google-generativeai's async API is bound to a grpc.aio channel on whichever loop first uses it,
+    so the blocking call runs on a dedicated, bounded executor instead of the default one."""
+
+    provider = "gemini"
+
+    def __init__(self, api_key: str):
+        import google.generativeai as genai
+        genai.configure(api_key=api_key)
+        self._genai = genai
+        self._models: Dict[str, object] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.gemini_executor_workers,
+            thread_name_prefix="gemini"
+        )
+
+    def _model(self, name: str):
+        model = self._models.get(name)
+        if model is None:
+            model = self._genai.GenerativeModel(name)
+            self._models[name] = model
+        return model
+
+    async def complete(self, prompt: str, system: Optional[str] = None, model: Optional[str] = None,
+                       max_tokens: Optional[int] = None, temperature: Optional[float] = None) -> str:
+        generative_model = self._model(model or settings.llm_model)
+        full_prompt = f"{system}\n\nUser prompt: {prompt}" if system else prompt
+        generation_config = {"max_output_tokens": max_tokens, "temperature": temperature}
+        generation_config = {key: value for key, value in generation_config.items() if value is not None}
+        loop = asyncio.get_running_loop()
+        response = await asyncio.wait_for(
+            loop.run_in_executor(
+                self.executor,
+                lambda: generative_model.generate_content(full_prompt, generation_config=generation_config)
+            ),
+            timeout=settings.gemini_timeout
+        )
+        return response.text
+
+    async def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+_PROVIDERS = {
+    "openai": (OpenAIClient, "openai_api_key"),
+    "anthropic": (AnthropicClient, "anthropic_api_key"),
+    "gemini": (GeminiClient, "gemini_api_key"),
+}
+_clients: Dict[str, LLMClient] = {}
+
+
+def get_llm_client(provider: str) -> Optional[LLMClient]:
+    """Shared client for a provider, or None when it is unknown or has no API key configured."""
+    client = _clients.get(provider)
+    if client is None and provider in _PROVIDERS:
+        client_class, key_setting = _PROVIDERS[provider]
+        api_key = getattr(settings, key_setting)
+        if not api_key:
+            return None
+        client = client_class(api_key)
+        _clients[provider] = client
+    return client
+
+
+def init_llm_clients():
+    """Create the clients for every configured provider up front so the first request doesn't pay for it."""
+    for provider in _PROVIDERS:
+        try:
+            get_llm_client(provider)
+        except Exception as e:
+            print(f"Error creating {provider} client: {e}")
+
+
+async def close_llm_clients():
+    for client in list(_clients.values()):
+        await client.close()
+    _clients.clear()
@@ -1,6 +1,14 @@
+import asyncio
 from src.config import settings
-from typing import Dict, List, Optional
-import json
+from src.services.llm_client import get_llm_client, parse_json_response
+from src.services.query_cache import query_cache
+from src.services.extraction_dedup import REUSABLE_FIELDS, extraction_dedup
+from src.services.email_classifier import classify
+from typing import Dict, List, Optional, Tuple
+
+JOB_TYPES = {"full-time", "part-time", "contract", "internship", "other"}
+APPLICATION_STATUSES = {"applied", "interview", "offer", "rejected", "other"}
+EXPERIENCE_LEVELS = {"junior", "mid", "senior", "executive", "other"}
 
 class LLMService:
     """Service to interact with LLM providers (OpenAI or Anthropic)"""
@@ -10,21 +18,28 @@ class LLMService:
         """Convert natural language prompt to Gmail search query and extract intent"""
         
         if settings.llm_provider == "openai":
-            return await LLMService._process_with_openai(prompt)
+            process = LLMService._process_with_openai
         elif settings.llm_provider == "anthropic":
-            return await LLMService._process_with_anthropic(prompt)
+            process = LLMService._process_with_anthropic
         elif settings.llm_provider == "gemini":
-            return await LLMService._process_with_gemini(prompt)
+            process = LLMService._process_with_gemini
         else:
             return await LLMService._process_locally(prompt)
+        
+        cached = await query_cache.get(prompt)
+        if cached is not None:
+            return cached
+        
+        result = await process(prompt)
+        # Provider errors fall back to keyword matching (source "local"); only cache real LLM translations
+        if result.get("source") != "local":
+            await query_cache.put(prompt, result)
+        return result
     
     @staticmethod
     async def _process_with_openai(prompt: str) -> Dict:
         """Process prompt with OpenAI GPT"""
         try:
-            from openai import OpenAI
-            client = OpenAI(api_key=settings.openai_api_key)
-            
             system_message = """You are an email analysis assistant. Given a natural language prompt, extract:
 1. query_intent: The user's intention (e.g., "find_job_offers", "find_rejections", "find_interviews")
 2. gmail_query: The Gmail search query to use (e.g., "subject:(job offer) OR subject:(offer)")
@@ -38,18 +53,15 @@ Respond in JSON format:
     "summary": "Brief explanation of the query"
 }"""
             
-            response = client.chat.completions.create(
-                model=settings.llm_model,
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ],
+            text = await get_llm_client("openai").complete(
+                prompt,
+                system=system_message,
                 temperature=0.7,
                 max_tokens=500
             )
             
-            result = json.loads(response.choices[0].message.content)
-            return result
+            result = parse_json_response(text)
+            return {**result, "source": "openai"}
         except Exception as e:
             print(f"OpenAI Error: {e}")
             return await LLMService._process_locally(prompt)
@@ -58,10 +70,6 @@ Respond in JSON format:
     async def _process_with_anthropic(prompt: str) -> Dict:
         """Process prompt with Anthropic Claude"""
         try:
-            import anthropic
-            
-            client = anthropic.Anthropic(api_key=settings.anthropic_api_key)
-            
             system_message = """You are an email analysis assistant. Given a natural language prompt, extract:
 1. query_intent: The user's intention
 2. gmail_query: The Gmail search query to use
@@ -69,17 +77,14 @@ Respond in JSON format:
 
 Respond in JSON format."""
             
-            response = client.messages.create(
-                model=settings.llm_model,
-                max_tokens=500,
+            text = await get_llm_client("anthropic").complete(
+                prompt,
                 system=system_message,
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
+                max_tokens=500
             )
             
-            result = json.loads(response.content[0].text)
-            return result
+            result = parse_json_response(text)
+            return {**result, "source": "anthropic"}
         except Exception as e:
             print(f"Anthropic Error: {e}")
             return await LLMService._process_locally(prompt)
@@ -88,11 +93,6 @@ Respond in JSON format."""
     async def _process_with_gemini(prompt: str) -> Dict:
         """Process prompt with Google Gemini"""
         try:
-            import google.generativeai as genai
-            
-            genai.configure(api_key=settings.gemini_api_key)
-            model = genai.GenerativeModel(settings.llm_model)
-            
             system_message = """You are an email analysis assistant. Given a natural language prompt, extract:
 1. query_intent: The user's intention (e.g., "find_job_offers", "find_rejections", "find_interviews")
 2. gmail_query: The Gmail search query to use (e.g., "subject:(job offer) OR subject:(offer)")
@@ -106,21 +106,11 @@ Respond ONLY with valid JSON format:
     "summary": "Brief explanation of the query"
 }"""
             
-            full_prompt = f"{system_message}\n\nUser prompt: {prompt}"
-            response = model.generate_content(full_prompt)
-            
-            # Extract JSON from response
-            text = response.text.strip()
-            # Remove markdown code blocks if present
-            if text.startswith("```json"):
-                text = text[7:]
-            if text.startswith("```"):
-                text = text[3:]
-            if text.endswith("```"):
-                text = text[:-3]
+            text = await get_llm_client("gemini").complete(prompt, system=system_message)
             
-            result = json.loads(text.strip())
-            return result
+            # Tolerates markdown code blocks around the JSON
+            result = parse_json_response(text)
+            return {**result, "source": "gemini"}
         except Exception as e:
             print(f"Gemini Error: {e}")
             return await LLMService._process_locally(prompt)
@@ -152,116 +142,223 @@ Respond ONLY with valid JSON format:
             "query_intent": query_intent,
             "gmail_query": gmail_query,
             "categories": categories,
-            "summary": f"Searching for: {prompt}"
+            "summary": f"Searching for: {prompt}",
+            "source": "local",
         }
     
     @staticmethod
     async def extract_email_metadata(subject: str, body: str, from_email: str) -> Dict:
         """Use LLM to extract rich metadata from email"""
+        results = await LLMService.extract_email_metadata_batch([
+            {"id": "0", "subject": subject, "body": body, "from": from_email}
+        ])
+        return results["0"]
+    
+    @staticmethod
+    async def extract_email_metadata_batch(emails: List[Dict]) -> Dict[str, Dict]:
+        """Extract metadata for many emails with few LLM calls.
+        Each email is a dict with id, subject, body and from; returns metadata keyed by id.
+        Emails are packed into prompts sized to the token budget, the returned JSON array is
+        validated item by item, and only items that failed are retried in smaller batches.
+        Anything no provider could extract falls back to keyword matching.
+        Emails the rule-based classifier is confident about, and near-duplicates (by SimHash) of
+        already extracted emails, never reach the LLM.
+        Each result names its "source": the provider, "classifier", "dedup", "local" (no provider is
+        configured) or "fallback" (providers are configured but none answered for this email).
+        """
+        pending = {str(email["id"]): email for email in emails}
+        emails_by_id = dict(pending)
+        results: Dict[str, Dict] = {}
+        providers = LLMService._extraction_providers()
         
-        if not settings.openai_api_key and not settings.anthropic_api_key and not settings.gemini_api_key:
-            return LLMService._extract_metadata_locally(subject, body)
+        if providers:
+            for email_id, email in list(pending.items()):
+                labels = classify(email.get("subject", ""), email.get("body") or "")
+                if labels["application_status"][1] >= settings.classifier_confidence_threshold:
+                    results[email_id] = {**LLMService._metadata_from_labels(labels), "source": "classifier"}
+                    del pending[email_id]
         
-        # Try Gemini first if configured
-        if settings.gemini_api_key:
-            try:
-                import google.generativeai as genai
-                
-                genai.configure(api_key=settings.gemini_api_key)
-                model = genai.GenerativeModel("gemini-1.5-flash")
-                
-                extraction_prompt = f"""Extract email metadata from this email:
-Subject: {subject}
-Body: {body[:1000]}
-
-Extract:
-1. job_type: full-time/part-time/contract/internship/other
-2. application_status: applied/interview/offer/rejected/other
-3. salary: salary range if mentioned, or null
-4. experience_level: junior/mid/senior/executive/other
-5. job_title: the job title
-6. key_skills: required skills mentioned
-
-Respond ONLY with valid JSON format."""
+        fingerprints: Dict[str, int] = {}
+        followers: Dict[str, str] = {}
+        if providers and settings.extraction_dedup_enabled:
+            fingerprints = {
+                email_id: extraction_dedup.fingerprint(email.get("subject", ""), email.get("body") or "")
+                for email_id, email in pending.items()
+            }
+            for email_id, reused in (await extraction_dedup.lookup(fingerprints)).items():
+                results[email_id] = {**LLMService._reuse_extraction(pending[email_id], reused), "source": "dedup"}
+            remaining = {email_id: fingerprints[email_id] for email_id in pending if email_id not in results}
+            representatives, followers = extraction_dedup.cluster(remaining)
+            pending = {email_id: pending[email_id] for email_id in representatives}
+        
+        extracted_by_llm: List[str] = []
+        for provider, model in providers:
+            batch_size = settings.llm_extraction_batch_size
+            for attempt in range(settings.llm_extraction_retries + 1):
+                if not pending:
+                    break
+                batches = LLMService._pack_extraction_batches(list(pending.values()), batch_size)
+                semaphore = asyncio.Semaphore(settings.llm_extraction_concurrency)
                 
-                response = model.generate_content(extraction_prompt)
-                text = response.text.strip()
-                if text.startswith("```json"):
-                    text = text[7:]
-                if text.startswith("```"):
-                    text = text[3:]
-                if text.endswith("```"):
-                    text = text[:-3]
+                async def run(batch: List[Dict]) -> Dict[str, Dict]:
+                    async with semaphore:
+                        return await LLMService._extract_batch(provider, model, batch)
                 
-                result = json.loads(text.strip())
-                return result
-            except Exception as e:
-                print(f"Gemini metadata extraction error: {e}")
+                for extracted in await asyncio.gather(*(run(batch) for batch in batches)):
+                    for email_id, metadata in extracted.items():
+                        results[email_id] = {**metadata, "source": provider}
+                        extracted_by_llm.append(email_id)
+                        pending.pop(email_id, None)
+                if pending:
+                    print(f"DEBUG: {provider} metadata extraction attempt {attempt + 1} left {len(pending)} emails unparsed")
+                    # Failures are often truncated or malformed long responses; retry in smaller batches
+                    batch_size = max(1, batch_size // 2)
+        
+        for email_id, email in pending.items():
+            results[email_id] = {
+                **LLMService._extract_metadata_locally(email.get("subject", ""), email.get("body") or ""),
+                "source": "fallback" if providers else "local",
+            }
         
-        # Fallback to OpenAI if available
+        if fingerprints:
+            await extraction_dedup.store({fingerprints[email_id]: results[email_id] for email_id in extracted_by_llm})
+        for follower, representative in followers.items():
+            source = "fallback" if results[representative]["source"] == "fallback" else "dedup"
+            results[follower] = {**LLMService._reuse_extraction(emails_by_id[follower], results[representative]),
+                                 "source": source}
+        return results
+    
+    @staticmethod
+    def _reuse_extraction(email: Dict, metadata: Dict) -> Dict:
+        """A near-duplicate's categorical fields; salary, title and skills come from this email itself."""
+        own = LLMService._extract_metadata_locally(email.get("subject", ""), email.get("body") or "")
+        return {**own, **{field: metadata[field] for field in REUSABLE_FIELDS if metadata.get(field)}}
+    
+    @staticmethod
+    def _extraction_providers() -> List[Tuple[str, str]]:
+        providers = []
+        if settings.gemini_api_key:
+            providers.append(("gemini", "gemini-1.5-flash"))
         if settings.openai_api_key:
-            try:
-                from openai import OpenAI
-                client = OpenAI(api_key=settings.openai_api_key)
-                
-                extraction_prompt = f"""Extract email metadata from this email:
-Subject: {subject}
-Body: {body[:1000]}
+            providers.append(("openai", "gpt-3.5-turbo"))
+        return providers
+    
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        # ~4 characters per token for English text
+        return len(text) // 4 + 1
+    
+    @staticmethod
+    def _pack_extraction_batches(emails: List[Dict], batch_size: int) -> List[List[Dict]]:
+        """Greedily pack emails into batches of at most batch_size items and the input token budget."""
+        batches: List[List[Dict]] = []
+        current: List[Dict] = []
+        current_tokens = 0
+        for email in emails:
+            tokens = LLMService._estimate_tokens(LLMService._format_extraction_item(email))
+            if current and (len(current) >= batch_size or current_tokens + tokens > settings.llm_extraction_token_budget):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(email)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    @staticmethod
+    def _format_extraction_item(email: Dict) -> str:
+        body = (email.get("body") or "")[:settings.llm_extraction_body_chars]
+        return f"""<email id="{email['id']}">
+From: {email.get('from', '')}
+Subject: {email.get('subject', '')}
+Body: {body}
+</email>"""
+    
+    @staticmethod
+    async def _extract_batch(provider: str, model: str, batch: List[Dict]) -> Dict[str, Dict]:
+        """One LLM call for a batch; returns only the items that came back valid."""
+        items = "\n".join(LLMService._format_extraction_item(email) for email in batch)
+        extraction_prompt = f"""Extract job-search metadata from each of the {len(batch)} emails below.
 
-Extract:
+For every email extract:
 1. job_type: full-time/part-time/contract/internship/other
 2. application_status: applied/interview/offer/rejected/other
 3. salary: salary range if mentioned, or null
 4. experience_level: junior/mid/senior/executive/other
-5. job_title: the job title
-6. key_skills: required skills mentioned
+5. job_title: the job title, or null
+6. key_skills: list of required skills mentioned
 
-Respond in JSON format."""
-                
-                response = client.chat.completions.create(
-                    model="gpt-3.5-turbo",
-                    messages=[{"role": "user", "content": extraction_prompt}],
-                    temperature=0.3,
-                    max_tokens=300
-                )
-                
-                result = json.loads(response.choices[0].message.content)
-                return result
-            except Exception as e:
-                print(f"OpenAI metadata extraction error: {e}")
+Respond ONLY with a valid JSON array containing one object per email, each with the email's "id" and the fields above.
+
+{items}"""
+        try:
+            text = await get_llm_client(provider).complete(
+                extraction_prompt,
+                model=model,
+                temperature=0.3,
+                max_tokens=settings.llm_extraction_output_tokens_per_email * len(batch) + 100
+            )
+            response = parse_json_response(text)
+        except Exception as e:
+            print(f"{provider} metadata extraction error: {e}")
+            return {}
         
-        return LLMService._extract_metadata_locally(subject, body)
+        if isinstance(response, dict):
+            response = response.get("emails", [response])
+        if not isinstance(response, list):
+            return {}
+        
+        wanted = {str(email["id"]) for email in batch}
+        extracted: Dict[str, Dict] = {}
+        for item in response:
+            metadata = LLMService._validate_metadata(item)
+            if metadata is not None and str(item["id"]) in wanted:
+                extracted[str(item["id"])] = metadata
+        return extracted
     
     @staticmethod
-    def _extract_metadata_locally(subject: str, body: str) -> Dict:
-        """Fallback metadata extraction using keywords"""
-        text = f"{subject} {body}".lower()
+    def _validate_metadata(item) -> Optional[Dict]:
+        """Normalized metadata for one returned item, or None if it is unusable."""
+        if not isinstance(item, dict) or "id" not in item:
+            return None
+        if "job_type" not in item and "application_status" not in item:
+            return None
         
-        job_type = "other"
-        if "full-time" in text or "full time" in text:
-            job_type = "full-time"
-        elif "part-time" in text or "part time" in text:
-            job_type = "part-time"
-        elif "contract" in text:
-            job_type = "contract"
-        elif "internship" in text:
-            job_type = "internship"
+        def choice(value, allowed) -> str:
+            value = str(value or "").strip().lower()
+            return value if value in allowed else "other"
         
-        status = "other"
-        if "reject" in text or "rejected" in text:
-            status = "rejected"
-        elif "interview" in text:
-            status = "interview"
-        elif "offer" in text and "job offer" in text:
-            status = "offer"
-        elif "applied" in text or "application" in text:
-            status = "applied"
+        def text(value) -> Optional[str]:
+            if value is None or isinstance(value, (dict, list)):
+                return None
+            value = str(value).strip()
+            return value if value and value.lower() not in ("null", "none", "n/a") else None
         
+        skills = item.get("key_skills") or []
+        if isinstance(skills, str):
+            skills = [skill.strip() for skill in skills.split(",")]
+        return {
+            "job_type": choice(item.get("job_type"), JOB_TYPES),
+            "application_status": choice(item.get("application_status"), APPLICATION_STATUSES),
+            "salary": text(item.get("salary")),
+            "experience_level": choice(item.get("experience_level"), EXPERIENCE_LEVELS),
+            "job_title": text(item.get("job_title")),
+            "key_skills": [str(skill) for skill in skills if skill] if isinstance(skills, list) else [],
+        }
+    
+    @staticmethod
+    def _extract_metadata_locally(subject: str, body: str) -> Dict:
+        """Fallback metadata extraction using the rule-based classifier"""
+        labels = classify(subject, body)
+        return LLMService._metadata_from_labels(labels)
+    
+    @staticmethod
+    def _metadata_from_labels(labels: Dict) -> Dict:
         return {
-            "job_type": job_type,
-            "application_status": status,
-            "salary": None,
-            "experience_level": "other",
+            "job_type": labels["job_type"][0] or "other",
+            "application_status": labels["application_status"][0] or "other",
+            "salary": labels["salary"][0],
+            "experience_level": labels["experience_level"][0] or "other",
             "job_title": None,
             "key_skills": []
         }
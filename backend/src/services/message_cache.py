@@ -0,0 +1,92 @@
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List
+from pymongo import UpdateOne
+from src.config import settings
+from src.database import db
+
+# A cached 'full' message can also answer a 'metadata' request, never the other way round
+SATISFIES = {"full": ["full"], "metadata": ["full", "metadata"]}
+
+
+class MessageCache:
+    """Parsed Gmail messages keyed by (user_id, gmail_id).
+    Gmail message content is immutable, so entries never go stale; the Mongo message_cache
+    collection persists them across processes and an in-process LRU serves repeat hits.
+    """
+
+    def __init__(self, max_memory_entries: int):
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[tuple, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, user_id: str, email: Dict):
+        key = (user_id, email["gmail_id"])
+        current = self._memory.get(key)
+        if current is not None and current.get("format") == "full" and email.get("format") != "full":
+            return
+        self._memory[key] = email
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get_many(self, user_id: str, gmail_ids: List[str], format: str = "full") -> Dict[str, Dict]:
+        acceptable = SATISFIES.get(format, ["full"])
+        found: Dict[str, Dict] = {}
+        missing: List[str] = []
+        for gmail_id in gmail_ids:
+            email = self._memory.get((user_id, gmail_id))
+            if email is not None and email.get("format", "full") in acceptable:
+                self._memory.move_to_end((user_id, gmail_id))
+                found[gmail_id] = email
+            else:
+                missing.append(gmail_id)
+
+        if missing:
+            try:
+                cursor = db.get_db().message_cache.find(
+                    {"user_id": user_id, "gmail_id": {"$in": missing}, "format": {"$in": acceptable}},
+                    {"_id": 0, "email": 1}
+                )
+                for doc in await cursor.to_list(None):
+                    email = doc["email"]
+                    found[email["gmail_id"]] = email
+                    self._remember(user_id, email)
+            except Exception as e:
+                print(f"Message cache lookup failed: {e}")
+
+        self.hits += len(found)
+        self.misses += len(gmail_ids) - len(found)
+        return found
+
+    async def put_many(self, user_id: str, emails: List[Dict]):
+        if not emails:
+            return
+        now = datetime.utcnow()
+        operations = []
+        for email in emails:
+            self._remember(user_id, email)
+            doc = {"user_id": user_id, "gmail_id": email["gmail_id"], "format": email.get("format", "full"),
+                   "email": email, "cached_at": now}
+            if doc["format"] == "full":
+                operations.append(UpdateOne({"user_id": user_id, "gmail_id": email["gmail_id"]}, {"$set": doc}, upsert=True))
+            else:
+                # Never replace a cached full message with a metadata-only one
+                operations.append(UpdateOne({"user_id": user_id, "gmail_id": email["gmail_id"]}, {"$setOnInsert": doc}, upsert=True))
+        try:
+            await db.get_db().message_cache.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Message cache write failed: {e}")
+
+    def snapshot(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+message_cache = MessageCache(settings.message_cache_memory_size)
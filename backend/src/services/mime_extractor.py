@@ -0,0 +1,149 @@
+import base64
+import binascii
+import codecs
+import re
+from html import unescape
+from typing import Dict, Iterator, List, Optional
+
+DEFAULT_MAX_CHARS = 5000
+
+# Everything that renders as nothing: skipped blocks (script/style/head/title), comments and tags.
+# Removed in a single regex pass; text runs are left in place.
+_MARKUP = re.compile(
+    r'<(?:(script|style|head|title)\b[^>]*>.*?</\1\s*'
+    r'|!--.*?--'
+    r'|[^>]*)>',
+    re.DOTALL | re.IGNORECASE,
+)
+# Openers of the blocks _MARKUP drops whole; a window cut must not land inside one
+_SKIPPED_START = re.compile(r'<(?:(script|style|head|title)\b|!--)', re.IGNORECASE)
+_CHARSET = re.compile(r'charset\s*=\s*"?([\w.:-]+)', re.IGNORECASE)
+
+
+def _headers(part: Dict) -> Dict[str, str]:
+    return {h['name'].lower(): h['value'] for h in part.get('headers', []) or []}
+
+
+def _is_attachment(part: Dict, headers: Dict[str, str]) -> bool:
+    if part.get('filename'):
+        return True
+    return headers.get('content-disposition', '').lower().startswith('attachment')
+
+
+def _charset(headers: Dict[str, str]) -> str:
+    match = _CHARSET.search(headers.get('content-type', ''))
+    if match:
+        try:
+            return codecs.lookup(match.group(1)).name
+        except LookupError:
+            pass
+    return 'utf-8'
+
+
+def iter_text_parts(payload: Dict) -> Iterator[Dict]:
+    """Depth-first, document-order walk over a Gmail payload yielding inline text/* leaves with data.
+    Iterative, so deeply nested multipart/mixed > multipart/related > multipart/alternative trees
+    don't recurse.
+    """
+    stack: List[Dict] = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get('parts')
+        if children:
+            stack.extend(reversed(children))
+            continue
+        mime_type = (part.get('mimeType') or '').lower()
+        if not mime_type.startswith('text/') or 'data' not in (part.get('body') or {}):
+            continue
+        headers = _headers(part)
+        if _is_attachment(part, headers):
+            continue
+        yield {'mimeType': mime_type, 'data': part['body']['data'], 'charset': _charset(headers)}
+
+
+def decode_part(data: str, charset: str = 'utf-8', max_bytes: Optional[int] = None) -> str:
+    """Decode base64url part data with its declared charset, decoding at most ~max_bytes of it."""
+    if max_bytes is not None:
+        # 4 base64 characters carry 3 bytes; cut on a quantum boundary so the prefix stays valid
+        data = data[:((max_bytes + 2) // 3) * 4]
+    data = data.rstrip('=')
+    data += '=' * (-len(data) % 4)
+    try:
+        raw = base64.urlsafe_b64decode(data)
+    except (binascii.Error, ValueError):
+        return ''
+    return raw.decode(charset, errors='replace')
+
+
+def _render(html_text: str) -> str:
+    # Tags become a space so <br>/<p>/<td> boundaries still separate words
+    return ' '.join(unescape(_MARKUP.sub(' ', html_text)).split())
+
+
+def _cut(html_text: str, window: int) -> str:
+    """Leading markup of about window characters, cut after a tag and never inside a skipped block:
+    a block open at the cut is extended to its closing tag, or dropped when it never closes (html_text
+    may itself be a prefix of the part), so its contents can't come out as text."""
+    end = len(html_text)
+    if window < end:
+        # Don't leave half a tag at the cut
+        end = html_text.rfind('>', 0, window) + 1 or window
+    position = 0
+    while True:
+        start = _SKIPPED_START.search(html_text, position, end)
+        if not start:
+            return html_text[:end]
+        closing = rf'</{start.group(1)}\s*>' if start.group(1) else '-->'
+        close = re.compile(closing, re.IGNORECASE).search(html_text, start.end())
+        if not close:
+            return html_text[:start.start()]
+        position = close.end()
+        end = max(end, position)
+
+
+def html_to_text(html_text: str, max_chars: Optional[int] = None) -> str:
+    """HTML to text: drops script/style/head, comments and tags, unescapes entities and collapses
+    whitespace. With max_chars, only as much leading markup as needed is processed.
+    """
+    if not html_text:
+        return ''
+    if max_chars is None:
+        return _render(html_text)
+
+    window = max_chars * 8
+    while True:
+        text = _render(_cut(html_text, window))
+        if len(text) >= max_chars or window >= len(html_text):
+            return text[:max_chars]
+        window *= 4
+
+
+def extract_body(payload: Dict, max_chars: int = DEFAULT_MAX_CHARS) -> str:
+    """Best text body of a Gmail 'full' payload: the first inline text/plain leaf, else the first
+    text/html leaf converted to text. Never decodes much more than max_chars worth of content.
+    """
+    html_part = None
+    for part in iter_text_parts(payload):
+        if part['mimeType'] == 'text/plain':
+            # Up to 4 bytes per character in multi-byte charsets
+            text = decode_part(part['data'], part['charset'], max_bytes=max_chars * 4)
+            text = text.strip()[:max_chars]
+            if text:
+                return text
+        elif part['mimeType'] == 'text/html' and html_part is None:
+            html_part = part
+
+    if html_part is None:
+        return ''
+    return _html_part_to_text(html_part, max_chars)
+
+
+def _html_part_to_text(part: Dict, max_chars: int) -> str:
+    """Decode HTML in growing windows; markup-heavy mail needs more raw bytes per character of text."""
+    window = max_chars * 8
+    while True:
+        html = decode_part(part['data'], part['charset'], max_bytes=window)
+        text = html_to_text(html, max_chars)
+        if len(text) >= max_chars or window * 4 // 3 >= len(part['data']):
+            return text
+        window *= 4
@@ -0,0 +1,197 @@
+import hashlib
+import math
+import re
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+from src.config import settings
+from src.database import db
+
+# Words that don't change what a search prompt asks for
+FILLER_WORDS = {
+    "a", "all", "an", "any", "can", "email", "emails", "find", "for", "get", "give", "i", "list",
+    "mail", "mails", "me", "my", "of", "please", "see", "show", "the", "to", "want", "you",
+}
+# Words that change the meaning of the word after them: negations, senders/recipients and date bounds
+OPERATOR_WORDS = {
+    "after", "before", "but", "except", "excluding", "from", "in", "newer", "no", "non", "not", "older",
+    "since", "than", "to", "until", "without",
+}
+_PUNCTUATION = re.compile(r"[^\w\s]")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return " ".join(_PUNCTUATION.sub(" ", prompt.lower()).split())
+
+
+def prompt_vector(normalized: str) -> Dict[str, int]:
+    """Character-trigram counts over the prompt's content words; a cheap local stand-in for an embedding."""
+    text = " " + " ".join(word for word in normalized.split() if word not in FILLER_WORDS) + " "
+    return dict(Counter(text[i:i + 3] for i in range(len(text) - 2)))
+
+
+def _fold(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def prompt_signature(normalized: str) -> list:
+    """What two prompts must share for one to reuse the other's translation: the same content words
+    (plurals folded, so years, names and read/unread must match exactly) and the same operator words
+    bound to the same following word, so "offers not rejections" differs from "rejections not offers"."""
+    words = [word for word in normalized.split() if word in OPERATOR_WORDS or word not in FILLER_WORDS]
+    content = {_fold(word) for word in words if word not in OPERATOR_WORDS}
+    bound = {f"{word}>{_fold(following)}" for word, following in zip(words, words[1:] + [""]) if word in OPERATOR_WORDS}
+    return sorted(content | bound)
+
+
+def _norm(vector: Dict[str, int]) -> float:
+    return math.sqrt(sum(count * count for count in vector.values()))
+
+
+def cosine(a: Dict[str, int], a_norm: float, b: Dict[str, int], b_norm: float) -> float:
+    if not a_norm or not b_norm:
+        return 0.0
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(count * b.get(gram, 0) for gram, count in a.items()) / (a_norm * b_norm)
+
+
+class QueryCache:
+    """Two-level cache of natural-language prompt -> LLM query translation, stored in llm_query_cache.
+    Level 1 is an exact match on the hash of the normalized prompt. Level 2 (optional) is the most
+    similar cached prompt by trigram cosine above a threshold, among prompts with the same signature. Entries expire after a TTL and the
+    least recently used ones are evicted past the size cap.
+    """
+
+    def __init__(self):
+        # key -> (vector, norm, signature, created_at); mirrors the collection for similarity scans
+        self._index: "OrderedDict[str, Tuple[Dict[str, int], float, list, datetime]]" = OrderedDict()
+        self._index_loaded = False
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _scope() -> str:
+        return f"{settings.llm_provider}:{settings.llm_model}"
+
+    @staticmethod
+    def _key(scope: str, normalized: str) -> str:
+        return hashlib.sha256(f"{scope}\n{normalized}".encode()).hexdigest()
+
+    async def _load_index(self, scope: str):
+        collection = db.get_db().llm_query_cache
+        cursor = collection.find(
+            {"scope": scope, "created_at": {"$gte": datetime.utcnow() - timedelta(seconds=settings.query_cache_ttl_seconds)}},
+            {"_id": 0, "key": 1, "vector": 1, "normalized": 1, "created_at": 1}
+        ).sort("last_used_at", -1).limit(settings.query_cache_max_entries)
+        # Oldest first, so the in-process LRU order matches last use
+        for doc in reversed(await cursor.to_list(None)):
+            self._remember(doc["key"], doc["vector"], doc["normalized"], doc["created_at"])
+        self._index_loaded = True
+
+    def _remember(self, key: str, vector: Dict[str, int], normalized: str, created_at: datetime):
+        self._index[key] = (vector, _norm(vector), prompt_signature(normalized), created_at)
+        self._index.move_to_end(key)
+        while len(self._index) > settings.query_cache_max_entries:
+            self._index.popitem(last=False)
+
+    def _most_similar(self, vector: Dict[str, int], signature: list, expires_before: datetime) -> Optional[str]:
+        vector_norm = _norm(vector)
+        best_key, best_score = None, settings.query_cache_similarity_threshold
+        for key, (candidate, candidate_norm, candidate_signature, created_at) in self._index.items():
+            # Trigram overlap alone scores "read rejections" 0.88 against "unread rejections"
+            if created_at < expires_before or candidate_signature != signature:
+                continue
+            score = cosine(vector, vector_norm, candidate, candidate_norm)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    async def get(self, prompt: str) -> Optional[Dict]:
+        if not settings.query_cache_enabled:
+            return None
+        scope = self._scope()
+        normalized = normalize_prompt(prompt)
+        key = self._key(scope, normalized)
+        expires_before = datetime.utcnow() - timedelta(seconds=settings.query_cache_ttl_seconds)
+        collection = db.get_db().llm_query_cache
+
+        try:
+            doc = await collection.find_one_and_update(
+                {"key": key, "created_at": {"$gte": expires_before}},
+                {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+                projection={"_id": 0, "result": 1}
+            )
+            if doc:
+                self.exact_hits += 1
+                return doc["result"]
+
+            if settings.query_cache_similarity_enabled:
+                if not self._index_loaded:
+                    await self._load_index(scope)
+                similar_key = self._most_similar(prompt_vector(normalized), prompt_signature(normalized), expires_before)
+                if similar_key:
+                    doc = await collection.find_one_and_update(
+                        {"key": similar_key, "created_at": {"$gte": expires_before}},
+                        {"$set": {"last_used_at": datetime.utcnow()}, "$inc": {"hits": 1}},
+                        projection={"_id": 0, "result": 1}
+                    )
+                    if doc:
+                        self._index.move_to_end(similar_key)
+                        self.similar_hits += 1
+                        return doc["result"]
+                    self._index.pop(similar_key, None)
+        except Exception as e:
+            print(f"Query cache lookup failed: {e}")
+
+        self.misses += 1
+        return None
+
+    async def put(self, prompt: str, result: Dict):
+        if not settings.query_cache_enabled:
+            return
+        scope = self._scope()
+        normalized = normalize_prompt(prompt)
+        key = self._key(scope, normalized)
+        vector = prompt_vector(normalized)
+        now = datetime.utcnow()
+        collection = db.get_db().llm_query_cache
+        try:
+            await collection.update_one(
+                {"key": key},
+                {
+                    "$set": {"key": key, "scope": scope, "normalized": normalized, "vector": vector,
+                             "result": result, "created_at": now, "last_used_at": now},
+                    "$setOnInsert": {"hits": 0},
+                },
+                upsert=True
+            )
+            self._remember(key, vector, normalized, now)
+            await self._evict(collection)
+        except Exception as e:
+            print(f"Query cache write failed: {e}")
+
+    @staticmethod
+    async def _evict(collection):
+        """Drop the least recently used entries beyond the size cap."""
+        excess = await collection.estimated_document_count() - settings.query_cache_max_entries
+        if excess <= 0:
+            return
+        cursor = collection.find({}, {"_id": 1}).sort("last_used_at", 1).limit(excess)
+        stale_ids = [doc["_id"] for doc in await cursor.to_list(None)]
+        if stale_ids:
+            await collection.delete_many({"_id": {"$in": stale_ids}})
+
+    def snapshot(self) -> Dict:
+        lookups = self.exact_hits + self.similar_hits + self.misses
+        hits = self.exact_hits + self.similar_hits
+        return {
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+query_cache = QueryCache()
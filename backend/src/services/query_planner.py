@@ -0,0 +1,370 @@
+import re
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Dict, List, Optional, Tuple
+from src.config import settings
+from src.database import db
+from src.services.email_documents import parse_received_at
+
+# query_intent -> application_status of the enriched emails that answer it
+INTENT_STATUSES = {
+    "find_job_offers": "offer",
+    "find_rejections": "rejected",
+    "find_interviews": "interview",
+    "find_applications": "applied",
+}
+# LLM categories that map onto enriched email fields
+CATEGORY_FIELDS = ("company", "position", "job_type", "salary", "experience_level", "application_status", "language")
+TEXT_FIELDS = ("subject", "from", "body")
+# Characters of a stored body returned for format="metadata", matching the length of Gmail's snippet
+SNIPPET_CHARS = 200
+DURATION_UNITS = {"d": 1, "m": 30, "y": 365}
+
+_TOKEN = re.compile(r'"[^"]*"?|[(){}]|-(?=\S)|[^\s(){}"]+')
+_OPERATOR = re.compile(r"^([a-z_]+):(.*)$", re.IGNORECASE)
+
+
+class UnsupportedQueryError(Exception):
+    """The Gmail query uses an operator the emails collection can't evaluate (labels, attachments, ...)."""
+    pass
+
+
+def _text_condition(text: str, fields: Tuple[str, ...]) -> Dict:
+    """Case-insensitive whole-word (or phrase) match on any of fields."""
+    pattern = r"\s+".join(re.escape(part) for part in text.split())
+    if not pattern:
+        return {}
+    if re.match(r"\w", text.strip()[0]):
+        pattern = r"\b" + pattern
+    if re.match(r"\w", text.strip()[-1]):
+        pattern += r"\b"
+    conditions = [{field: {"$regex": pattern, "$options": "i"}} for field in fields]
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def _all(conditions: List[Dict]) -> Dict:
+    # Nested conjunctions are flattened so filters stay one $and deep
+    conditions = [
+        part for condition in conditions if condition
+        for part in (condition["$and"] if list(condition) == ["$and"] else [condition])
+    ]
+    if len(conditions) <= 1:
+        return conditions[0] if conditions else {}
+    return {"$and": conditions}
+
+
+def _any(conditions: List[Dict]) -> Dict:
+    if any(not condition for condition in conditions):
+        return {}  # one alternative matches everything
+    return conditions[0] if len(conditions) == 1 else {"$or": conditions}
+
+
+def _parse_date(value: str) -> datetime:
+    if value.isdigit():
+        return datetime.utcfromtimestamp(int(value))
+    for date_format in ("%Y/%m/%d", "%Y-%m-%d", "%m/%d/%Y"):
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    raise UnsupportedQueryError(f"Unrecognised date {value!r}")
+
+
+def _parse_duration(value: str) -> timedelta:
+    match = re.fullmatch(r"(\d+)([dmy])", value.lower())
+    if not match:
+        raise UnsupportedQueryError(f"Unrecognised duration {value!r}")
+    return timedelta(days=int(match.group(1)) * DURATION_UNITS[match.group(2)])
+
+
+class _GmailQueryParser:
+    """Recursive-descent translation of Gmail search syntax (implicit AND, OR, -negation, ( ) and { }
+    groups, "phrases", from:/to:/subject: field scopes and date operators) into a Mongo filter."""
+
+    FIELD_OPERATORS = {"from": ("from",), "to": ("to",), "subject": ("subject",)}
+
+    def __init__(self, query: str, now: datetime):
+        self.tokens = _TOKEN.findall(query)
+        self.position = 0
+        self.now = now
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def next(self) -> Optional[str]:
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def parse(self) -> List[Dict]:
+        conditions = self.conjunction(TEXT_FIELDS, closing=None)
+        if self.peek() is not None:
+            raise UnsupportedQueryError(f"Unbalanced {self.peek()!r}")
+        return conditions
+
+    def conjunction(self, fields: Tuple[str, ...], closing: Optional[str]) -> List[Dict]:
+        conditions = []
+        while self.peek() is not None and self.peek() not in (closing, ")", "}"):
+            conditions.append(self.disjunction(fields))
+        return conditions
+
+    def disjunction(self, fields: Tuple[str, ...]) -> Dict:
+        alternatives = [self.unary(fields)]
+        while self.peek() in ("OR", "|"):
+            self.next()
+            alternatives.append(self.unary(fields))
+        return _any(alternatives)
+
+    def unary(self, fields: Tuple[str, ...]) -> Dict:
+        if self.peek() == "-":
+            self.next()
+            negated = self.unary(fields)
+            return {"$nor": [negated]} if negated else {}
+        return self.atom(fields)
+
+    def expect(self, closing: str):
+        if self.next() != closing:
+            raise UnsupportedQueryError(f"Missing {closing!r}")
+
+    def atom(self, fields: Tuple[str, ...]) -> Dict:
+        token = self.next()
+        if token is None:
+            raise UnsupportedQueryError("Query ends unexpectedly")
+        if token == "(":
+            conditions = self.conjunction(fields, ")")
+            self.expect(")")
+            return _all(conditions)
+        if token == "{":
+            alternatives = []
+            while self.peek() not in ("}", None):
+                alternatives.append(self.unary(fields))
+            self.expect("}")
+            return _any(alternatives) if alternatives else {}
+        if token.startswith('"'):
+            return _text_condition(token.strip('"'), fields)
+        if token == "AND":
+            return {}
+        operator = _OPERATOR.match(token)
+        if operator:
+            return self.operator(operator.group(1).lower(), operator.group(2))
+        return _text_condition(token, fields)
+
+    def operator(self, name: str, value: str) -> Dict:
+        if name in self.FIELD_OPERATORS:
+            fields = self.FIELD_OPERATORS[name]
+            if value:
+                return _text_condition(value.strip('"'), fields)
+            return self.atom(fields)
+        if not value:
+            raise UnsupportedQueryError(f"{name}: needs a value")
+        if name == "after":
+            return {"received_at": {"$gte": _parse_date(value)}}
+        if name == "before":
+            return {"received_at": {"$lt": _parse_date(value)}}
+        if name == "newer_than":
+            return {"received_at": {"$gte": self.now - _parse_duration(value)}}
+        if name == "older_than":
+            return {"received_at": {"$lt": self.now - _parse_duration(value)}}
+        if name == "in" and value.lower() == "anywhere":
+            return {}
+        # is:read/unread/starred included: the stored read/starred flags are the app's own, not Gmail's labels
+        raise UnsupportedQueryError(f"Unsupported operator {name}:{value}")
+
+
+def translate_gmail_query(query: str, now: Optional[datetime] = None) -> Dict:
+    """Mongo filter (user_id aside) equivalent to a Gmail search query, plus the received_at range
+    its top-level date operators select ("after"/"before", None when open).
+    Raises UnsupportedQueryError for syntax the emails collection can't answer."""
+    conditions = _GmailQueryParser(query or "", now or datetime.utcnow()).parse()
+    after = before = None
+    for condition in conditions:
+        bounds = condition.get("received_at") if list(condition) == ["received_at"] else None
+        if bounds:
+            if "$gte" in bounds:
+                after = max(after, bounds["$gte"]) if after else bounds["$gte"]
+            if "$lt" in bounds:
+                before = min(before, bounds["$lt"]) if before else bounds["$lt"]
+    return {"filter": _all(conditions), "after": after, "before": before}
+
+
+def _gmail_range_query(query: str, after: Optional[datetime], before: Optional[datetime]) -> str:
+    """query restricted to [after, before); Gmail takes epoch seconds in after:/before:."""
+    parts = [f"({query})" if query else ""]
+    if after:
+        parts.append(f"after:{int(after.replace(tzinfo=timezone.utc).timestamp())}")
+    if before:
+        parts.append(f"before:{int(before.replace(tzinfo=timezone.utc).timestamp())}")
+    return " ".join(part for part in parts if part)
+
+
+class QueryPlanner:
+    """Answers natural-language queries from the emails collection where sync has covered the mailbox.
+    The LLM's gmail_query is translated into a Mongo filter (query_intent additionally narrows enriched
+    emails to the matching application_status), the time range it asks for is compared with the range
+    sync has stored completely, and Gmail is only queried for the uncovered remainder.
+    """
+
+    @staticmethod
+    def coverage(user: Dict) -> Optional[Dict]:
+        """Range of the mailbox the emails collection holds completely: since (None = all history) up to
+        until, as recorded by query-less syncs and backfills. None when nothing is known to be covered, or
+        while messages inside the range are still waiting to be re-fetched after a failed sync."""
+        if user.get("sync_retry_ids"):
+            return None
+        until = user.get("coverage_until")
+        since = None if user.get("coverage_complete") else user.get("coverage_since")
+        if until is None or (since is None and not user.get("coverage_complete")):
+            return None
+        return {"since": since, "until": until}
+
+    @staticmethod
+    async def plan(user: Dict, gmail_query: str, query_intent: Optional[str] = None,
+                   now: Optional[datetime] = None) -> Dict:
+        """Which part of the query the emails collection answers ("local", a Mongo filter or None) and the
+        Gmail queries covering the rest ("gmail_queries", each with its received_at range)."""
+        now = now or datetime.utcnow()
+        everything = {"local": None, "gmail_queries": [{"query": gmail_query, "after": None, "before": None}],
+                      "covered_since": None, "covered_until": None, "reason": None}
+        if not settings.natural_query_local_enabled:
+            return {**everything, "reason": "local answers disabled"}
+        try:
+            translated = translate_gmail_query(gmail_query, now)
+        except UnsupportedQueryError as e:
+            return {**everything, "reason": str(e)}
+        coverage = QueryPlanner.coverage(user)
+        if coverage is None:
+            return {**everything, "reason": "mailbox not synced"}
+
+        since, until = coverage["since"], coverage["until"]
+        # Recent enough syncs count as covering everything up to now
+        fresh = (now - until).total_seconds() <= settings.natural_query_freshness_seconds
+        after, before = translated["after"], translated["before"]
+        gmail_queries = []
+        if since is not None and (after is None or after < since):
+            upper = min(since, before) if before else since
+            gmail_queries.append({"query": _gmail_range_query(gmail_query, after, upper), "after": after, "before": upper})
+        if not fresh and (before is None or before > until):
+            lower = max(until, after) if after else until
+            gmail_queries.append({"query": _gmail_range_query(gmail_query, lower, before), "after": lower, "before": before})
+
+        local_after = max(filter(None, (after, since)), default=None)
+        local_before = min(filter(None, (before, None if fresh else until)), default=None)
+        local = None
+        if local_after is None or local_before is None or local_after < local_before:
+            local = translated["filter"]
+            status = INTENT_STATUSES.get(query_intent or "")
+            if status:
+                # Enrichment classified these already; unenriched emails still go by the query alone
+                local = _all([local, {"$or": [{"application_status": status}, {"enriched_at": None}]}])
+        return {
+            "local": local,
+            "gmail_queries": gmail_queries,
+            "covered_since": since,
+            "covered_until": None if fresh else until,
+            "reason": None,
+        }
+
+    @staticmethod
+    def _local_email(email: Dict, format: str) -> Dict:
+        """A stored email in the shape GmailService returns, plus its enriched fields."""
+        received_at = email.get("received_at")
+        result = {
+            "gmail_id": email.get("gmail_id"),
+            "email_id": str(email["_id"]),
+            "from": email.get("from", ""),
+            "to": email.get("to", []),
+            "subject": email.get("subject", ""),
+            "body": (email.get("body") or "")[:SNIPPET_CHARS] if format == "metadata" else email.get("body") or "",
+            "received_at": format_datetime(received_at.replace(tzinfo=timezone.utc)) if received_at else "",
+            "format": format,
+            "source": "local",
+        }
+        result.update({field: email.get(field) for field in CATEGORY_FIELDS})
+        return result
+
+    @staticmethod
+    def categorize(emails: List[Dict], categories: Optional[List[str]]) -> Dict[str, Dict[str, int]]:
+        """Counts per value of each requested category the results carry (enriched fields only)."""
+        breakdown = {}
+        for category in categories or []:
+            field = (category or "").lower()
+            if field not in CATEGORY_FIELDS:
+                continue
+            counts: Dict[str, int] = {}
+            for email in emails:
+                value = email.get(field)
+                if value is not None:
+                    counts[str(value)] = counts.get(str(value), 0) + 1
+            breakdown[field] = dict(sorted(counts.items(), key=lambda item: -item[1]))
+        return breakdown
+
+    @staticmethod
+    async def local_emails(user: Dict, plan: Dict, limit: int, format: str) -> List[Dict]:
+        """The plan's local matches, newest first."""
+        if plan["local"] is None:
+            return []
+        projection = None if format == "full" else {
+            "body": {"$substrCP": [{"$ifNull": ["$body", ""]}, 0, SNIPPET_CHARS]},
+            **{field: 1 for field in ("gmail_id", "from", "to", "subject", "received_at", *CATEGORY_FIELDS)},
+        }
+        stored = await db.get_db().emails.find(
+            _all([{"user_id": str(user["_id"])}, plan["local"]]), projection
+        ).sort([("received_at", -1), ("_id", -1)]).limit(limit).to_list(limit)
+        return [QueryPlanner._local_email(email, format) for email in stored]
+
+    @staticmethod
+    def needed_gmail_queries(plan: Dict, local: List[Dict], limit: int) -> List[Dict]:
+        """The plan's Gmail queries, minus uncovered older ranges a full page of newer local results makes irrelevant."""
+        oldest_local = parse_received_at(local[-1]["received_at"]) if len(local) >= limit else None
+        return [
+            query for query in plan["gmail_queries"]
+            if not (oldest_local and query["before"] and query["before"] <= oldest_local)
+        ]
+
+    @staticmethod
+    def describe(plan: Dict, needed: List[Dict]) -> Dict:
+        """Response summary of a plan."""
+        return {
+            "local": plan["local"] is not None,
+            "gmail_queries": [query["query"] for query in needed],
+            "covered_since": plan["covered_since"],
+            "covered_until": plan["covered_until"],
+            "reason": plan["reason"],
+        }
+
+    @staticmethod
+    async def answer(user: Dict, gmail_query: str, query_intent: Optional[str], categories: Optional[List[str]],
+                     limit: int, format: str, gmail=None) -> Dict:
+        """Results of the plan: local matches merged with Gmail fetches of the uncovered ranges, newest
+        first, deduplicated by gmail_id. gmail is a GmailService, or None when the user has no token."""
+        plan = await QueryPlanner.plan(user, gmail_query, query_intent)
+        emails = await QueryPlanner.local_emails(user, plan, limit, format)
+        needed = QueryPlanner.needed_gmail_queries(plan, emails, limit)
+        failed = 0
+        error = None
+        if needed and gmail is None:
+            error = "No Gmail access token found. User needs to authenticate with Gmail."
+        elif needed:
+            try:
+                seen = {email["gmail_id"] for email in emails}
+                for query in needed:
+                    # One range at a time: fetch_errors describes the last fetch only
+                    batch = await gmail.fetch_emails(query=query["query"], max_results=limit, format=format)
+                    failed += len(gmail.fetch_errors)
+                    for email in batch:
+                        if email["gmail_id"] not in seen:
+                            seen.add(email["gmail_id"])
+                            emails.append({**email, "source": "gmail"})
+            except Exception as e:
+                error = str(e)
+                print(f"ERROR fetching emails: {error}")
+
+        emails.sort(key=lambda email: parse_received_at(email.get("received_at")) or datetime.min, reverse=True)
+        emails = emails[:limit]
+        return {
+            "emails": emails,
+            "failed": failed,
+            "error": error,
+            "categories": QueryPlanner.categorize(emails, categories),
+            "plan": QueryPlanner.describe(plan, needed),
+        }
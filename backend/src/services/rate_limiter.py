@@ -0,0 +1,100 @@
+import asyncio
+import random
+import time
+from typing import Dict, Optional
+
+
+class TokenBucket:
+    """Async token bucket with AIMD rate adaptation.
+    Tokens are quota units; throttle() halves the refill rate and pauses the bucket,
+    every successful acquire nudges the rate back up towards max_rate.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: Optional[float] = None):
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min_rate or max(rate / 16, 1.0)
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, tokens: float = 1.0):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    # Additive increase: recover 5% of the ceiling per granted request
+                    self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def throttle(self, attempt: int = 0):
+        """Multiplicative decrease plus an exponential, jittered pause shared by all callers."""
+        self.rate = max(self.min_rate, self.rate / 2)
+        self.tokens = 0.0
+        delay = min(2 ** attempt, 32) + random.uniform(0, 1)
+        self.paused_until = max(self.paused_until, time.monotonic() + delay)
+
+    def snapshot(self) -> Dict:
+        return {
+            "rate": round(self.rate, 2),
+            "max_rate": self.max_rate,
+            "tokens": round(self.tokens, 2),
+            "paused": time.monotonic() < self.paused_until,
+        }
+
+
+class RequestMetrics:
+    """Process-wide counters for outbound API calls."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failures = 0
+
+    def started(self):
+        self.requests += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def finished(self):
+        self.in_flight -= 1
+
+    def snapshot(self) -> Dict:
+        return {
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "throttle_rate": round(self.throttled / self.requests, 4) if self.requests else 0.0,
+        }
+
+
+_user_buckets: Dict[str, TokenBucket] = {}
+
+
+def get_user_bucket(user_key: str, rate: float) -> TokenBucket:
+    bucket = _user_buckets.get(user_key)
+    if bucket is None:
+        bucket = TokenBucket(rate)
+        _user_buckets[user_key] = bucket
+    return bucket
+
+
+gmail_metrics = RequestMetrics()
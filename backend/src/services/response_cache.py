@@ -0,0 +1,162 @@
+import hashlib
+import json
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional
+from urllib.parse import urlencode
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from src.config import settings
+from src.database import db
+
+
+class MemoryCacheBackend:
+    """Per-process backend: version counters live here and entries only in the in-process LRU."""
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+
+    async def get_version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    async def bump_version(self, user_id: str):
+        self._versions[user_id] = self._versions.get(user_id, 0) + 1
+
+    async def get(self, key: str) -> Optional[Dict]:
+        return None
+
+    async def set(self, key: str, entry: Dict):
+        pass
+
+
+class MongoCacheBackend:
+    """Backend shared by every worker process: version counters in response_cache_versions,
+    entries in response_cache (expired ones are ignored on read)."""
+
+    async def get_version(self, user_id: str) -> int:
+        doc = await db.get_db().response_cache_versions.find_one({"_id": user_id})
+        return doc["version"] if doc else 0
+
+    async def bump_version(self, user_id: str):
+        await db.get_db().response_cache_versions.update_one({"_id": user_id}, {"$inc": {"version": 1}}, upsert=True)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        doc = await db.get_db().response_cache.find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        return doc["entry"] if doc else None
+
+    async def set(self, key: str, entry: Dict):
+        await db.get_db().response_cache.replace_one(
+            {"_id": key}, {"_id": key, "entry": entry, "expires_at": entry["expires_at"]}, upsert=True
+        )
+
+
+BACKENDS = {"memory": MemoryCacheBackend, "mongo": MongoCacheBackend}
+
+
+class ResponseCache:
+    """Per-user cache of serialized read-endpoint responses, keyed by endpoint and parameters.
+    Every entry records the user's version counter when it was computed; email and collection
+    writes bump the counter, so older entries are never served again. Entries also carry an ETag
+    (hash of the body) so a matching If-None-Match is answered with 304 and no body.
+    """
+
+    def __init__(self, backend, max_memory_entries: int):
+        self.backend = backend
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, Dict]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def key(user_id: str, endpoint: str, params: Dict) -> str:
+        return f"{user_id}:{endpoint}?{urlencode(sorted(params.items()))}"
+
+    def _remember(self, key: str, entry: Dict):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str, version: int) -> Optional[Dict]:
+        entry = self._memory.get(key)
+        if entry is None:
+            entry = await self.backend.get(key)
+            if entry is not None:
+                self._remember(key, entry)
+        else:
+            self._memory.move_to_end(key)
+        if entry is None or entry["version"] != version or entry["expires_at"] <= datetime.utcnow():
+            return None
+        return entry
+
+    async def put(self, key: str, version: int, body: str) -> Dict:
+        entry = {
+            "version": version,
+            "etag": f'"{hashlib.sha1(body.encode()).hexdigest()}"',
+            "body": body,
+            "expires_at": datetime.utcnow() + timedelta(seconds=settings.response_cache_ttl_seconds),
+        }
+        self._remember(key, entry)
+        await self.backend.set(key, entry)
+        return entry
+
+    async def invalidate(self, user_id):
+        """Called after any write that can change a user's cached responses."""
+        if not settings.response_cache_enabled:
+            return
+        try:
+            await self.backend.bump_version(str(user_id))
+        except Exception as e:
+            print(f"Error invalidating response cache for user {user_id}: {e}")
+
+    async def respond(self, request: Request, user_id: str, endpoint: str, params: Dict,
+                      compute: Callable[[], Awaitable]) -> Response:
+        """Serve endpoint(params) for a user from the cache, computing and storing it on a miss."""
+        if not settings.response_cache_enabled:
+            return Response(json.dumps(jsonable_encoder(await compute())), media_type="application/json")
+
+        user_id = str(user_id)
+        key = ResponseCache.key(user_id, endpoint, params)
+        entry = None
+        try:
+            # Read the version before computing so a write that lands meanwhile invalidates the result
+            version = await self.backend.get_version(user_id)
+            entry = await self.get(key, version)
+        except Exception as e:
+            print(f"Response cache lookup failed: {e}")
+            version = None
+
+        if entry is None:
+            self.misses += 1
+            body = json.dumps(jsonable_encoder(await compute()))
+            if version is None:
+                return Response(body, media_type="application/json")
+            try:
+                entry = await self.put(key, version, body)
+            except Exception as e:
+                print(f"Response cache write failed: {e}")
+                return Response(body, media_type="application/json")
+        else:
+            self.hits += 1
+
+        headers = {"ETag": entry["etag"], "Cache-Control": "private, no-cache"}
+        if entry["etag"] in request.headers.get("if-none-match", ""):
+            self.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(entry["body"], media_type="application/json", headers=headers)
+
+    def snapshot(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+
+response_cache = ResponseCache(
+    BACKENDS.get(settings.response_cache_backend, MemoryCacheBackend)(), settings.response_cache_memory_size
+)
@@ -0,0 +1,326 @@
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from pymongo import DeleteMany, ReplaceOne, UpdateOne
+from src.config import settings
+from src.database import db
+from src.services.analytics_service import AnalyticsService
+from src.services.email_documents import parse_received_at
+
+# Matches in the subject or sender say more about an email than matches in the body
+FIELD_WEIGHTS = {"subject": 3, "from": 2, "body": 1}
+FACET_FIELDS = ("application_status", "job_type", "experience_level", "company", "language", "source")
+STOPWORDS = frozenset("""
+a an and are as at be been but by for from has have he her his i if in into is it its me my no not of on or our
+she so than that the their them then there these they this to us was we were what when which who will with you your
+""".split())
+
+RESULT_FIELDS = ("source", "gmail_id", "email_id", "collection_id", "subject", "from", "received_at", "length", "facets")
+
+# Projection of the emails-collection fields an index entry is built from
+EMAIL_SEARCH_FIELDS = {"gmail_id": 1, "subject": 1, "from": 1, "body": 1, "received_at": 1,
+                       **{field: 1 for field in FACET_FIELDS if field != "source"}}
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN.findall((text or "").lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def term_weights(subject: str, sender: str, body: str) -> Dict[str, int]:
+    """Field-weighted term frequencies of one email."""
+    weights: Counter = Counter()
+    for field, text in (("subject", subject), ("from", sender), ("body", (body or "")[:settings.search_body_chars])):
+        for token in tokenize(text):
+            weights[token] += FIELD_WEIGHTS[field]
+    return dict(weights)
+
+
+def bm25(tf: float, df: int, documents: int, length: float, average_length: float) -> float:
+    k1, b = settings.search_bm25_k1, settings.search_bm25_b
+    idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * length / (average_length or 1)))
+
+
+def search_document(user_id: str, email: Dict, source: str, collection_id: Optional[str] = None) -> Optional[Dict]:
+    """Index entry for an emails-collection document (source "email") or a collection-embedded email."""
+    gmail_id = email.get("gmail_id")
+    if not gmail_id:
+        return None
+    tf = term_weights(email.get("subject", ""), email.get("from", ""), email.get("body", ""))
+    received_at = parse_received_at(email.get("received_date") or email.get("received_at"))
+    return {
+        "_id": f"{user_id}:{source}:{collection_id + ':' if collection_id else ''}{gmail_id}",
+        "user_id": user_id,
+        "source": source,
+        "gmail_id": gmail_id,
+        "email_id": str(email["_id"]) if source == "email" and email.get("_id") else None,
+        "collection_id": collection_id,
+        "subject": email.get("subject", ""),
+        "from": email.get("from", ""),
+        "received_at": received_at,
+        "terms": sorted(tf),
+        "tf": tf,
+        "length": sum(tf.values()),
+        "facets": {field: email.get(field) for field in FACET_FIELDS if field != "source"} | {"source": source},
+    }
+
+
+class SearchIndex:
+    """Local full-text search over stored emails and collection emails, ranked with BM25.
+    search_documents holds one entry per email: its terms (multikey-indexed with user_id, which
+    makes it the inverted index), field-weighted term frequencies and facet values. search_terms
+    keeps each user's vocabulary with document frequencies, used to expand a trailing prefix, and
+    search_stats the document count and total length BM25 needs. Writers keep all three current;
+    rebuild() recomputes a user's index from scratch.
+    """
+
+    @staticmethod
+    async def index(user_id: str, documents: List[Dict]):
+        documents = [document for document in documents if document]
+        if not settings.search_enabled or not documents:
+            return
+        collection = db.get_db().search_documents
+        try:
+            previous = {
+                doc["_id"]: doc for doc in await collection.find(
+                    {"_id": {"$in": [document["_id"] for document in documents]}}, {"terms": 1, "length": 1}
+                ).to_list(None)
+            }
+            await collection.bulk_write(
+                [ReplaceOne({"_id": document["_id"]}, document, upsert=True) for document in documents], ordered=False
+            )
+            df: Counter = Counter()
+            added = length = 0
+            for document in documents:
+                before = previous.get(document["_id"])
+                old_terms = set(before["terms"]) if before else set()
+                new_terms = set(document["terms"])
+                df.update({term: 1 for term in new_terms - old_terms})
+                df.update({term: -1 for term in old_terms - new_terms})
+                added += 0 if before else 1
+                length += document["length"] - (before["length"] if before else 0)
+            await SearchIndex._apply_stats(user_id, df, added, length)
+        except Exception as e:
+            print(f"Error indexing {len(documents)} emails for search (user {user_id}): {e}")
+
+    @staticmethod
+    async def remove(user_id: str, query: Dict):
+        """Drop the index entries of a user matching query."""
+        if not settings.search_enabled:
+            return
+        collection = db.get_db().search_documents
+        try:
+            removed = await collection.find({"user_id": user_id, **query}, {"terms": 1, "length": 1}).to_list(None)
+            if not removed:
+                return
+            await collection.delete_many({"_id": {"$in": [doc["_id"] for doc in removed]}})
+            df: Counter = Counter()
+            for doc in removed:
+                df.update({term: -1 for term in doc["terms"]})
+            await SearchIndex._apply_stats(user_id, df, -len(removed), -sum(doc["length"] for doc in removed))
+        except Exception as e:
+            print(f"Error removing emails from search (user {user_id}): {e}")
+
+    @staticmethod
+    async def _apply_stats(user_id: str, df: Counter, documents: int, length: int):
+        operations = [
+            UpdateOne({"user_id": user_id, "term": term}, {"$inc": {"df": change}}, upsert=True)
+            for term, change in df.items() if change
+        ]
+        if any(change < 0 for change in df.values()):
+            operations.append(DeleteMany({"user_id": user_id, "df": {"$lte": 0}}))
+        if operations:
+            await db.get_db().search_terms.bulk_write(operations, ordered=True)
+        if documents or length:
+            await db.get_db().search_stats.update_one(
+                {"_id": user_id}, {"$inc": {"documents": documents, "length": length}}, upsert=True
+            )
+
+    @staticmethod
+    async def index_emails(user_id: str, emails: List[Dict]):
+        await SearchIndex.index(user_id, [search_document(user_id, email, "email") for email in emails])
+
+    @staticmethod
+    async def index_stored_emails(user_id: str, gmail_ids: List[str]):
+        """(Re-)index emails as currently stored, e.g. after a sync refreshed their Gmail fields."""
+        if not settings.search_enabled or not gmail_ids:
+            return
+        try:
+            emails = await db.get_db().emails.find(
+                {"user_id": user_id, "gmail_id": {"$in": gmail_ids}}, EMAIL_SEARCH_FIELDS
+            ).to_list(None)
+        except Exception as e:
+            print(f"Error loading emails to index (user {user_id}): {e}")
+            return
+        await SearchIndex.index_emails(user_id, emails)
+
+    @staticmethod
+    async def remove_emails(user_id: str, gmail_ids: List[str]):
+        if gmail_ids:
+            await SearchIndex.remove(user_id, {"source": "email", "gmail_id": {"$in": gmail_ids}})
+
+    @staticmethod
+    async def index_collection_emails(user_id, collection_id, emails: List[Dict]):
+        user_id, collection_id = str(user_id), str(collection_id)
+        await SearchIndex.index(user_id, [
+            search_document(user_id, email, "collection", collection_id) for email in emails
+        ])
+
+    @staticmethod
+    async def remove_collection_emails(user_id, collection_id, gmail_ids: Optional[List[str]] = None):
+        """Drop a collection's entries, or only those of gmail_ids."""
+        query = {"source": "collection", "collection_id": str(collection_id)}
+        if gmail_ids is not None:
+            query["gmail_id"] = {"$in": gmail_ids}
+        await SearchIndex.remove(str(user_id), query)
+
+    @staticmethod
+    async def update_facets(user_id: str, fields_by_gmail_id: Dict[str, Dict]):
+        """Refresh facet values of emails-collection entries after their metadata changed."""
+        if not settings.search_enabled or not fields_by_gmail_id:
+            return
+        operations = [
+            UpdateOne(
+                {"_id": f"{user_id}:email:{gmail_id}"},
+                {"$set": {f"facets.{field}": fields.get(field) for field in FACET_FIELDS if field in fields}}
+            )
+            for gmail_id, fields in fields_by_gmail_id.items()
+        ]
+        try:
+            await db.get_db().search_documents.bulk_write(operations, ordered=False)
+        except Exception as e:
+            print(f"Error updating search facets (user {user_id}): {e}")
+
+    @staticmethod
+    async def _expand(user_id: str, query: str) -> List[str]:
+        """Query terms, with a trailing word (no space after it) also matching every indexed term it prefixes."""
+        terms = tokenize(query)
+        words = _TOKEN.findall(query.lower())
+        if not words or query[-1:].isspace():
+            return terms
+        prefix = words[-1]
+        cursor = db.get_db().search_terms.find(
+            {"user_id": user_id, "term": {"$gte": prefix, "$lt": prefix + "\uffff"}},
+            {"term": 1}
+        ).sort("df", -1).limit(settings.search_prefix_expansions)
+        expanded = [doc["term"] for doc in await cursor.to_list(None)]
+        return list(dict.fromkeys(terms + expanded))
+
+    @staticmethod
+    async def _match_counts(match: Dict) -> Dict:
+        """Exact total and per-field facet counts over every entry matching, in one $facet pass."""
+        pipeline = [
+            {"$match": match},
+            {"$facet": {
+                "total": [{"$count": "count"}],
+                **{field: [{"$group": {"_id": f"$facets.{field}", "count": {"$sum": 1}}},
+                           {"$sort": {"count": -1, "_id": 1}}]
+                   for field in FACET_FIELDS},
+            }},
+        ]
+        rows = await db.get_db().search_documents.aggregate(pipeline).to_list(1)
+        row = rows[0] if rows else {}
+        return {
+            "total": row["total"][0]["count"] if row.get("total") else 0,
+            "facets": {
+                field: [{"value": group["_id"], "count": group["count"]}
+                        for group in row.get(field, []) if group["_id"] is not None]
+                for field in FACET_FIELDS
+            },
+        }
+
+    @staticmethod
+    async def _select_candidates(match: Dict, terms: List[str], df: Dict[str, int], projection: Dict) -> List[Dict]:
+        """At most search_max_candidates matching entries, picked deterministically: postings of the
+        rarest (highest-idf) terms first, each term's by descending term frequency."""
+        collection = db.get_db().search_documents
+        selected: Dict[str, Dict] = {}
+        for term in sorted(terms, key=lambda term: (df.get(term, 0), term)):
+            budget = settings.search_max_candidates - len(selected)
+            if budget <= 0:
+                break
+            postings = await collection.find(
+                {**match, "terms": term, "_id": {"$nin": list(selected)}}, projection
+            ).sort([(f"tf.{term}", -1), ("_id", 1)]).limit(budget).to_list(budget)
+            selected.update((doc["_id"], doc) for doc in postings)
+        return list(selected.values())
+
+    @staticmethod
+    async def search(user_id: str, query: str, filters: Optional[Dict] = None,
+                     limit: int = 20, offset: int = 0, collection_id: Optional[str] = None) -> Dict:
+        """BM25-ranked matches of query (any term; the last word as a prefix) with exact total and facet
+        counts over all matches. filters are equality filters on FACET_FIELDS; collection_id narrows to
+        one collection. When more than search_max_candidates entries match, only a selection of them is
+        ranked and total_is_estimate is set: total is then more than the results pagination can reach."""
+        terms = await SearchIndex._expand(user_id, query)
+        result = {"query": query, "terms": terms, "total": 0, "total_is_estimate": False, "results": [],
+                  "facets": {field: [] for field in FACET_FIELDS}}
+        if not terms:
+            return result
+
+        database = db.get_db()
+        stats = await database.search_stats.find_one({"_id": user_id}) or {}
+        documents = max(stats.get("documents", 0), 1)
+        average_length = stats.get("length", 0) / documents
+        df = {
+            doc["term"]: doc["df"]
+            for doc in await database.search_terms.find({"user_id": user_id, "term": {"$in": terms}}).to_list(None)
+        }
+
+        match = {"user_id": user_id, "terms": {"$in": terms}}
+        for field, value in (filters or {}).items():
+            match[f"facets.{field}"] = value
+        if collection_id:
+            match["collection_id"] = collection_id
+        counts = await SearchIndex._match_counts(match)
+        # Only the term frequencies of the query terms travel back, never whole tf maps
+        projection = {field: 1 for field in RESULT_FIELDS} | {f"tf.{term}": 1 for term in terms}
+        truncated = counts["total"] > settings.search_max_candidates
+        if truncated:
+            candidates = await SearchIndex._select_candidates(match, terms, df, projection)
+        else:
+            candidates = await database.search_documents.find(match, projection).to_list(None)
+
+        scored: List[Tuple[float, Dict]] = []
+        for doc in candidates:
+            tf = doc.pop("tf", {})
+            score = sum(bm25(weight, df.get(term, 1), documents, doc.get("length", 0), average_length)
+                        for term, weight in tf.items())
+            scored.append((score, doc))
+        scored.sort(key=lambda item: (item[0], item[1].get("received_at") or datetime.min, item[1]["_id"]), reverse=True)
+
+        result["total"] = counts["total"]
+        result["total_is_estimate"] = truncated
+        result["results"] = [{**doc, "score": round(score, 4)} for score, doc in scored[offset:offset + limit]]
+        result["facets"] = counts["facets"]
+        return result
+
+    @staticmethod
+    async def rebuild(user_id: str) -> int:
+        """Re-index every email and collection email of a user from scratch. Returns the entries indexed."""
+        database = db.get_db()
+        await database.search_documents.delete_many({"user_id": user_id})
+        await database.search_terms.delete_many({"user_id": user_id})
+        await database.search_stats.delete_one({"_id": user_id})
+
+        indexed = 0
+        batch: List[Dict] = []
+        async for email in database.emails.find({"user_id": user_id}, EMAIL_SEARCH_FIELDS):
+            batch.append(search_document(user_id, email, "email"))
+            if len(batch) >= 200:
+                await SearchIndex.index(user_id, batch)
+                indexed += len(batch)
+                batch = []
+        await SearchIndex.index(user_id, batch)
+        indexed += len(batch)
+
+        owner = AnalyticsService._collections_owner(user_id)
+        async for collection in database.collections.find({"user_id": owner}, {"emails": 1}):
+            emails = collection.get("emails", []) or []
+            await SearchIndex.index_collection_emails(user_id, collection["_id"], emails)
+            indexed += len(emails)
+        return indexed
@@ -0,0 +1,134 @@
+from typing import Dict, List
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from src.database import db
+from src.services.gmail_service import GmailService, HistoryExpiredError
+from src.services.email_documents import build_email_upsert, parse_received_at
+from src.services.enrichment_service import EnrichmentService
+from src.services.analytics_rollup import AnalyticsRollup, EMAIL_ROLLUP_FIELDS
+from src.services.search_index import SearchIndex
+
+
+class SyncService:
+    """Keeps the emails collection in step with a user's mailbox.
+    The first sync lists recent messages and records the mailbox historyId; later syncs replay
+    users.history.list from that id so only added/deleted messages are fetched. Messages that fail to
+    fetch are kept on the user as sync_retry_ids and fetched again by the next query-less sync, since
+    no later history replay will mention them.
+    The range the emails collection holds completely is recorded on the user as coverage_since
+    (None with coverage_complete = all history) up to coverage_until; only query-less syncs move it.
+    """
+
+    @staticmethod
+    async def sync_user(user: Dict, gmail: GmailService, query: str = "", limit: int = 50) -> Dict:
+        user_id = str(user["_id"])
+        started_at = datetime.utcnow()
+        history_id = user.get("gmail_history_id")
+        deleted_ids: List[str] = []
+        mode = "full"
+
+        if query:
+            # Ad-hoc search syncs can't be expressed as history deltas; leave the checkpoint alone
+            message_ids = await gmail.list_message_ids(query=query, max_results=limit)
+            latest_history_id = None
+            mode = "search"
+        else:
+            message_ids = None
+            latest_history_id = None
+            if history_id:
+                try:
+                    message_ids, deleted_ids, latest_history_id = await gmail.list_history(history_id)
+                    mode = "incremental"
+                except HistoryExpiredError:
+                    print(f"DEBUG: historyId {history_id} expired for user {user_id}, falling back to full sync")
+                    # Changes since the checkpoint are lost, so the stored range no longer reaches the present
+                    await db.get_db().users.update_one(
+                        {"_id": ObjectId(user_id)},
+                        {"$set": {"coverage_since": None, "coverage_until": None, "coverage_complete": False}}
+                    )
+            if message_ids is None:
+                # Snapshot the historyId before listing so nothing that arrives meanwhile is missed
+                profile = await gmail.get_profile()
+                latest_history_id = profile.get("historyId")
+                message_ids = await gmail.list_message_ids(max_results=limit)
+            listed = len(message_ids)
+            retry_ids = [message_id for message_id in user.get("sync_retry_ids") or [] if message_id not in deleted_ids]
+            message_ids = list(dict.fromkeys([*message_ids, *retry_ids]))
+
+        emails = await gmail.fetch_messages(message_ids)
+        upserted = await SyncService.upsert_emails(user_id, emails)
+        deleted = await SyncService.delete_emails(user_id, deleted_ids)
+
+        user_update = {"updated_at": datetime.utcnow()}
+        if mode != "search":
+            fetched_ids = {email["gmail_id"] for email in emails}
+            user_update["last_synced_at"] = datetime.utcnow()
+            user_update["sync_retry_ids"] = [message_id for message_id in message_ids if message_id not in fetched_ids]
+            user_update.update(SyncService._coverage_update(
+                user, mode, started_at, listed, emails, limit, failed=bool(user_update["sync_retry_ids"])
+            ))
+        if latest_history_id:
+            user_update["gmail_history_id"] = str(latest_history_id)
+        await db.get_db().users.update_one({"_id": ObjectId(user_id)}, {"$set": user_update})
+
+        return {
+            "mode": mode,
+            "synced": len(emails),
+            "inserted": upserted,
+            "deleted": deleted,
+            "failed": len(gmail.fetch_errors),
+            "retry_pending": len(user_update.get("sync_retry_ids", [])),
+            "history_id": user_update.get("gmail_history_id", history_id),
+        }
+
+    @staticmethod
+    def _coverage_update(user: Dict, mode: str, started_at: datetime, listed: int,
+                         emails: List[Dict], limit: int, failed: bool = False) -> Dict:
+        """Coverage fields after a query-less sync. History replay extends an existing range to the sync's
+        start; a full listing holds only the newest limit messages, so it restarts the range at the oldest
+        of them (all history when the listing came back short and every message was stored).
+        Messages that failed to fetch sit inside the range until a later sync stores them; QueryPlanner
+        doesn't trust the range while any are pending."""
+        if mode == "incremental":
+            return {"coverage_until": started_at} if user.get("coverage_until") else {}
+        complete = listed < limit and not failed
+        received = [parse_received_at(email.get("received_at")) for email in emails]
+        since = min(filter(None, received), default=None)
+        if since is None and not complete:
+            return {"coverage_since": None, "coverage_until": None, "coverage_complete": False}
+        return {"coverage_since": None if complete else since, "coverage_until": started_at, "coverage_complete": complete}
+
+    @staticmethod
+    async def upsert_emails(user_id: str, emails: List[Dict]) -> int:
+        """Upsert parsed Gmail messages keyed by (user_id, gmail_id), queue the new ones for enrichment
+        count them into the analytics rollup and (re-)index them for search. Returns the number of new documents.
+        """
+        if not emails:
+            return 0
+        updates = [build_email_upsert(user_id, email) for email in emails]
+        operations = [
+            UpdateOne({"user_id": user_id, "gmail_id": email["gmail_id"]}, update, upsert=True)
+            for email, update in zip(emails, updates)
+        ]
+        result = await db.get_db().emails.bulk_write(operations, ordered=False)
+        inserted = list(result.upserted_ids)
+        await EnrichmentService.enqueue(user_id, [emails[index]["gmail_id"] for index in inserted])
+        # Existing documents only get Gmail-owned fields refreshed, none of which the rollup counts
+        await AnalyticsRollup.record_emails(
+            user_id, [{**updates[index]["$set"], **updates[index]["$setOnInsert"]} for index in inserted]
+        )
+        await SearchIndex.index_stored_emails(user_id, [email["gmail_id"] for email in emails])
+        return result.upserted_count
+
+    @staticmethod
+    async def delete_emails(user_id: str, gmail_ids: List[str]) -> int:
+        if not gmail_ids:
+            return 0
+        emails = db.get_db().emails
+        query = {"user_id": user_id, "gmail_id": {"$in": gmail_ids}}
+        removed = await emails.find(query, EMAIL_ROLLUP_FIELDS).to_list(None)
+        result = await emails.delete_many(query)
+        await AnalyticsRollup.record_emails(user_id, removed, sign=-1)
+        await SearchIndex.remove_emails(user_id, gmail_ids)
+        return result.deleted_count
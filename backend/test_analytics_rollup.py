@@ -0,0 +1,59 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.analytics_rollup import AnalyticsRollup, collection_email_delta, email_delta, merge_deltas
+
+
+def test_email_change_deltas_cancel_unchanged_fields():
+    before = {"application_status": None, "job_type": None, "experience_level": None,
+              "company": "Acme.io", "position": None, "read": False, "starred": False}
+    after = {**before, "application_status": "interview", "position": "Engineer", "read": True}
+
+    delta = merge_deltas([email_delta(before, -1), email_delta(after)])
+
+    assert delta == {
+        "emails.read": 1,
+        "emails.status._none": -1,
+        "emails.status.interview": 1,
+        "emails.position.Engineer": 1,
+    }
+    added = collection_email_delta({"company": "Acme.io", "application_status": "offer",
+                                    "received_date": datetime(2024, 6, 3, 15, 30)})
+    assert added == {"collections.total": 1, "collections.company.Acme．io": 1,
+                     "collections.daily.2024-06-03.offer": 1}
+
+
+@pytest.mark.asyncio
+async def test_dashboard_summary_reads_the_rollup_document(monkeypatch):
+    rollup = {
+        "_id": "u1",
+        "emails": {"total": 0, "read": 0, "starred": 0, "status": {}, "job_type": {},
+                   "experience_level": {}, "company": {}, "position": {}},
+        "collections": {
+            "total": 3,
+            "company": {"Acme．io": 2, "Globex": 1, "Gone": 0},
+            "daily": {"2024-06-01": {"applied": 2}, "2024-06-03": {"offer": 1}, "2024-06-04": {"rejected": 0}},
+        },
+    }
+    database = MagicMock()
+    database.user_analytics.find_one = AsyncMock(return_value=rollup)
+    database.emails.aggregate.side_effect = AssertionError("raw documents should not be read")
+    monkeypatch.setattr("src.services.analytics_rollup.db", MagicMock(get_db=lambda: database))
+
+    summary = await AnalyticsRollup.get_dashboard_summary("u1")
+
+    assert summary["stats"] == {"total": 3, "read": 0, "unread": 3, "starred": 0}
+    assert summary["company_count"] == 2
+    assert summary["top_companies"] == [{"_id": "Acme.io", "count": 2}, {"_id": "Globex", "count": 1}]
+    assert summary["applications_over_time"] == [
+        {"date": "2024-06-01", "applied": 2, "interview": 0, "offer": 0, "rejected": 0},
+        {"date": "2024-06-03", "applied": 0, "interview": 0, "offer": 1, "rejected": 0},
+    ]
+    assert summary["predictive_insights"]["expected_days_to_offer"] == 2
+    assert summary["funnel"] == {"applied": 0, "interview": 0, "offer": 0, "rejected": 0}
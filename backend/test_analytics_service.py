@@ -0,0 +1,103 @@
+import pytest
+from datetime import datetime
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FakeCursor
+from src.services.analytics_service import AnalyticsService
+
+
+def fake_db(respond):
+    """Collections whose aggregate answers with respond(pipeline); pipelines are recorded."""
+    database = MagicMock()
+    database.pipelines = []
+
+    def aggregate(pipeline):
+        database.pipelines.append(pipeline)
+        return FakeCursor(respond(pipeline))
+
+    database.collections.aggregate = aggregate
+    return database
+
+
+def is_legacy(pipeline):
+    return any("$replaceRoot" in stage for stage in pipeline)
+
+
+@pytest.mark.asyncio
+async def test_applications_over_time_merges_aggregated_and_legacy_emails(monkeypatch):
+    def respond(pipeline):
+        if is_legacy(pipeline):
+            return [{"subject": "Interview invitation", "body": "Let's schedule an interview",
+                     "received_at": "Mon, 3 Jun 2024 09:00:00 +0000"}]
+        return [
+            {"_id": {"day": datetime(2024, 6, 3), "status": "applied"}, "count": 2},
+            {"_id": {"day": datetime(2024, 6, 1), "status": "offer"}, "count": 1},
+        ]
+
+    database = fake_db(respond)
+    monkeypatch.setattr("src.services.analytics_service.db", MagicMock(get_db=lambda: database))
+
+    result = await AnalyticsService.get_applications_over_time("u1")
+
+    assert result == [
+        {"date": "2024-06-01", "applied": 0, "interview": 0, "offer": 1, "rejected": 0},
+        {"date": "2024-06-03", "applied": 2, "interview": 1, "offer": 0, "rejected": 0},
+    ]
+    grouped = next(pipeline for pipeline in database.pipelines if not is_legacy(pipeline))
+    assert "emails.body" not in grouped[1]["$project"]
+
+
+@pytest.mark.asyncio
+async def test_company_counts_derive_only_legacy_senders(monkeypatch):
+    database = fake_db(lambda _pipeline: [
+        {"_id": {"company": "Acme", "from": None}, "count": 3},
+        {"_id": {"from": "jobs@acme.com"}, "count": 2},
+        {"_id": {"company": None, "from": None}, "count": 4},
+        {"_id": {"from": "Recruiting <talent@globex.io>"}, "count": 1},
+    ])
+    monkeypatch.setattr("src.services.analytics_service.db", MagicMock(get_db=lambda: database))
+
+    assert await AnalyticsService.get_collections_top_companies("u1", 5) == [
+        {"_id": "Acme", "count": 5}, {"_id": "Globex", "count": 1}
+    ]
+    assert await AnalyticsService.get_collections_company_count("u1") == 2
+
+
+@pytest.mark.asyncio
+async def test_dashboard_summary_is_one_pass_per_collection(monkeypatch):
+    database = fake_db(lambda _pipeline: [{
+        "total": [{"count": 3}],
+        "timeline": [{"_id": {"day": datetime(2024, 6, 3), "status": "interview"}, "count": 3}],
+        "statuses": [{"_id": "interview", "count": 3, "earliest": datetime(2024, 6, 3), "last_30": 0, "last_15": 0}],
+        "companies": [{"_id": {"company": "Acme", "from": None}, "count": 3}],
+        "legacy": [],
+    }])
+    email_pipelines = []
+
+    def aggregate_emails(pipeline):
+        email_pipelines.append(pipeline)
+        return FakeCursor([{
+            "stats": [{"_id": None, "total": 4, "read": 1, "unread": 3, "starred": 0}],
+            "by_status": [{"_id": "offer", "count": 3}, {"_id": None, "count": 1}],
+            "by_type": [], "by_experience": [],
+            "companies": [{"_id": "Initech", "count": 4}],
+            "top_positions": [{"_id": "Engineer", "count": 2}],
+        }])
+
+    database.emails.aggregate = aggregate_emails
+    monkeypatch.setattr("src.services.analytics_service.db", MagicMock(get_db=lambda: database))
+
+    summary = await AnalyticsService.get_dashboard_summary("u1")
+
+    assert len(email_pipelines) == 1 and len(database.pipelines) == 1
+    assert summary["funnel"] == {"applied": 0, "interview": 0, "offer": 3, "rejected": 0}
+    assert summary["company_count"] == 1 and summary["top_companies"] == [{"_id": "Initech", "count": 4}]
+    assert summary["applications_over_time"] == [
+        {"date": "2024-06-03", "applied": 0, "interview": 3, "offer": 0, "rejected": 0}
+    ]
+    assert summary["predictive_insights"]["total_applications"] == 3
@@ -0,0 +1,157 @@
+import asyncio
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from datetime import datetime
+from bson import ObjectId
+from src.config import settings
+from src.services.backfill_service import BackfillService
+
+
+USER_ID = "65a1f0c2e4b0a1b2c3d4e5f6"
+STARTED_AT = datetime(2024, 6, 1)
+
+
+class FakeJobs:
+    """backfill_jobs holding one job; applies the $set / $inc / $max updates BackfillService issues."""
+
+    def __init__(self, job):
+        self.job = job
+
+    def _matches(self, query):
+        return all(self.job.get(key) == value for key, value in query.items())
+
+    def _apply(self, update):
+        self.job.update(update.get("$set", {}))
+        for key, value in update.get("$inc", {}).items():
+            self.job[key] = self.job.get(key, 0) + value
+        for key, value in update.get("$max", {}).items():
+            self.job[key] = max(self.job.get(key) or 0, value)
+
+    async def find_one(self, query, projection=None):
+        return dict(self.job) if self._matches(query) else None
+
+    async def update_one(self, query, update, upsert=False):
+        if self._matches(query):
+            self._apply(update)
+
+    async def find_one_and_update(self, query, update, projection=None, return_document=False):
+        if not self._matches(query):
+            return None
+        self._apply(update)
+        return dict(self.job)
+
+
+class FakeGmail:
+    def __init__(self, pages, blocked=None, failing=()):
+        self.pages = pages  # page token -> (message ids, next page token)
+        self.blocked = blocked  # set to make fetches wait until cancelled
+        self.failing = set(failing)
+        self.fetched = []
+
+    async def list_message_page(self, query="", page_token=None, max_results=500):
+        message_ids, next_page_token = self.pages[page_token]
+        return list(message_ids), next_page_token, 10
+
+    async def fetch_messages(self, message_ids, use_cache=True):
+        assert use_cache is False
+        self.fetched.append(list(message_ids))
+        if self.blocked is not None:
+            await self.blocked.wait()
+        return [{"gmail_id": message_id} for message_id in message_ids if message_id not in self.failing]
+
+
+def running_job(**fields):
+    return {"_id": "job", "user_id": USER_ID, "query": "", "status": "running", "page_token": None,
+            "last_message_id": None, "processed": 0, "inserted": 0, "failed": 0, "pages": 0,
+            "estimated_total": None, "cancel_requested": False, "started_at": STARTED_AT, **fields}
+
+
+@pytest.fixture
+def jobs(monkeypatch):
+    def install(job):
+        fake = FakeJobs(job)
+        database = MagicMock(backfill_jobs=fake)
+        database.users.update_one = AsyncMock()
+        fake.users = database.users
+        monkeypatch.setattr("src.services.backfill_service.db", MagicMock(get_db=lambda: database))
+        monkeypatch.setattr("src.services.backfill_service.SyncService.upsert_emails",
+                            AsyncMock(side_effect=lambda user_id, emails: len(emails)))
+        monkeypatch.setattr(settings, "backfill_chunk_size", 2)
+        return fake
+    return install
+
+
+@pytest.mark.asyncio
+async def test_walks_every_page_and_completes_with_counters(jobs):
+    fake = jobs(running_job())
+    gmail = FakeGmail({None: (["a", "b", "c"], "t2"), "t2": (["d", "e"], "t3"), "t3": (["f"], None)})
+
+    await BackfillService._run(USER_ID, gmail)
+
+    assert gmail.fetched == [["a", "b"], ["c"], ["d", "e"], ["f"]]
+    assert fake.job["status"] == "completed"
+    assert fake.job["pages"] == 3
+    assert fake.job["processed"] == 6
+    assert fake.job["inserted"] == 6
+    assert fake.job["failed"] == 0
+    # The whole mailbox up to the job's start is stored now
+    (user_filter, update), _ = fake.users.update_one.call_args
+    assert user_filter["_id"] == ObjectId(USER_ID)
+    assert update == {"$set": {"coverage_since": None, "coverage_complete": True}, "$max": {"coverage_until": STARTED_AT}}
+
+
+@pytest.mark.asyncio
+async def test_backfill_with_failed_messages_does_not_claim_coverage(jobs):
+    fake = jobs(running_job())
+
+    await BackfillService._run(USER_ID, FakeGmail({None: (["a", "b", "c"], None)}, failing=["b"]))
+
+    assert fake.job["status"] == "completed"
+    assert fake.job["failed"] == 1
+    fake.users.update_one.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_single_page_backfill_counts_its_page(jobs):
+    fake = jobs(running_job())
+
+    await BackfillService._run(USER_ID, FakeGmail({None: (["a"], None)}))
+
+    assert fake.job["status"] == "completed"
+    assert fake.job["pages"] == 1
+
+
+@pytest.mark.asyncio
+async def test_resumes_after_the_checkpointed_message(jobs):
+    fake = jobs(running_job(page_token="t2", last_message_id="d", processed=4, inserted=4, pages=1))
+    gmail = FakeGmail({"t2": (["c", "d", "e", "f"], None)})
+
+    await BackfillService._run(USER_ID, gmail)
+
+    assert gmail.fetched == [["e", "f"]]
+    assert fake.job["processed"] == 6
+    assert fake.job["pages"] == 2
+    assert fake.job["status"] == "completed"
+
+
+@pytest.mark.asyncio
+async def test_cancel_stops_the_running_job(jobs):
+    fake = jobs(running_job())
+    gmail = FakeGmail({None: (["a", "b", "c"], None)}, blocked=asyncio.Event())
+    BackfillService._tasks[USER_ID] = asyncio.create_task(BackfillService._run(USER_ID, gmail))
+    await asyncio.sleep(0)
+
+    status = await BackfillService.cancel(USER_ID)
+
+    assert status["status"] == "cancelled"
+    assert status["active"] is False
+    assert fake.job["cancel_requested"] is True
+    fake.users.update_one.assert_not_called()
+    assert gmail.fetched == [["a", "b"]]
+    assert fake.job["processed"] == 0
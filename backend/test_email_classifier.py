@@ -0,0 +1,61 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.email_classifier import classify
+from src.services.analytics_service import AnalyticsService
+from src.services.llm_service import LLMService
+
+
+def test_specific_phrases_outweigh_single_keywords():
+    labels = classify("Update on your application", "After careful review we will not be extending an offer.")
+    assert labels["application_status"] == ("rejected", 0.97)
+
+
+def test_rejection_after_thank_you_for_applying_stays_confident():
+    status, confidence = classify(
+        "Thank you for applying",
+        "Unfortunately, we have decided to move forward with other candidates."
+    )["application_status"]
+    assert status == "rejected"
+    assert confidence > 0.9
+
+
+def test_offer_with_job_details_and_salary():
+    labels = classify("Offer", "We are pleased to offer you the Senior Engineer role, full-time, at $150k - $170k per year.")
+    assert labels["application_status"][0] == "offer"
+    assert labels["job_type"][0] == "full-time"
+    assert labels["experience_level"][0] == "senior"
+    assert labels["salary"][0] == "$150k - $170k per year"
+
+
+def test_conflicting_evidence_lowers_confidence():
+    _, confidence = classify("Interview", "Unfortunately we need to reschedule your interview.")["application_status"]
+    assert confidence < 0.5
+
+
+def test_analytics_and_local_extraction_agree():
+    subject, body = "Quick call?", "Can we set up a call this week?"
+    assert AnalyticsService._infer_status(subject, body) == "interview"
+    assert LLMService._extract_metadata_locally(subject, body)["application_status"] == "interview"
+    assert AnalyticsService._infer_status("Newsletter", "Top jobs this week") == "applied"
+
+
+def test_collection_email_fields_are_precomputed_at_ingest():
+    from datetime import datetime
+    from src.services.email_documents import collection_email_fields
+
+    fields = collection_email_fields({
+        "subject": "Interview invitation",
+        "body": "We'd like to schedule a call with you.",
+        "from": "Talent <jobs@acme.com>",
+        "received_at": "Fri, 26 Dec 2025 18:27:03 -0500",
+    })
+
+    assert fields == {
+        "application_status": "interview",
+        "received_date": datetime(2025, 12, 26, 23, 27, 3),
+        "company": "Acme",
+    }
@@ -0,0 +1,48 @@
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock, MagicMock
+from bson import ObjectId
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FakeCursor
+from fastapi import HTTPException
+from src.routes.email_routes import _decode_cursor, _encode_cursor, get_emails
+
+
+def test_cursor_round_trip_and_tampering():
+    email = {"_id": ObjectId(), "received_at": datetime(2024, 6, 3, 9, 30, 15, 123000)}
+    range_filter = _decode_cursor(_encode_cursor(email))
+    assert range_filter == {"$or": [
+        {"received_at": {"$lt": email["received_at"]}},
+        {"received_at": email["received_at"], "_id": {"$lt": email["_id"]}},
+    ]}
+    with pytest.raises(HTTPException):
+        _decode_cursor("not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_cursor_pages_skip_the_count_after_the_first(monkeypatch):
+    emails = [{"_id": ObjectId(), "received_at": datetime(2024, 6, day)} for day in (5, 4, 3)]
+    database = MagicMock()
+    database.emails.find.return_value = FakeCursor(emails)
+    database.emails.count_documents = AsyncMock(return_value=7)
+    monkeypatch.setattr("src.routes.email_routes.db", MagicMock(get_db=lambda: database))
+    monkeypatch.setattr("src.routes.email_routes.AnalyticsRollup.count_emails", AsyncMock(return_value=None))
+    user = {"_id": "u1"}
+
+    first = await get_emails(None, None, None, "interview", None, page=1, limit=2, cursor=True, after=None, current_user=user)
+    assert first["emails"] == emails[:2]
+    assert first["pagination"]["total"] == 7 and first["pagination"]["next"]
+
+    database.emails.find.return_value = FakeCursor(emails[2:])
+    second = await get_emails(None, None, None, "interview", None, page=1, limit=2, cursor=False,
+                              after=first["pagination"]["next"], current_user=user)
+    page_filter = database.emails.find.call_args.args[0]
+    assert page_filter["$and"][0] == {"user_id": "u1", "application_status": "interview"}
+    assert page_filter["$and"][1]["$or"][1]["_id"] == {"$lt": emails[1]["_id"]}
+    assert second["pagination"] == {"limit": 2, "next": None}
+    assert database.emails.count_documents.await_count == 1
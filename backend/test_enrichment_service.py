@@ -0,0 +1,105 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FakeCursor
+from src.config import settings
+from src.services.enrichment_service import EnrichmentService
+
+
+def fake_db(emails):
+    database = MagicMock()
+    database.emails.find.return_value = FakeCursor(emails)
+    database.emails.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+    database.enrichment_jobs.update_many = AsyncMock()
+    database.enrichment_jobs.bulk_write = AsyncMock()
+    return database
+
+
+@pytest.mark.asyncio
+async def test_process_writes_extracted_fields_and_completes_jobs(monkeypatch):
+    database = fake_db([{"gmail_id": "g1", "subject": "Offer", "body": "Congrats", "from": "hr@acme.com"}])
+    monkeypatch.setattr("src.services.enrichment_service.db", MagicMock(get_db=lambda: database))
+    extract = AsyncMock(return_value={"g1": {"job_type": "full-time", "application_status": "offer",
+                                             "salary": None, "experience_level": "mid",
+                                             "job_title": "Engineer", "key_skills": ["python"]}})
+    monkeypatch.setattr("src.services.enrichment_service.LLMService.extract_email_metadata_batch", extract)
+
+    await EnrichmentService._process([{"_id": 1, "user_id": "u1", "gmail_id": "g1"}, {"_id": 2, "user_id": "u1", "gmail_id": "gone"}])
+
+    update_filter, update = database.emails.update_one.call_args.args
+    assert update_filter == {"user_id": "u1", "gmail_id": "g1", "enriched_at": None}
+    assert update["$set"]["position"] == "Engineer"
+    update_filter, update = database.enrichment_jobs.update_many.call_args.args
+    assert update_filter == {"_id": {"$in": [1, 2]}}
+    assert update["$set"]["status"] == "done"
+
+
+@pytest.mark.asyncio
+async def test_rollup_counts_only_emails_this_write_enriched(monkeypatch):
+    database = fake_db([{"gmail_id": "g1", "subject": "s", "body": "b", "from": "f"},
+                        {"gmail_id": "g2", "subject": "s", "body": "b", "from": "f"}])
+    # g2's lease was reclaimed and another worker already enriched it
+    database.emails.update_one.side_effect = lambda query, update: MagicMock(modified_count=int(query["gmail_id"] == "g1"))
+    monkeypatch.setattr("src.services.enrichment_service.db", MagicMock(get_db=lambda: database))
+    fields = {"application_status": "offer", "source": "gemini"}
+    monkeypatch.setattr("src.services.enrichment_service.LLMService.extract_email_metadata_batch",
+                        AsyncMock(return_value={"g1": fields, "g2": fields}))
+    record = AsyncMock()
+    facets = AsyncMock()
+    monkeypatch.setattr("src.services.enrichment_service.AnalyticsRollup.record_email_changes", record)
+    monkeypatch.setattr("src.services.enrichment_service.SearchIndex.update_facets", facets)
+
+    await EnrichmentService._process([{"_id": 1, "user_id": "u1", "gmail_id": "g1"}, {"_id": 2, "user_id": "u1", "gmail_id": "g2"}])
+
+    changes = record.call_args.args[1]
+    assert [before["gmail_id"] for before, _ in changes] == ["g1"]
+    assert list(facets.call_args.args[1]) == ["g1"]
+    assert database.enrichment_jobs.update_many.call_args.args[0] == {"_id": {"$in": [1, 2]}}
+
+
+@pytest.mark.asyncio
+async def test_failures_back_off_then_dead_letter(monkeypatch):
+    database = fake_db([{"gmail_id": "g1", "subject": "Quick question", "body": "Are you free to chat?", "from": "f"},
+                        {"gmail_id": "g2", "subject": "Quick question", "body": "Are you free to chat?", "from": "f"}])
+    monkeypatch.setattr("src.services.enrichment_service.db", MagicMock(get_db=lambda: database))
+    # Every provider is down, so the batch only has keyword guesses
+    client = AsyncMock()
+    client.complete.side_effect = RuntimeError("503 service unavailable")
+    monkeypatch.setattr("src.services.llm_service.get_llm_client", lambda provider: client)
+    monkeypatch.setattr(settings, "gemini_api_key", "test")
+    monkeypatch.setattr(settings, "openai_api_key", None)
+    monkeypatch.setattr(settings, "extraction_dedup_enabled", False)
+    monkeypatch.setattr(settings, "enrichment_max_attempts", 3)
+
+    await EnrichmentService._process([
+        {"_id": 1, "user_id": "u1", "gmail_id": "g1", "attempts": 0},
+        {"_id": 2, "user_id": "u1", "gmail_id": "g2", "attempts": 2},
+    ])
+
+    database.emails.update_one.assert_not_called()  # no enriched_at for keyword guesses
+    database.enrichment_jobs.update_many.assert_not_called()
+    retry, dead = database.enrichment_jobs.bulk_write.call_args.args[0]
+    assert retry._doc["$set"]["status"] == "pending"
+    assert retry._doc["$set"]["attempts"] == 1
+    assert dead._doc["$set"]["status"] == "dead"
+    assert dead._doc["$set"]["error"] == "LLM extraction unavailable"
+
+
+@pytest.mark.asyncio
+async def test_write_errors_back_off_too(monkeypatch):
+    database = fake_db([{"gmail_id": "g1", "subject": "s", "body": "b", "from": "f"}])
+    database.emails.update_one.side_effect = RuntimeError("write failed")
+    monkeypatch.setattr("src.services.enrichment_service.db", MagicMock(get_db=lambda: database))
+    monkeypatch.setattr("src.services.enrichment_service.LLMService.extract_email_metadata_batch",
+                        AsyncMock(return_value={"g1": {"source": "gemini"}}))
+
+    await EnrichmentService._process([{"_id": 1, "user_id": "u1", "gmail_id": "g1", "attempts": 0}])
+
+    (retry,) = database.enrichment_jobs.bulk_write.call_args.args[0]
+    assert retry._doc["$set"]["status"] == "pending"
+    assert retry._doc["$set"]["error"] == "write failed"
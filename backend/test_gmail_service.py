@@ -0,0 +1,347 @@
+import asyncio
+import pytest
+import base64
+import httpx
+from unittest.mock import MagicMock, patch
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FakeCursor
+from src.services.gmail_service import GmailService, HistoryExpiredError, is_rate_limited
+from src.services.rate_limiter import TokenBucket, gmail_metrics
+from src.services import gmail_transport
+from src.services.message_cache import MessageCache
+from src.config import settings
+
+
+@pytest.fixture(autouse=True)
+def googleapiclient_transport(monkeypatch):
+    """Most tests drive a mocked discovery client; httpx tests switch back explicitly."""
+    monkeypatch.setattr(settings, "gmail_transport", "googleapiclient")
+    monkeypatch.setattr(settings, "message_cache_enabled", False)
+
+
+def make_message(message_id: str, body: str = "Hello") -> dict:
+    return {
+        "id": message_id,
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "From", "value": "Recruiter <jobs@acme.com>"},
+                {"name": "To", "value": "me@example.com"},
+                {"name": "Subject", "value": f"Subject {message_id}"},
+                {"name": "Date", "value": "Fri, 26 Dec 2025 18:27:03 +0000"},
+            ],
+            "body": {"data": base64.urlsafe_b64encode(body.encode()).decode()},
+        },
+    }
+
+
+class HttpErrorStub(Exception):
+    def __init__(self, status: int):
+        super().__init__(f"HTTP {status}")
+        self.resp = MagicMock(status=status)
+
+
+class FakeBatch:
+    """Mimics googleapiclient's BatchHttpRequest: callbacks fire on execute()."""
+
+    def __init__(self, callback, responder, calls):
+        self.callback = callback
+        self.responder = responder
+        self.calls = calls
+        self.request_ids = []
+
+    def add(self, request, request_id=None):
+        self.request_ids.append(request_id)
+
+    def execute(self):
+        self.calls.append(list(self.request_ids))
+        for request_id in self.request_ids:
+            response, exception = self.responder(request_id)
+            self.callback(request_id, response, exception)
+
+
+def make_service(responder):
+    calls = []
+    with patch("src.services.gmail_service.gmail_clients") as clients:
+        gmail = GmailService(access_token="token", refresh_token="refresh")
+    service = clients.get_service.return_value
+    service.new_batch_http_request.side_effect = lambda callback: FakeBatch(callback, responder, calls)
+    gmail.bucket = TokenBucket(1_000_000)
+    gmail.bucket.throttle = MagicMock()
+    return gmail, calls
+
+
+@pytest.mark.asyncio
+async def test_batch_fetch_chunks_and_preserves_order():
+    gmail, calls = make_service(lambda message_id: (make_message(message_id), None))
+    ids = [f"m{i}" for i in range(5)]
+
+    emails = await gmail.get_email_details_batch(ids, batch_size=2)
+
+    assert [e["gmail_id"] for e in emails] == ids
+    assert calls == [["m0", "m1"], ["m2", "m3"], ["m4"]]
+    assert emails[0]["body"] == "Hello"
+    assert emails[0]["subject"] == "Subject m0"
+
+
+@pytest.mark.asyncio
+async def test_batch_fetch_skips_failed_and_retries_rate_limited(monkeypatch):
+    monkeypatch.setattr("src.services.gmail_service.asyncio.sleep", _no_sleep)
+    attempts = {}
+
+    def responder(message_id):
+        attempts[message_id] = attempts.get(message_id, 0) + 1
+        if message_id == "missing":
+            return None, HttpErrorStub(404)
+        if message_id == "throttled" and attempts[message_id] == 1:
+            return None, HttpErrorStub(429)
+        return make_message(message_id), None
+
+    gmail, calls = make_service(responder)
+    emails = await gmail.get_email_details_batch(["a", "missing", "throttled"])
+
+    assert [e["gmail_id"] for e in emails] == ["a", "throttled"]
+    assert calls == [["a", "missing", "throttled"], ["throttled"]]
+    assert gmail.bucket.throttle.call_count == 1
+    assert list(gmail.fetch_errors) == ["missing"]
+
+
+@pytest.mark.asyncio
+async def test_batch_fetch_does_not_back_off_after_the_last_attempt(monkeypatch):
+    sleeps = []
+
+    async def record_sleep(seconds):
+        sleeps.append(seconds)
+
+    monkeypatch.setattr("src.services.gmail_service.asyncio.sleep", record_sleep)
+    monkeypatch.setattr(settings, "gmail_batch_retries", 2)
+    gmail, calls = make_service(lambda message_id: (None, HttpErrorStub(503)))
+
+    emails = await gmail.get_email_details_batch(["down"])
+
+    assert emails == []
+    assert len(calls) == 3
+    assert sleeps == [1, 2]  # between attempts only
+    assert list(gmail.fetch_errors) == ["down"]
+
+
+async def _no_sleep(_seconds):
+    return None
+
+
+def make_concurrent_service(responder):
+    with patch("src.services.gmail_service.gmail_clients") as clients:
+        gmail = GmailService(access_token="token", refresh_token="refresh", user_id="user-1")
+    get = clients.get_service.return_value.users.return_value.messages.return_value.get
+    get.side_effect = lambda **kwargs: MagicMock(execute=lambda: responder(kwargs["id"]))
+    gmail.bucket = TokenBucket(1_000_000)
+    gmail.bucket.throttle = MagicMock()
+    return gmail
+
+
+@pytest.mark.asyncio
+async def test_concurrent_fetch_backs_off_on_rate_limit():
+    attempts = {}
+
+    def responder(message_id):
+        attempts[message_id] = attempts.get(message_id, 0) + 1
+        if message_id == "b" and attempts[message_id] == 1:
+            error = HttpErrorStub(403)
+            error.content = b'{"error": {"errors": [{"reason": "userRateLimitExceeded"}]}}'
+            raise error
+        if message_id == "gone":
+            raise HttpErrorStub(404)
+        return make_message(message_id)
+
+    gmail = make_concurrent_service(responder)
+    throttled_before = gmail_metrics.throttled
+
+    emails = await gmail.get_email_details_concurrent(["a", "b", "gone", "c"], concurrency=2)
+
+    assert [e["gmail_id"] for e in emails] == ["a", "b", "c"]
+    assert attempts["b"] == 2
+    assert gmail.bucket.throttle.call_count == 1
+    assert gmail_metrics.throttled == throttled_before + 1
+    assert list(gmail.fetch_errors) == ["gone"]
+    assert gmail_metrics.in_flight == 0
+
+
+def test_is_rate_limited():
+    forbidden = HttpErrorStub(403)
+    forbidden.content = b"insufficientPermissions"
+    assert is_rate_limited(HttpErrorStub(429))
+    assert not is_rate_limited(forbidden)
+    assert not is_rate_limited(ValueError("boom"))
+
+
+@pytest.mark.asyncio
+async def test_list_history_pages_and_drops_deleted_messages():
+    pages = {
+        None: {
+            "history": [
+                {"messagesAdded": [{"message": {"id": "a"}}, {"message": {"id": "b"}}]},
+            ],
+            "historyId": "105",
+            "nextPageToken": "p2",
+        },
+        "p2": {
+            "history": [
+                {"messagesDeleted": [{"message": {"id": "b"}}, {"message": {"id": "old"}}]},
+                {"messagesAdded": [{"message": {"id": "c"}}]},
+            ],
+            "historyId": "110",
+        },
+    }
+    with patch("src.services.gmail_service.gmail_clients") as clients:
+        gmail = GmailService(access_token="token", refresh_token="refresh")
+    history_list = clients.get_service.return_value.users.return_value.history.return_value.list
+    history_list.side_effect = lambda **kwargs: MagicMock(execute=lambda: pages[kwargs["pageToken"]])
+
+    added, deleted, latest = await gmail.list_history("100")
+
+    assert added == ["a", "c"]
+    assert deleted == ["b", "old"]
+    assert latest == "110"
+
+
+@pytest.mark.asyncio
+async def test_list_history_raises_when_expired():
+    with patch("src.services.gmail_service.gmail_clients") as clients:
+        gmail = GmailService(access_token="token", refresh_token="refresh")
+
+    def expired(**kwargs):
+        raise HttpErrorStub(404)
+
+    clients.get_service.return_value.users.return_value.history.return_value.list.side_effect = expired
+
+    with pytest.raises(HistoryExpiredError):
+        await gmail.list_history("1")
+
+
+@pytest.mark.asyncio
+async def test_metadata_format_requests_headers_and_uses_snippet():
+    requested = []
+
+    def get(**kwargs):
+        requested.append(kwargs)
+        message = make_message(kwargs["id"])
+        del message["payload"]["body"]
+        message["snippet"] = "Thanks for applying &amp; good luck"
+        return MagicMock(execute=lambda: message)
+
+    gmail = make_concurrent_service(lambda message_id: None)
+    gmail.service.users.return_value.messages.return_value.get.side_effect = get
+
+    emails = await gmail.get_email_details_concurrent(["a"], format="metadata")
+
+    assert requested[0]["format"] == "metadata"
+    assert requested[0]["metadataHeaders"] == ["From", "To", "Subject", "Date"]
+    assert emails[0]["body"] == "Thanks for applying & good luck"
+    assert emails[0]["format"] == "metadata"
+
+
+@pytest.mark.asyncio
+async def test_httpx_transport_refreshes_token_once_on_401(monkeypatch):
+    monkeypatch.setattr(settings, "gmail_transport", "httpx")
+    seen = []
+
+    def handler(request: httpx.Request):
+        if request.url.host == "oauth2.googleapis.com":
+            return httpx.Response(200, json={"access_token": "fresh"})
+        seen.append((request.headers["Authorization"], request.url.params.get_list("metadataHeaders")))
+        if request.headers["Authorization"] == "Bearer stale":
+            return httpx.Response(401)
+        return httpx.Response(200, json=make_message("m1"))
+
+    monkeypatch.setattr(gmail_transport, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    gmail = GmailService(access_token="stale", refresh_token="refresh", user_id="httpx-user")
+
+    email = await gmail.get_email_details("m1", format="metadata")
+
+    assert email["gmail_id"] == "m1"
+    assert [auth for auth, _ in seen] == ["Bearer stale", "Bearer fresh"]
+    assert seen[0][1] == ["From", "To", "Subject", "Date"]
+
+
+@pytest.mark.asyncio
+async def test_httpx_transport_surfaces_rate_limits(monkeypatch):
+    monkeypatch.setattr(settings, "gmail_transport", "httpx")
+    handler = lambda request: httpx.Response(429, content=b"rateLimitExceeded")
+    monkeypatch.setattr(gmail_transport, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+    gmail = GmailService(access_token="token", refresh_token=None, user_id="httpx-limited")
+
+    fetched, failed = await gmail.transport.batch_get(["a", "b"])
+
+    assert fetched == {}
+    assert all(is_rate_limited(exc) for exc in failed.values())
+
+
+@pytest.mark.asyncio
+async def test_fetch_messages_only_fetches_cache_misses(monkeypatch):
+    monkeypatch.setattr(settings, "message_cache_enabled", True)
+    cache = MessageCache(max_memory_entries=10)
+    cache._remember("user-1", {"gmail_id": "a", "body": "cached", "format": "full"})
+    collection = MagicMock()
+    collection.find.return_value = FakeCursor([])
+
+    async def bulk_write(operations, ordered=True):
+        collection.written = operations
+
+    collection.bulk_write.side_effect = bulk_write
+    monkeypatch.setattr("src.services.gmail_service.message_cache", cache)
+    monkeypatch.setattr("src.services.message_cache.db", MagicMock(get_db=lambda: MagicMock(message_cache=collection)))
+
+    gmail, calls = make_service(lambda message_id: (make_message(message_id), None))
+    gmail.user_id = "user-1"
+    emails = await gmail.fetch_messages(["b", "a", "c"])
+
+    assert [e["gmail_id"] for e in emails] == ["b", "a", "c"]
+    assert emails[1]["body"] == "cached"
+    assert calls == [["b", "c"]]
+    assert len(collection.written) == 2
+    # A cached full message also answers a metadata request
+    assert set(await cache.get_many("user-1", ["a", "b"], format="metadata")) == {"a", "b"}
+
+
+@pytest.mark.asyncio
+async def test_fetch_messages_can_bypass_the_cache(monkeypatch):
+    monkeypatch.setattr(settings, "message_cache_enabled", True)
+    cache = MagicMock()
+    monkeypatch.setattr("src.services.gmail_service.message_cache", cache)
+
+    gmail, calls = make_service(lambda message_id: (make_message(message_id), None))
+    gmail.user_id = "user-1"
+    emails = await gmail.fetch_messages(["a", "b"], use_cache=False)
+
+    assert [e["gmail_id"] for e in emails] == ["a", "b"]
+    assert calls == [["a", "b"]]
+    cache.get_many.assert_not_called()
+    cache.put_many.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_stream_messages_pauses_for_slow_readers_and_cancels_on_close():
+    fetched = []
+
+    def responder(message_id):
+        fetched.append(message_id)
+        return make_message(message_id)
+
+    gmail = make_concurrent_service(responder)
+    stream = gmail.stream_messages([f"m{i}" for i in range(20)], concurrency=2, buffer=1)
+
+    first = await stream.__anext__()
+    await asyncio.sleep(0.1)
+    # One handed out, one buffered, one held by each blocked worker
+    assert first["gmail_id"] in fetched
+    assert len(fetched) <= 4
+
+    await stream.aclose()
+    await asyncio.sleep(0.05)
+    assert len(fetched) <= 4
+    assert gmail_metrics.in_flight == 0
@@ -0,0 +1,41 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from pymongo.errors import OperationFailure
+from src.indexes import INDEXES, ensure_indexes
+from src.index_audit import plan_indexes, plan_stages
+
+
+@pytest.mark.asyncio
+async def test_ensure_indexes_creates_each_index_and_skips_failures():
+    collections = {name: MagicMock() for name in INDEXES}
+    for name, collection in collections.items():
+        collection.create_indexes = AsyncMock(side_effect=lambda models: [models[0].document["name"]])
+    collections["users"].create_indexes = AsyncMock(side_effect=OperationFailure("E11000 duplicate key"))
+    database = MagicMock()
+    database.__getitem__.side_effect = collections.__getitem__
+
+    created = await ensure_indexes(database)
+
+    assert created["users"] == []
+    assert "user_id_1_gmail_id_1" in created["emails"]
+    assert "user_id_1_created_at_-1" in created["collections"]
+    assert sum(len(names) for names in created.values()) == sum(len(specs) for specs in INDEXES.values()) - 1
+
+
+def test_audit_reads_the_winning_plan_only():
+    explain = {
+        "queryPlanner": {
+            "winningPlan": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "user_id_1_received_at_-1"}},
+            "rejectedPlans": [{"stage": "COLLSCAN"}],
+        }
+    }
+    assert plan_stages(explain) == {"FETCH", "IXSCAN"}
+    assert plan_indexes(explain) == {"user_id_1_received_at_-1"}
+    aggregate = {"stages": [{"$cursor": {"queryPlanner": {"winningPlan": {"stage": "COLLSCAN"}}}}, {"$group": {}}]}
+    assert "COLLSCAN" in plan_stages(aggregate)
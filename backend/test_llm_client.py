@@ -0,0 +1,43 @@
+import pytest
+import asyncio
+import time
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.config import settings
+from src.services.llm_client import GeminiClient, parse_json_response
+
+
+def test_parse_json_response_strips_code_fences():
+    assert parse_json_response('```json\n{"a": 1}\n```') == {"a": 1}
+    assert parse_json_response('{"a": 2}') == {"a": 2}
+
+
+@pytest.mark.asyncio
+async def test_slow_gemini_call_times_out_without_blocking_the_loop(monkeypatch):
+    monkeypatch.setattr(settings, "gemini_timeout", 0.2)
+    client = GeminiClient(api_key="test")
+
+    class SlowModel:
+        def generate_content(self, prompt, generation_config=None):
+            time.sleep(1)
+
+    client._models["slow"] = SlowModel()
+    ticks = 0
+
+    async def ticker():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    tick_task = asyncio.create_task(ticker())
+    with pytest.raises(asyncio.TimeoutError):
+        await client.complete("hello", model="slow")
+    tick_task.cancel()
+    await client.close()
+
+    assert ticks >= 5
@@ -0,0 +1,201 @@
+import pytest
+import json
+from unittest.mock import AsyncMock, MagicMock
+import re
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.config import settings
+from src.services.llm_service import LLMService
+from src.services.extraction_dedup import ExtractionDedup, extraction_dedup
+
+
+class FakeExtractionClient:
+    """Answers extraction prompts, dropping one email the first time it is asked about."""
+
+    def __init__(self, drop_once: str):
+        self.drop_once = drop_once
+        self.prompts = []
+
+    async def complete(self, prompt, **kwargs):
+        ids = re.findall(r'<email id="([^"]+)">', prompt)
+        self.prompts.append(ids)
+        items = []
+        for email_id in ids:
+            if email_id == self.drop_once:
+                self.drop_once = None
+                continue
+            items.append({"id": email_id, "job_type": "Full-Time", "application_status": "rejected",
+                          "salary": "null", "experience_level": "staff", "job_title": "Engineer",
+                          "key_skills": "python, go"})
+        return "```json\n" + json.dumps(items) + "\n```"
+
+
+@pytest.mark.asyncio
+async def test_batch_extraction_validates_items_and_retries_only_failures(monkeypatch):
+    client = FakeExtractionClient(drop_once="e3")
+    monkeypatch.setattr(settings, "gemini_api_key", "test")
+    monkeypatch.setattr(settings, "openai_api_key", None)
+    monkeypatch.setattr(settings, "classifier_confidence_threshold", 1.1)
+    monkeypatch.setattr(settings, "llm_extraction_batch_size", 4)
+    monkeypatch.setattr(settings, "extraction_dedup_enabled", False)
+    monkeypatch.setattr("src.services.llm_service.get_llm_client", lambda provider: client)
+    emails = [{"id": f"e{i}", "subject": f"Update {i}", "body": "We regret", "from": "hr@acme.com"} for i in range(6)]
+
+    results = await LLMService.extract_email_metadata_batch(emails)
+
+    assert client.prompts == [["e0", "e1", "e2", "e3"], ["e4", "e5"], ["e3"]]
+    assert set(results) == {f"e{i}" for i in range(6)}
+    assert results["e3"] == {
+        "job_type": "full-time",
+        "application_status": "rejected",
+        "salary": None,
+        "experience_level": "other",
+        "job_title": "Engineer",
+        "key_skills": ["python", "go"],
+        "source": "gemini",
+    }
+
+
+@pytest.mark.asyncio
+async def test_batch_extraction_marks_keyword_fallbacks_during_an_outage(monkeypatch):
+    client = AsyncMock()
+    client.complete.side_effect = RuntimeError("503 service unavailable")
+    monkeypatch.setattr(settings, "gemini_api_key", "test")
+    monkeypatch.setattr(settings, "openai_api_key", None)
+    monkeypatch.setattr(settings, "extraction_dedup_enabled", False)
+    monkeypatch.setattr("src.services.llm_service.get_llm_client", lambda provider: client)
+    emails = [
+        {"id": "clear", "subject": "Your application", "body": "We regret to inform you that the role has been filled."},
+        {"id": "vague", "subject": "Quick question", "body": "Are you free to chat?"},
+    ]
+
+    results = await LLMService.extract_email_metadata_batch(emails)
+
+    assert results["clear"]["source"] == "classifier"
+    assert results["vague"]["source"] == "fallback"
+    monkeypatch.setattr(settings, "gemini_api_key", None)
+    assert (await LLMService.extract_email_metadata_batch(emails[1:]))["vague"]["source"] == "local"
+
+
+def test_pack_extraction_batches_respects_token_budget(monkeypatch):
+    monkeypatch.setattr(settings, "llm_extraction_token_budget", 300)
+    emails = [{"id": str(i), "subject": "s", "body": "x" * 500} for i in range(5)]
+
+    batches = LLMService._pack_extraction_batches(emails, batch_size=20)
+
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_near_duplicate_emails_share_one_extraction(monkeypatch):
+    client = FakeExtractionClient(drop_once=None)
+    monkeypatch.setattr(settings, "gemini_api_key", "test")
+    monkeypatch.setattr(settings, "openai_api_key", None)
+    monkeypatch.setattr(settings, "classifier_confidence_threshold", 1.1)
+    monkeypatch.setattr("src.services.llm_service.get_llm_client", lambda provider: client)
+    monkeypatch.setattr(extraction_dedup, "lookup", AsyncMock(return_value={"known": {"job_type": "contract"}}))
+    monkeypatch.setattr(extraction_dedup, "store", AsyncMock())
+    template = ("Dear {name}, thank you for applying to the Backend Engineer role at Acme. Our team will review "
+                "your application and reach out if there is a match. Track it at https://acme.com/a/{ref}.")
+    emails = [
+        {"id": "a", "subject": "Application received", "body": template.format(name="John", ref=1)},
+        {"id": "b", "subject": "Application received", "body": template.format(name="Maria Lopez", ref=987)},
+        {"id": "c", "subject": "Interview", "body": "Hi John, can we schedule a call for the design role?"},
+        {"id": "known", "subject": "Contract role", "body": "A six month contract"},
+    ]
+
+    results = await LLMService.extract_email_metadata_batch(emails)
+
+    assert client.prompts == [["a", "c"]]
+    assert results["b"]["application_status"] == results["a"]["application_status"]
+    assert results["a"]["job_title"] == "Engineer"
+    assert results["b"]["job_title"] is None  # never copied from another email
+    assert results["known"]["job_type"] == "contract"
+    stored = extraction_dedup.store.call_args.args[0]
+    assert len(stored) == 2
+
+
+@pytest.mark.asyncio
+async def test_offers_differing_only_in_salary_keep_their_own_salary(monkeypatch):
+    template = ("Dear {name}, we are delighted to offer you the Senior Backend Engineer position at Acme with a "
+                "base salary of {salary} per year. Please sign the attached letter by Friday.")
+    first = template.format(name="John", salary="$120,000")
+    second = template.format(name="Maria", salary="$150,000")
+    assert ExtractionDedup.fingerprint("Offer letter", first) != ExtractionDedup.fingerprint("Offer letter", second)
+
+    # Even when a stored near-duplicate matches, only categorical fields are reused
+    monkeypatch.setattr(settings, "gemini_api_key", "test")
+    monkeypatch.setattr(settings, "openai_api_key", None)
+    monkeypatch.setattr(settings, "classifier_confidence_threshold", 1.1)
+    monkeypatch.setattr(extraction_dedup, "lookup", AsyncMock(return_value={"second": {
+        "application_status": "offer", "job_type": "full-time", "experience_level": "senior",
+    }}))
+    monkeypatch.setattr(extraction_dedup, "store", AsyncMock())
+
+    results = await LLMService.extract_email_metadata_batch([{"id": "second", "subject": "Offer letter", "body": second}])
+
+    assert results["second"]["salary"] == "$150,000 per year"
+    assert results["second"]["experience_level"] == "senior"
+    assert results["second"]["job_title"] is None
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_index_stores_and_returns_only_categorical_fields(monkeypatch):
+    collection = MagicMock()
+    collection.bulk_write = AsyncMock()
+    monkeypatch.setattr("src.services.extraction_dedup.db", MagicMock(get_db=lambda: MagicMock(extraction_fingerprints=collection)))
+
+    await extraction_dedup.store({42: {"application_status": "offer", "job_type": "full-time", "experience_level": "mid",
+                                       "salary": "$150,000", "job_title": "Engineer", "key_skills": ["go"]}})
+
+    (operation,), _ = collection.bulk_write.call_args
+    assert operation[0]._doc["$set"]["metadata"] == {"application_status": "offer", "job_type": "full-time",
+                                                     "experience_level": "mid"}
+
+
+@pytest.mark.asyncio
+async def test_confidently_classified_emails_skip_the_llm(monkeypatch):
+    client = FakeExtractionClient(drop_once=None)
+    monkeypatch.setattr(settings, "gemini_api_key", "test")
+    monkeypatch.setattr(settings, "openai_api_key", None)
+    monkeypatch.setattr(settings, "extraction_dedup_enabled", False)
+    monkeypatch.setattr("src.services.llm_service.get_llm_client", lambda provider: client)
+    emails = [
+        {"id": "clear", "subject": "Your application", "body": "We regret to inform you that the role has been filled."},
+        {"id": "vague", "subject": "Quick question", "body": "Are you free to chat?"},
+    ]
+
+    results = await LLMService.extract_email_metadata_batch(emails)
+
+    assert client.prompts == [["vague"]]
+    assert results["clear"]["application_status"] == "rejected"
+
+
+@pytest.mark.asyncio
+async def test_natural_query_caches_llm_answers_but_not_the_keyword_fallback(monkeypatch):
+    monkeypatch.setattr(settings, "llm_provider", "gemini")
+    cache = AsyncMock()
+    cache.get.return_value = None
+    monkeypatch.setattr("src.services.llm_service.query_cache", cache)
+    # An LLM answer identical to what keyword matching would produce is still a real translation
+    local = await LLMService._process_locally("interview invites")
+    llm_answer = {key: value for key, value in local.items() if key != "source"}
+    client = AsyncMock()
+    client.complete.return_value = json.dumps(llm_answer)
+    monkeypatch.setattr("src.services.llm_service.get_llm_client", lambda provider: client)
+
+    result = await LLMService.process_natural_language_query("interview invites")
+
+    assert result == {**llm_answer, "source": "gemini"}
+    cache.put.assert_awaited_once_with("interview invites", result)
+
+    cache.put.reset_mock()
+    client.complete.side_effect = RuntimeError("quota exceeded")
+    fallback = await LLMService.process_natural_language_query("interview invites")
+
+    assert fallback["source"] == "local"
+    cache.put.assert_not_awaited()
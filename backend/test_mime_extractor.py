@@ -0,0 +1,78 @@
+import base64
+import sys
+import os
+
+# Add backend and the benchmark fixture loader to path
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "benchmarks"))
+
+from mime_fixtures import load_fixture
+from src.services.mime_extractor import decode_part, extract_body, html_to_text
+
+
+def leaf(mime_type: str, text: str, charset: str = "utf-8", **extra) -> dict:
+    return {
+        "mimeType": mime_type,
+        "headers": [{"name": "Content-Type", "value": f'{mime_type}; charset="{charset}"'}],
+        "body": {"data": base64.urlsafe_b64encode(text.encode(charset)).decode()},
+        **extra,
+    }
+
+
+def test_prefers_plain_text_nested_in_mixed_alternative():
+    body = extract_body(load_fixture("recruiter_mixed_alternative.eml"))
+    assert body.startswith("Hi Alex,")
+    assert "Senior Backend Engineer (Python)" in body
+    assert "%PDF" not in body
+
+
+def test_html_only_tree_skips_inline_images_and_attachments():
+    body = extract_body(load_fixture("nested_related_html.eml"))
+    assert "panel interview is confirmed for Monday 10 Nov, 14:00 CET" in body
+    assert "VCALENDAR" not in body
+    assert "<" not in body
+
+
+def test_respects_declared_charsets():
+    assert "Merci pour l'intérêt" in extract_body(load_fixture("latin1_qp_rejection.eml"))
+    assert "We’re thrilled" in extract_body(load_fixture("cp1252_html_offer.eml"))
+    assert "一次面接" in extract_body(load_fixture("iso2022jp_plain_interview.eml"))
+
+
+def test_html_to_text_drops_head_script_and_comments():
+    text = extract_body(load_fixture("jobboard_html_only.eml"))
+    assert text.startswith("Alex, 8 new jobs match your preferences")
+    assert "schema.org" not in text
+    assert "job card" not in text
+    assert "Stripe · Remote" in text
+
+
+def test_window_cut_inside_a_style_or_script_block_does_not_leak_it():
+    # The first decode/render window ends inside the digest's <style> block
+    body = extract_body(load_fixture("digest_body_style_block.eml"), max_chars=600)
+    assert body.startswith("Your weekly job digest Platform Engineer")
+    assert "Recruiters at Datadog and Adyen viewed your profile" in body
+    assert "!important" not in body and "mso-" not in body
+
+    html = "<p>Offer details</p><script>" + "var tracking = 1;" * 50 + "</script><p>" + "Start date Monday. " * 20 + "</p>"
+    text = html_to_text(html, max_chars=60)
+    assert "tracking" not in text
+    assert text.startswith("Offer details Start date Monday.")
+    assert "tracking" not in html_to_text("<p>Offer details</p><script>var tracking = 1;", max_chars=60)
+
+
+def test_stops_at_max_chars():
+    html = "<html><body>" + "<p>Backend engineer role &amp; more</p>" * 10000 + "</body></html>"
+    text = html_to_text(html, max_chars=100)
+    assert len(text) == 100
+    assert text.startswith("Backend engineer role & more Backend")
+
+    payload = {"mimeType": "multipart/alternative", "parts": [leaf("text/plain", "é" * 20000)]}
+    assert extract_body(payload, max_chars=50) == "é" * 50
+
+
+def test_unknown_charset_and_bad_bytes_do_not_raise():
+    part = leaf("text/plain", "hello", charset="utf-8")
+    part["headers"][0]["value"] = 'text/plain; charset="x-unknown-charset"'
+    assert extract_body(part) == "hello"
+    assert decode_part(base64.urlsafe_b64encode(b"caf\xe9").decode()) == "caf�"
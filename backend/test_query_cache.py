@@ -0,0 +1,49 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.query_cache import QueryCache, normalize_prompt, prompt_vector, prompt_signature
+
+
+def index_prompts(cache: QueryCache, *prompts: str):
+    for prompt in prompts:
+        normalized = normalize_prompt(prompt)
+        cache._remember(normalized, prompt_vector(normalized), normalized, datetime.utcnow())
+
+
+def most_similar(cache: QueryCache, prompt: str):
+    normalized = normalize_prompt(prompt)
+    return cache._most_similar(prompt_vector(normalized), prompt_signature(normalized), datetime.utcnow() - timedelta(hours=1))
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Show me   REJECTIONS!! ") == "show me rejections"
+
+
+def test_similarity_matches_rephrasings_but_not_different_entities_or_years():
+    cache = QueryCache()
+    index_prompts(cache, "show me rejections", "interviews in 2024", "rejections from google")
+
+    assert most_similar(cache, "Show me my rejections please") == "show me rejections"
+    assert most_similar(cache, "interviews in 2023") is None
+    assert most_similar(cache, "rejections from amazon") is None
+
+
+def test_similarity_never_crosses_negations_operators_or_different_words():
+    cache = QueryCache()
+    pairs = [
+        ("unread rejections", "read rejections"),
+        ("interviews not from google", "interviews from google"),
+        ("show me offers not rejections", "show me rejections not offers"),
+        ("job offers in berlin", "job offers in bern"),
+    ]
+    for cached, asked in pairs:
+        index_prompts(cache, cached)
+
+    for cached, asked in pairs:
+        assert most_similar(cache, asked) is None, asked
+        assert most_similar(cache, cached) == normalize_prompt(cached)
+    assert most_similar(cache, "my job offer in berlin") == "job offers in berlin"
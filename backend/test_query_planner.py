@@ -0,0 +1,130 @@
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FakeSyncGmail
+from src.services.query_planner import QueryPlanner, UnsupportedQueryError, translate_gmail_query
+
+NOW = datetime(2024, 6, 30, 12, 0)
+
+
+def regex(pattern):
+    return {"$regex": pattern, "$options": "i"}
+
+
+def test_gmail_query_translates_to_a_mongo_filter():
+    translated = translate_gmail_query('from:acme subject:(offer OR "next steps") -newsletter after:2024/06/01', NOW)
+
+    assert translated["filter"] == {"$and": [
+        {"from": regex(r"\bacme\b")},
+        {"$or": [{"subject": regex(r"\boffer\b")}, {"subject": regex(r"\bnext\s+steps\b")}]},
+        {"$nor": [{"$or": [{field: regex(r"\bnewsletter\b")} for field in ("subject", "from", "body")]}]},
+        {"received_at": {"$gte": datetime(2024, 6, 1)}},
+    ]}
+    assert translated["after"] == datetime(2024, 6, 1)
+    assert translated["before"] is None
+    assert translate_gmail_query("newer_than:7d", NOW)["after"] == NOW - timedelta(days=7)
+    with pytest.raises(UnsupportedQueryError):
+        translate_gmail_query("label:jobs has:attachment", NOW)
+    for flag in ("is:unread", "is:read", "is:starred"):
+        # Gmail's UNREAD/STARRED labels aren't synced, so only Gmail can answer these
+        with pytest.raises(UnsupportedQueryError):
+            translate_gmail_query(f"offer {flag}", NOW)
+
+
+@pytest.mark.asyncio
+async def test_plan_answers_locally_and_asks_gmail_only_for_uncovered_ranges():
+    user = {"_id": "u1", "coverage_since": datetime(2024, 5, 1), "coverage_until": NOW - timedelta(minutes=5)}
+
+    fresh = await QueryPlanner.plan(user, "subject:offer after:2024/05/10", "find_job_offers", now=NOW)
+    assert fresh["gmail_queries"] == []
+    assert fresh["local"] == {"$and": [
+        {"subject": regex(r"\boffer\b")},
+        {"received_at": {"$gte": datetime(2024, 5, 10)}},
+        {"$or": [{"application_status": "offer"}, {"enriched_at": None}]},
+    ]}
+
+    stale = {**user, "coverage_until": datetime(2024, 6, 20)}
+    plan = await QueryPlanner.plan(stale, "subject:offer", None, now=NOW)
+    assert plan["local"] == {"subject": regex(r"\boffer\b")}
+    assert [query["query"] for query in plan["gmail_queries"]] == [
+        "(subject:offer) before:1714521600",  # before the covered range
+        "(subject:offer) after:1718841600",  # since it was last extended
+    ]
+
+    unsupported = await QueryPlanner.plan(user, "label:jobs", None, now=NOW)
+    assert unsupported["local"] is None
+    assert unsupported["gmail_queries"][0]["query"] == "label:jobs"
+
+
+@pytest.mark.asyncio
+async def test_backfilled_mailbox_is_covered_all_the_way_back():
+    user = {"_id": "u1", "coverage_since": None, "coverage_complete": True, "coverage_until": NOW - timedelta(minutes=1)}
+
+    plan = await QueryPlanner.plan(user, "interview", None, now=NOW)
+
+    assert plan["gmail_queries"] == []
+    assert plan["covered_since"] is None
+
+
+USER_ID = "65a1f0c2e4b0a1b2c3d4e5f6"
+COVERED = {"_id": USER_ID, "gmail_history_id": "100", "coverage_since": datetime(2023, 1, 1),
+           "coverage_complete": False, "coverage_until": NOW - timedelta(minutes=1), "last_synced_at": None}
+
+
+@pytest.mark.asyncio
+async def test_search_sync_does_not_count_as_covering_the_mailbox(synced_user):
+    # A query-scoped sync stores old matches without the rest of their range
+    gmail = FakeSyncGmail({"old": "Mon, 1 Jan 2018 09:00:00 +0000"})
+    user = await synced_user({"_id": USER_ID, "last_synced_at": None}, gmail, query="from:acme")
+
+    assert user["last_synced_at"] is None
+    assert QueryPlanner.coverage(user) is None
+    plan = await QueryPlanner.plan(user, "from:acme", None, now=NOW)
+    assert plan["gmail_queries"] == [{"query": "from:acme", "after": None, "before": None}]
+
+
+@pytest.mark.asyncio
+async def test_expired_history_narrows_coverage_to_the_relisted_messages(synced_user):
+    listed = {"m1": "Sat, 29 Jun 2024 10:00:00 +0000", "m2": "Fri, 28 Jun 2024 10:00:00 +0000"}
+    user = await synced_user(dict(COVERED), FakeSyncGmail(listed, history_expired=True), limit=2)
+
+    # Only the newest two messages were re-listed; changes before them were lost with the history
+    assert user["gmail_history_id"] == "300"
+    assert user["coverage_complete"] is False
+    assert user["coverage_since"] == datetime(2024, 6, 28, 10, 0)
+    plan = await QueryPlanner.plan(user, "interview", None, now=NOW)
+    assert [query["before"] for query in plan["gmail_queries"]] == [datetime(2024, 6, 28, 10, 0)]
+
+
+@pytest.mark.asyncio
+async def test_history_replay_extends_existing_coverage_only(synced_user):
+    covered = await synced_user(dict(COVERED), FakeSyncGmail({}))
+    assert covered["coverage_since"] == datetime(2023, 1, 1)
+    assert covered["coverage_until"] > COVERED["coverage_until"]
+
+    uncovered = await synced_user({"_id": USER_ID, "gmail_history_id": "100"}, FakeSyncGmail({}))
+    assert uncovered.get("coverage_until") is None
+    assert uncovered["last_synced_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_failed_fetches_keep_the_range_untrusted_until_retried(synced_user):
+    listed = {"m1": "Sat, 29 Jun 2024 10:00:00 +0000", "m2": "Fri, 28 Jun 2024 10:00:00 +0000"}
+    gmail = FakeSyncGmail(listed, failing=["m2"])
+
+    # Fewer messages than the limit, but one of them was never stored
+    user = await synced_user({"_id": USER_ID}, gmail, limit=50)
+
+    assert user["coverage_complete"] is False
+    assert QueryPlanner.coverage(user) is None
+
+    user = await synced_user(user, gmail, limit=50)
+
+    assert user["sync_retry_ids"] == []
+    assert QueryPlanner.coverage(user) == {"since": datetime(2024, 6, 29, 10, 0), "until": user["coverage_until"]}
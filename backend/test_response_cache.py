@@ -0,0 +1,48 @@
+import pytest
+from unittest.mock import AsyncMock
+from starlette.requests import Request
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from src.services.response_cache import MemoryCacheBackend, ResponseCache
+
+
+def request(if_none_match: str = None) -> Request:
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+@pytest.mark.asyncio
+async def test_cached_until_invalidated_and_keyed_by_params():
+    cache = ResponseCache(MemoryCacheBackend(), 10)
+    compute = AsyncMock(return_value=[{"_id": "Acme", "count": 2}])
+
+    first = await cache.respond(request(), "u1", "top-companies", {"limit": 5}, compute)
+    second = await cache.respond(request(), "u1", "top-companies", {"limit": 5}, compute)
+    assert compute.await_count == 1
+    assert first.body == second.body == b'[{"_id": "Acme", "count": 2}]'
+
+    await cache.respond(request(), "u1", "top-companies", {"limit": 10}, compute)
+    await cache.respond(request(), "u2", "top-companies", {"limit": 5}, compute)
+    assert compute.await_count == 3
+
+    await cache.invalidate("u1")
+    await cache.respond(request(), "u1", "top-companies", {"limit": 5}, compute)
+    assert compute.await_count == 4
+
+
+@pytest.mark.asyncio
+async def test_matching_etag_gets_304_without_body():
+    cache = ResponseCache(MemoryCacheBackend(), 10)
+    compute = AsyncMock(return_value={"total": 3})
+
+    first = await cache.respond(request(), "u1", "stats", {}, compute)
+    etag = first.headers["etag"]
+    revalidated = await cache.respond(request(etag), "u1", "stats", {}, compute)
+
+    assert revalidated.status_code == 304 and revalidated.body == b""
+    assert revalidated.headers["etag"] == etag
+    assert cache.snapshot()["not_modified"] == 1
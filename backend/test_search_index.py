@@ -0,0 +1,87 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FakeCursor
+from src.config import settings
+from src.services.search_index import SearchIndex, search_document, term_weights, tokenize
+
+
+def test_index_entries_weight_subject_and_sender_over_body():
+    assert tokenize("The Interview is on 3 June, at ACME-HQ") == ["interview", "june", "acme", "hq"]
+    assert term_weights("Interview invite", "recruiting@acme.io", "Your interview with Acme") == {
+        "interview": 4, "invite": 3, "recruiting": 2, "acme": 3, "io": 2,
+    }
+
+    entry = search_document("u1", {"_id": "e1", "gmail_id": "g1", "subject": "Offer", "from": "hr@globex.com",
+                                   "body": "", "received_at": "Mon, 3 Jun 2024 10:00:00 +0000",
+                                   "company": "Globex", "application_status": "offer"}, "email")
+    assert entry["_id"] == "u1:email:g1"
+    assert entry["terms"] == ["com", "globex", "hr", "offer"]
+    assert entry["length"] == 9
+    assert entry["facets"]["application_status"] == "offer"
+    assert entry["facets"]["source"] == "email"
+    assert search_document("u1", {"subject": "no gmail id"}, "collection", "c1") is None
+
+
+def search_db(monkeypatch, documents, total, facets=None):
+    database = MagicMock()
+    database.search_terms.find.side_effect = [
+        FakeCursor([{"term": "interview"}, {"term": "interviewer"}]),  # prefix expansion of "interv"
+        FakeCursor([{"term": "acme", "df": 2}, {"term": "interview", "df": 1}, {"term": "interviewer", "df": 1}]),
+    ]
+    database.search_stats.find_one = AsyncMock(return_value={"_id": "u1", "documents": 10, "length": 100})
+    database.search_documents.aggregate.return_value = FakeCursor([{"total": [{"count": total}], **(facets or {})}])
+    database.search_documents.find.side_effect = lambda query, projection: FakeCursor(
+        [doc for doc in documents if query["terms"] in doc["tf"]] if isinstance(query["terms"], str) else documents
+    )
+    monkeypatch.setattr("src.services.search_index.db", MagicMock(get_db=lambda: database))
+    return database
+
+
+DOCUMENTS = [
+    {"_id": "u1:email:a", "gmail_id": "a", "length": 10, "tf": {"acme": 1}},
+    {"_id": "u1:email:b", "gmail_id": "b", "length": 10, "tf": {"acme": 1, "interview": 3}},
+    {"_id": "u1:collection:c1:c", "gmail_id": "c", "length": 40, "tf": {"interviewer": 1}},
+]
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_with_bm25_expands_prefix_and_counts_facets(monkeypatch):
+    database = search_db(monkeypatch, [dict(doc) for doc in DOCUMENTS], total=3, facets={
+        "company": [{"_id": "Acme", "count": 2}, {"_id": "Globex", "count": 1}],
+        "application_status": [{"_id": None, "count": 2}, {"_id": "interview", "count": 1}],
+    })
+
+    result = await SearchIndex.search("u1", "acme interv", {"source": "email"}, limit=2)
+
+    assert result["terms"] == ["acme", "interv", "interview", "interviewer"]
+    match, projection = database.search_documents.find.call_args.args
+    assert match == {"user_id": "u1", "terms": {"$in": result["terms"]}, "facets.source": "email"}
+    assert database.search_documents.aggregate.call_args.args[0][0] == {"$match": match}
+    assert projection["tf.interview"] == 1 and "tf" not in projection and "terms" not in projection
+    assert result["total"] == 3
+    assert result["total_is_estimate"] is False
+    assert [hit["gmail_id"] for hit in result["results"]] == ["b", "a"]
+    assert "tf" not in result["results"][0]
+    assert result["facets"]["company"] == [{"value": "Acme", "count": 2}, {"value": "Globex", "count": 1}]
+    assert result["facets"]["application_status"] == [{"value": "interview", "count": 1}]
+
+
+@pytest.mark.asyncio
+async def test_truncated_matches_rank_the_rarest_terms_postings_and_flag_the_total(monkeypatch):
+    monkeypatch.setattr(settings, "search_max_candidates", 2)
+    database = search_db(monkeypatch, [dict(doc) for doc in DOCUMENTS], total=3)
+
+    result = await SearchIndex.search("u1", "acme interv", limit=10)
+
+    queried = [call.args[0]["terms"] for call in database.search_documents.find.call_args_list]
+    # df 0 (the raw prefix) and df 1 terms before "acme" (df 2); the budget runs out before "acme"
+    assert queried == ["interv", "interview", "interviewer"]
+    assert result["total"] == 3
+    assert result["total_is_estimate"] is True
+    assert [hit["gmail_id"] for hit in result["results"]] == ["b", "c"]
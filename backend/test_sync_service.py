@@ -0,0 +1,41 @@
+import pytest
+import sys
+import os
+
+# Add backend to path
+sys.path.insert(0, os.path.dirname(__file__))
+
+from conftest import FakeSyncGmail
+
+USER_ID = "65a1f0c2e4b0a1b2c3d4e5f6"
+DATES = {"new": "Sat, 29 Jun 2024 10:00:00 +0000", "flaky": "Fri, 28 Jun 2024 10:00:00 +0000"}
+
+
+@pytest.mark.asyncio
+async def test_messages_that_fail_to_fetch_are_fetched_by_the_next_sync(synced_user):
+    user = {"_id": USER_ID, "gmail_history_id": "100"}
+    gmail = FakeSyncGmail(DATES, added=["new", "flaky"], failing=["flaky"])
+
+    user = await synced_user(user, gmail)
+
+    # The checkpoint moves on, but the failed message is remembered rather than lost with it
+    assert user["gmail_history_id"] == "200"
+    assert user["sync_retry_ids"] == ["flaky"]
+
+    gmail.added = []
+    user = await synced_user(user, gmail)
+
+    assert gmail.fetched == [["new", "flaky"], ["flaky"]]
+    assert user["gmail_history_id"] == "300"
+    assert user["sync_retry_ids"] == []
+
+
+@pytest.mark.asyncio
+async def test_search_syncs_leave_pending_retries_alone(synced_user):
+    user = {"_id": USER_ID, "gmail_history_id": "100", "sync_retry_ids": ["flaky"]}
+    gmail = FakeSyncGmail({"new": DATES["new"]})
+
+    user = await synced_user(user, gmail, query="from:acme")
+
+    assert gmail.fetched == [["new"]]
+    assert user["sync_retry_ids"] == ["flaky"]
@@ -1,4 +1,4 @@
-import React, { useMemo, useState } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { gmailSyncService, collectionService } from '../services/api';
 
 const NaturalLanguageSearch = ({ onResults, onCollectionSaved, collections = [] }) => {
@@ -48,6 +48,22 @@ const NaturalLanguageSearch = ({ onResults, onCollectionSaved, collections = []
     return result.emails.find((e) => e.gmail_id === activeEmailId || e.gmailId === activeEmailId);
   }, [activeEmailId, result]);
 
+  // Search results only carry headers + snippet; load the full body when an email is opened
+  useEffect(() => {
+    if (!activeEmail || activeEmail.format !== 'metadata') return;
+    let cancelled = false;
+    gmailSyncService.getMessage(activeEmail.gmail_id)
+      .then((response) => {
+        if (cancelled) return;
+        setResult((prev) => prev && {
+          ...prev,
+          emails: prev.emails.map((e) => (e.gmail_id === response.data.gmail_id ? { ...e, ...response.data } : e))
+        });
+      })
+      .catch((error) => console.error('Load message error:', error));
+    return () => { cancelled = true; };
+  }, [activeEmail]);
+
   const selectedEmails = useMemo(() => {
     if (!result?.emails) return [];
     return result.emails.filter((e) => selectedIds.has(e.gmail_id || e.gmailId));
@@ -31,7 +31,8 @@ export const emailService = {
 export const gmailSyncService = {
   naturalQuery: (prompt, limit = 50, include_gmail_fetch = true) =>
     api.post('/gmail/natural-query', { prompt, limit, include_gmail_fetch }),
-  syncEmails: (prompt = '') => api.post('/gmail/sync', { prompt })
+  syncEmails: (prompt = '') => api.post('/gmail/sync', { prompt }),
+  getMessage: (gmailId) => api.get(`/gmail/messages/${gmailId}`)
 };
 
 export const analyticsService = {
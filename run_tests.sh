@@ -1,9 +1,9 @@
 #!/bin/bash
 
-echo "Running Backend Tests (Collections API)..."
+echo "Running Backend Tests..."
 cd backend
 pip install pytest pytest-asyncio -q
-python -m pytest test_collections.py -v
+python -m pytest test_collections.py test_gmail_service.py test_mime_extractor.py test_llm_client.py test_query_cache.py test_llm_service.py test_enrichment_service.py test_email_classifier.py test_analytics_service.py test_analytics_rollup.py test_response_cache.py test_indexes.py test_email_pagination.py test_search_index.py test_query_planner.py test_backfill_service.py test_sync_service.py -v
 
 if [ $? -eq 0 ]; then
   echo "✅ Backend tests passed"